@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, Generic, List
+from typing import Callable, Dict, Generic, List, Optional
 from problem import HeuristicFunction, Problem, S, A, Solution
+from solution_store import SolutionStore, solution_key
 
 # This is an abstract class for all goal based agents
 class GoalBasedAgent(ABC, Generic[S, A]):
@@ -23,16 +24,30 @@ class HumanAgent(GoalBasedAgent[S, A]):
 
 # This agent applies an uninformed search algorithm to find the solution to goal for the given state
 class UninformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution]) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution], store: Optional[SolutionStore] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
+        # If a solution store is given, the solutions are looked up in it before searching and saved to it after searching
+        # (a search that returns None is not saved, see SolutionStore.put)
+        self.store = store
         # The policy will store the action to do for each state so as not to search again after each observation
         self.policy: Dict[S, A] = {}
-    
+
+    # Search for a solution from the given state, or retrieve it from the solution store if it was found before
+    def search(self, problem: Problem[S, A], state: S) -> Solution:
+        if self.store is None:
+            return self.search_fn(problem, state)
+        key = solution_key(problem, state, self.search_fn)
+        found, solution = self.store.get(key)
+        if not found:
+            solution = self.search_fn(problem, state)
+            self.store.put(key, solution)
+        return solution
+
     def act(self, problem: Problem[S, A], state: S) -> A:
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
-            solution = self.search_fn(problem, state)
+            solution = self.search(problem, state)
             # if no solution was found, we return None
             if solution is None:
                 self.policy[state] = None
@@ -46,17 +61,31 @@ class UninformedSearchAgent(GoalBasedAgent[S, A]):
 
 # This agent applies an informed search algorithm to find the solution to goal for the given state
 class InformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction, store: Optional[SolutionStore] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
         self.heuristic = heuristic
+        # If a solution store is given, the solutions are looked up in it before searching and saved to it after searching
+        # (a search that returns None is not saved, see SolutionStore.put)
+        self.store = store
         # The policy will store the action to do for each state so as not to search again after each observation
         self.policy: Dict[S, A] = {}
-    
+
+    # Search for a solution from the given state, or retrieve it from the solution store if it was found before
+    def search(self, problem: Problem[S, A], state: S) -> Solution:
+        if self.store is None:
+            return self.search_fn(problem, state, self.heuristic)
+        key = solution_key(problem, state, self.search_fn, self.heuristic)
+        found, solution = self.store.get(key)
+        if not found:
+            solution = self.search_fn(problem, state, self.heuristic)
+            self.store.put(key, solution)
+        return solution
+
     def act(self, problem: Problem[S, A], state: S) -> A:
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
-            solution = self.search_fn(problem, state, self.heuristic)
+            solution = self.search(problem, state)
             # if no solution was found, we return None
             if solution is None:
                 self.policy[state] = None
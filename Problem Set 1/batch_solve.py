@@ -0,0 +1,175 @@
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from search_stats import SearchStats
+import argparse, glob, json, os, sys, time
+
+# This script solves many sokoban levels and parking lots in parallel and prints one JSON object per line for each file:
+#   {"path": ..., "status": ..., "length": ..., "cost": ..., "expanded": ..., "seconds": ...}
+# where status is one of "solved", "unsolvable", "timeout", "memory" or "error" (with an extra "error" message)
+# The results are printed as soon as each file is solved, so they are not in the same order as the input files.
+# Example: python batch_solve.py levels parks/*.txt --agent astar --heuristic strong --time-limit 60 --memory-limit 2048
+
+# The worker processes are created once and reused for all the files, so the modules are imported once per worker
+# and the layout analysis of a sokoban layout (see share_layout_analysis) is computed once per worker.
+# The time limit is enforced in the worker with SIGALRM for each file. The memory limit is enforced with RLIMIT_AS,
+# which limits the address space of the whole worker process (not of each file): it is set once when the worker starts,
+# and the memory that a worker keeps between files (the imported modules and the cached layout analyses) counts towards it.
+# Both limits are only available on Unix. On other platforms, the files are solved without limits.
+
+# Raised in the worker when a file exceeds its time limit
+class SearchTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise SearchTimeout()
+
+# Called once in every worker process when it starts
+def initialize_worker(memory_limit: Optional[int]):
+    import signal
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+    if memory_limit is not None:
+        try:
+            import resource
+            limit = memory_limit * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+    # Import the problems and the searches once per worker instead of once per file
+    import search, sokoban, parking, sokoban_heuristic
+
+# The layout analyses (dead cells and push distances, see sokoban_heuristic.get_layout_analysis) computed by this worker,
+# keyed by the walls and the goals of the layout (the walls are the cells of the grid that are not walkable)
+LAYOUT_ANALYSES: Dict[Any, Any] = {}
+
+# Give the problem the layout analysis of a previous level with the same layout, or compute it and keep it for the next levels
+# The analysis does not depend on the crates or the player, so levels that only differ in their initial state share it
+def share_layout_analysis(problem):
+    from sokoban_heuristic import get_layout_analysis
+    layout = problem.layout
+    key = (layout.width, layout.height, frozenset(layout.walkable), frozenset(layout.goals))
+    analysis = LAYOUT_ANALYSES.get(key)
+    if analysis is None:
+        LAYOUT_ANALYSES[key] = get_layout_analysis(problem)
+    else:
+        problem.cache()["layout_analysis"] = analysis
+
+# Detect the problem type of a file from its content: sokoban levels contain a player ('@' or '+')
+def detect_problem(text: str) -> str:
+    return "sokoban" if '@' in text or '+' in text else "parking"
+
+# Load the problem and the heuristic for the given file
+def load_problem(path: str, problem_type: str, heuristic_name: str, compact: bool):
+    with open(path, 'r') as f:
+        text = f.read()
+    if problem_type == "auto":
+        problem_type = detect_problem(text)
+    if problem_type == "sokoban":
+        from sokoban import SokobanProblem
+        import sokoban_heuristic
+        heuristic = {
+            "zero": lambda *_: 0,
+            "weak": sokoban_heuristic.weak_heuristic,
+            "strong": sokoban_heuristic.strong_heuristic,
+            "matching": sokoban_heuristic.matching_heuristic,
+            "pdb": sokoban_heuristic.pattern_database_heuristic,
+        }[heuristic_name]
+        problem = SokobanProblem.from_text(text, compact)
+        # the weak and zero heuristics do not use the layout analysis
+        if heuristic_name in ("strong", "matching", "pdb"):
+            share_layout_analysis(problem)
+        return problem, heuristic
+    from parking import ParkingProblem, parking_heuristic
+    heuristic = (lambda *_: 0) if heuristic_name == "zero" else parking_heuristic
+    return ParkingProblem.from_text(text), heuristic
+
+# Solve a single file in a worker process and return its result as a dictionary
+def solve_file(path: str, problem_type: str, agent: str, heuristic_name: str, compact: bool, time_limit: Optional[float]) -> Dict[str, Any]:
+    import signal
+    from search import BreadthFirstSearch, DepthFirstSearch, UniformCostSearch, AStarSearch, IterativeDeepeningAStar, BestFirstSearch
+    searches = {
+        "bfs": BreadthFirstSearch, "dfs": DepthFirstSearch, "ucs": UniformCostSearch,
+        "astar": AStarSearch, "idastar": IterativeDeepeningAStar, "gbfs": BestFirstSearch,
+    }
+    result: Dict[str, Any] = {"path": path, "status": None, "length": None, "cost": None, "expanded": None, "seconds": None}
+    stats = SearchStats()
+    use_alarm = time_limit is not None and hasattr(signal, "setitimer")
+    start = time.perf_counter()
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, time_limit)
+        try:
+            problem, heuristic = load_problem(path, problem_type, heuristic_name, compact)
+            initial_state = problem.get_initial_state()
+            search_fn = searches[agent]
+            if agent in ("astar", "idastar", "gbfs"):
+                solution = search_fn(problem, initial_state, heuristic, stats=stats)
+            else:
+                solution = search_fn(problem, initial_state, stats=stats)
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        if solution is None:
+            result["status"] = "unsolvable"
+        else:
+            # Replay the solution to compute its cost
+            cost, state = 0, initial_state
+            for action in solution:
+                cost += problem.get_cost(state, action)
+                state = problem.get_successor(state, action)
+            result.update(status="solved", length=len(solution), cost=cost)
+    except SearchTimeout:
+        result["status"] = "timeout"
+    except MemoryError:
+        result["status"] = "memory"
+    except Exception as error:
+        result.update(status="error", error=f"{type(error).__name__}: {error}")
+    result["expanded"] = stats.expanded
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+# Expand the given files, directories and glob patterns into a sorted list of files
+def collect_files(patterns: List[str]) -> List[str]:
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(sorted(glob.glob(os.path.join(pattern, "*.txt"))))
+        else:
+            files.extend(sorted(glob.glob(pattern)) or [pattern])
+    return files
+
+def main(args: argparse.Namespace):
+    files = collect_files(args.files)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=initialize_worker, initargs=(args.memory_limit,)) as executor:
+        futures = [
+            executor.submit(solve_file, path, args.problem, args.agent, args.heuristic, args.compact, args.time_limit)
+            for path in files
+        ]
+        solved = 0
+        for future in as_completed(futures):
+            result = future.result()
+            solved += result["status"] == "solved"
+            print(json.dumps(result), flush=True)
+    print(f"Solved {solved}/{len(files)} files in {time.perf_counter() - start:.2f} seconds", file=sys.stderr)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve many sokoban levels and parking lots in parallel")
+    parser.add_argument("files", nargs="+", help="the files, directories (all the .txt files inside) or glob patterns to solve")
+    parser.add_argument("--problem", "-p", default="auto", choices=["auto", "sokoban", "parking"],
+                        help="the problem type of the files (auto detects it from the content of each file)")
+    parser.add_argument("--agent", "-a", default="astar", choices=["bfs", "dfs", "ucs", "astar", "idastar", "gbfs"],
+                        help="the search algorithm used to solve the files")
+    parser.add_argument("--heuristic", "-hf", default="strong", choices=["zero", "weak", "strong", "matching", "pdb"],
+                        help="the sokoban heuristic used by the informed searches (parking lots use the parking heuristic unless it is zero)")
+    parser.add_argument("--compact", action="store_true", default=False,
+                        help="Use the compact sokoban state representation (integer cells and a crates bitmask)")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="the number of worker processes (the number of CPUs by default)")
+    parser.add_argument("--time-limit", "-t", type=float, default=None, help="the time limit for each file in seconds")
+    parser.add_argument("--memory-limit", "-m", type=int, default=None, help="the memory limit of each worker process in MB (shared by all the files the worker solves)")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
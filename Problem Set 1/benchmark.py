@@ -0,0 +1,594 @@
+from typing import Any, Callable, Dict, List
+from collections import deque
+from types import MethodType
+from search_stats import SearchStats
+import argparse, glob, heapq, json, os, tempfile, time
+
+# This file contains the benchmarks used to measure the speed and the memory usage of the search algorithms
+# Run "python benchmark.py --help" to list the available benchmarks
+
+# Run a search function on a problem and measure (using SearchStats):
+#   the number of expanded nodes,
+#   the elapsed time and the throughput in expanded nodes per second,
+#   the peak memory allocated during the search (measured in a separate run since tracing slows down the search)
+def measure_search(problem, search_fn: Callable, *args: Any) -> Dict[str, Any]:
+    initial_state = problem.get_initial_state()
+    stats = SearchStats()
+    path = search_fn(problem, initial_state, *args, stats=stats)
+    memory_stats = SearchStats(trace_memory=True)
+    search_fn(problem, initial_state, *args, stats=memory_stats)
+    return {
+        "path_length": None if path is None else len(path),
+        "expanded": stats.expanded,
+        "seconds": stats.search_time,
+        "nodes_per_second": stats.expanded / stats.search_time if stats.search_time > 0 else float('inf'),
+        "peak_memory_kb": memory_stats.peak_memory / 1024,
+    }
+
+def print_row(name: str, result: Dict[str, Any]):
+    print(f"{name:<36} length={str(result['path_length']):>5} expanded={result['expanded']:>8} "
+          f"time={result['seconds']:8.4f}s nodes/sec={result['nodes_per_second']:10.0f} peak={result['peak_memory_kb']:10.1f}KB")
+
+# Run all the search algorithms on the sokoban levels and the parking lots
+def search_benchmark(levels: List[str], parks: List[str], compact: bool = False):
+    from sokoban import SokobanProblem
+    from parking import ParkingProblem
+    from search import BreadthFirstSearch, DepthFirstSearch, UniformCostSearch, AStarSearch, BestFirstSearch
+    zero_heuristic = lambda *_: 0
+    algorithms = [
+        ("bfs", BreadthFirstSearch, ()),
+        ("dfs", DepthFirstSearch, ()),
+        ("ucs", UniformCostSearch, ()),
+        ("astar", AStarSearch, (zero_heuristic,)),
+        ("gbfs", BestFirstSearch, (zero_heuristic,)),
+    ]
+    load_level = lambda path: SokobanProblem.from_file(path, compact)
+    for loader, paths in ((load_level, levels), (ParkingProblem.from_file, parks)):
+        for path in paths:
+            for name, search_fn, args in algorithms:
+                print_row(f"{path} [{name}]", measure_search(loader(path), search_fn, *args))
+
+# Run A* with a sokoban heuristic on the given levels and measure
+#   the number of expanded nodes, generated nodes (get_successor calls) and heuristic evaluations,
+#   and the node generation throughput
+# If checks is True, every transition is checked for the heuristic consistency (using the same listener as the autograder)
+# Note that the heuristic evaluations done by the checks are not counted
+def heuristic_benchmark(levels: List[str], heuristic_name: str, compact: bool = False, checks: bool = False):
+    from sokoban import SokobanProblem
+    from search import AStarSearch
+    from helpers.heuristic_checks import test_heuristic_consistency
+    import sokoban_heuristic
+    heuristic = getattr(sokoban_heuristic, heuristic_name)
+    for path in levels:
+        problem = SokobanProblem.from_file(path, compact)
+        if checks:
+            # the listener expects the unbound method arguments (problem, state, action)
+            problem.get_successor = MethodType(test_heuristic_consistency(heuristic)(type(problem).get_successor), problem)
+        stats = SearchStats()
+        solution = AStarSearch(problem, problem.get_initial_state(), heuristic, stats=stats)
+        print(f"{path} [{heuristic_name}]: length={None if solution is None else len(solution)} expanded={stats.expanded} "
+              f"generated={stats.generated} heuristic evaluations={stats.heuristic_evaluations} time={stats.search_time:.4f}s "
+              f"generated/sec={stats.generated / stats.search_time:.0f}")
+
+# Write a graph routing problem on a size x size grid where every node is connected to its 4 neighbors
+# The start is at a corner and the goal is at the opposite corner so BFS has to expand (almost) every node
+def write_grid_graph(path: str, size: int):
+    name = lambda x, y: f"{x}_{y}"
+    graph = {}
+    for y in range(size):
+        for x in range(size):
+            adjacent = [name(nx, ny) for nx, ny in ((x+1, y), (x, y-1), (x-1, y), (x, y+1)) if 0 <= nx < size and 0 <= ny < size]
+            graph[name(x, y)] = {"position": [x, y], "adjacent": adjacent}
+    with open(path, 'w') as f:
+        json.dump({"start": name(0, 0), "goal": name(size-1, size-1), "graph": graph}, f)
+
+# This is the breadth first search as it was before the seen set was added (it rebuilds the frontier set on every expansion)
+# It is only used as a reference to check that the expansion order did not change
+def reference_breadth_first_search(problem, initial_state):
+    frontier = deque([(initial_state, [])])
+    explored = set()
+    while frontier:
+        state, path = frontier.popleft()
+        if problem.is_goal(state):
+            return path
+        explored.add(state)
+        frontier_set = set([s[0] for s in frontier])
+        for action in problem.get_actions(state):
+            new_state = problem.get_successor(state, action)
+            if new_state not in explored and new_state not in frontier_set:
+                new_path = path + [action]
+                if problem.is_goal(new_state):
+                    return new_path
+                frontier.append((new_state, new_path))
+    return None
+
+# Run BFS on a generated grid graph and check that the expansion order (recorded by @record_calls) matches the reference
+def bfs_grid_benchmark(size: int, verify_size: int):
+    from graph import GraphRoutingProblem
+    from search import BreadthFirstSearch
+    from helpers.utils import fetch_recorded_calls
+
+    def run(search_fn, problem):
+        fetch_recorded_calls(GraphRoutingProblem.get_actions)
+        start = time.perf_counter()
+        path = search_fn(problem, problem.get_initial_state())
+        elapsed = time.perf_counter() - start
+        traversal = [call["args"][1] for call in fetch_recorded_calls(GraphRoutingProblem.get_actions)]
+        return path, traversal, elapsed
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Check the expansion order on a grid that is small enough for the quadratic reference search
+        path = os.path.join(directory, "verify.json")
+        write_grid_graph(path, verify_size)
+        problem = GraphRoutingProblem.from_file(path)
+        expected_path, expected_traversal, reference_time = run(reference_breadth_first_search, problem)
+        actual_path, actual_traversal, elapsed = run(BreadthFirstSearch, problem)
+        if actual_path != expected_path or actual_traversal != expected_traversal:
+            raise Exception(f"The BFS path or expansion order changed on the {verify_size}x{verify_size} grid")
+        print(f"{verify_size}x{verify_size} grid: expansion order unchanged ({len(actual_traversal)} nodes), "
+              f"reference={reference_time:.4f}s current={elapsed:.4f}s")
+        # Measure the throughput on the large grid
+        path = os.path.join(directory, "grid.json")
+        write_grid_graph(path, size)
+        start = time.perf_counter()
+        problem = GraphRoutingProblem.from_file(path)
+        load_time = time.perf_counter() - start
+        _, traversal, elapsed = run(BreadthFirstSearch, problem)
+        print(f"{size}x{size} grid: loaded in {load_time:.4f}s, expanded {len(traversal)} nodes in {elapsed:.4f}s "
+              f"({len(traversal) / elapsed:.0f} nodes/sec)")
+
+# Create a graph routing problem with random node positions where every node is connected to 'degree' random nodes
+def random_graph(size: int, degree: int, seed: int):
+    import random
+    from graph import GraphNode, GraphRoutingProblem
+    from mathutils import Point
+    rng = random.Random(seed)
+    nodes = [GraphNode(str(index), Point(rng.randint(0, 10 * size), rng.randint(0, 10 * size))) for index in range(size)]
+    adjacency = {node: sorted(rng.sample(nodes, degree), key=lambda adjacent: adjacent.name) for node in nodes}
+    return GraphRoutingProblem(nodes[0], nodes[-1], adjacency)
+
+# This is uniform cost search / A* as it was before the indexed priority queue was added:
+# duplicates are pushed on every cost improvement and discarded when popped if their state was already explored.
+# It is used as a reference to check that the expansion order did not change and to measure the peak heap size
+# Returns the path, the peak heap size and the peak number of live (non-duplicate) entries in the heap
+def reference_lazy_search(problem, initial_state, heuristic):
+    frontier = [(heuristic(problem, initial_state), 0, initial_state, [])]
+    explored, state_cost, unique_id = set(), {initial_state: 0}, 0
+    peak_size = peak_live = 1
+    while frontier:
+        total_cost, _, state, path = heapq.heappop(frontier)
+        if state in explored: continue
+        if problem.is_goal(state):
+            return path, peak_size, peak_live
+        explored.add(state)
+        for action in problem.get_actions(state):
+            new_state = problem.get_successor(state, action)
+            if new_state not in explored:
+                new_total_cost = total_cost - heuristic(problem, state) + problem.get_cost(state, action) + heuristic(problem, new_state)
+                if new_state not in state_cost or new_total_cost < state_cost[new_state]:
+                    state_cost[new_state] = new_total_cost
+                    unique_id += 1
+                    heapq.heappush(frontier, (new_total_cost, unique_id, new_state, path + [action]))
+        peak_size = max(peak_size, len(frontier))
+        # every state with a known cost is either explored or has exactly one live entry in the heap
+        peak_live = max(peak_live, len(state_cost) - len(explored))
+    return None, peak_size, peak_live
+
+# Run UCS and A* on dense random graphs, check the expansion order against the lazy-deletion reference,
+# then compare the heap size (duplicates vs one entry per state) and the wall time
+def priority_queue_benchmark(sizes: List[int], degree: int, seed: int):
+    from graph import GraphRoutingProblem, graphrouting_heuristic
+    from search import UniformCostSearch, AStarSearch
+    from helpers.utils import fetch_recorded_calls
+    zero_heuristic = lambda *_: 0
+
+    def run(search_fn, problem, *args):
+        fetch_recorded_calls(GraphRoutingProblem.get_actions)
+        start = time.perf_counter()
+        result = search_fn(problem, problem.get_initial_state(), *args)
+        elapsed = time.perf_counter() - start
+        traversal = [call["args"][1] for call in fetch_recorded_calls(GraphRoutingProblem.get_actions)]
+        return result, traversal, elapsed
+
+    for size in sizes:
+        problem = random_graph(size, degree, seed)
+        for name, search_fn, heuristic, args in (("ucs", UniformCostSearch, zero_heuristic, ()),
+                                                 ("astar", AStarSearch, graphrouting_heuristic, (graphrouting_heuristic,))):
+            (expected_path, peak_size, peak_live), expected_traversal, reference_time = run(reference_lazy_search, problem, heuristic)
+            path, traversal, elapsed = run(search_fn, problem, *args)
+            if path != expected_path or traversal != expected_traversal:
+                raise Exception(f"The {name} path or expansion order changed on the random graph with {size} nodes")
+            print(f"{size} nodes x {degree} edges [{name}]: expanded={len(traversal):>6} "
+                  f"lazy heap peak={peak_size:>7} indexed heap peak={peak_live:>7} "
+                  f"lazy time={reference_time:8.4f}s indexed time={elapsed:8.4f}s")
+
+# Create a graph routing problem on a size x size grid where a random fraction of the nodes are removed (obstacles)
+# The start and the goal are on the middle row at a quarter and three quarters of the width
+def random_grid_graph(size: int, obstacles: float, seed: int):
+    import random
+    from graph import GraphNode, GraphRoutingProblem
+    from mathutils import Point
+    rng = random.Random(seed)
+    start, goal = (size // 4, size // 2), (3 * size // 4, size // 2)
+    nodes = {(x, y): GraphNode(f"{x}_{y}", Point(x, y)) for y in range(size) for x in range(size)
+             if (x, y) in (start, goal) or rng.random() >= obstacles}
+    adjacency = {
+        node: sorted((nodes[neighbor] for neighbor in ((x+1, y), (x, y-1), (x-1, y), (x, y+1)) if neighbor in nodes), key=lambda adjacent: adjacent.name)
+        for (x, y), node in nodes.items()
+    }
+    return GraphRoutingProblem(nodes[start], nodes[goal], adjacency)
+
+# Compare the number of expanded nodes and the time of the one-directional and the bidirectional searches on large grid graphs
+def bidirectional_benchmark(sizes: List[int], obstacles: float, seed: int):
+    from graph import GraphRoutingProblem, ReversedGraphRoutingProblem, graphrouting_heuristic
+    from search import BreadthFirstSearch, AStarSearch
+    from bidirectional_search import BidirectionalBreadthFirstSearch, BidirectionalAStarSearch
+    from helpers.utils import fetch_recorded_calls
+    algorithms = [
+        ("bfs", BreadthFirstSearch, ()),
+        ("bidirectional bfs", BidirectionalBreadthFirstSearch, ()),
+        ("astar", AStarSearch, (graphrouting_heuristic,)),
+        ("bidirectional astar", BidirectionalAStarSearch, (graphrouting_heuristic,)),
+    ]
+    for size in sizes:
+        problem = random_grid_graph(size, obstacles, seed)
+        for name, search_fn, args in algorithms:
+            fetch_recorded_calls(GraphRoutingProblem.get_actions)
+            fetch_recorded_calls(ReversedGraphRoutingProblem.get_actions)
+            start = time.perf_counter()
+            path = search_fn(problem, problem.get_initial_state(), *args)
+            elapsed = time.perf_counter() - start
+            # the expanded nodes of the backward searches are recorded separately
+            expanded = len(fetch_recorded_calls(GraphRoutingProblem.get_actions)) + len(fetch_recorded_calls(ReversedGraphRoutingProblem.get_actions))
+            cost = None
+            if path is not None:
+                cost, state = 0, problem.get_initial_state()
+                for action in path:
+                    cost += problem.get_cost(state, action)
+                    state = problem.get_successor(state, action)
+            print(f"{size}x{size} grid [{name}]: length={None if path is None else len(path)} cost={cost} "
+                  f"expanded={expanded} time={elapsed:.4f}s")
+
+# Compare the peak memory and the number of expanded nodes of A* and IDA* (with and without the transposition table)
+# on the sokoban levels (with the strong heuristic) and on the parking lots (with the zero heuristic)
+def ida_benchmark(levels: List[str], parks: List[str], tt_sizes: List[int], compact: bool = False):
+    from sokoban import SokobanProblem
+    from parking import ParkingProblem
+    from search import AStarSearch, IterativeDeepeningAStar
+    from sokoban_heuristic import strong_heuristic
+    from functools import partial
+    zero_heuristic = lambda *_: 0
+    algorithms = [("astar", AStarSearch)] + [
+        (f"idastar tt={tt_size}", partial(IterativeDeepeningAStar, transposition_table_size=tt_size)) for tt_size in tt_sizes
+    ]
+    load_level = lambda path: SokobanProblem.from_file(path, compact)
+    for loader, paths, heuristic in ((load_level, levels, strong_heuristic), (ParkingProblem.from_file, parks, zero_heuristic)):
+        for path in paths:
+            for name, search_fn in algorithms:
+                print_row(f"{path} [{name}]", measure_search(loader(path), search_fn, heuristic))
+
+# Measure A* on the parking lots with the zero heuristic and with the parking heuristic,
+# and the successor generation throughput (get_actions + get_successor calls over all the reachable states)
+def parking_benchmark(parks: List[str], repeats: int):
+    from parking import ParkingProblem, parking_heuristic
+    from search import AStarSearch
+    zero_heuristic = lambda *_: 0
+    for path in parks:
+        for name, heuristic in (("astar h=0", zero_heuristic), ("astar h=parking", parking_heuristic)):
+            print_row(f"{path} [{name}]", measure_search(ParkingProblem.from_file(path), AStarSearch, heuristic))
+        problem = ParkingProblem.from_file(path)
+        initial_state = problem.get_initial_state()
+        seen, frontier = {initial_state}, deque([initial_state])
+        while frontier:
+            state = frontier.popleft()
+            for action in problem.get_actions(state):
+                new_state = problem.get_successor(state, action)
+                if new_state not in seen:
+                    seen.add(new_state)
+                    frontier.append(new_state)
+        states = list(seen)
+        generated = 0
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for state in states:
+                for action in problem.get_actions(state):
+                    problem.get_successor(state, action)
+                    generated += 1
+        elapsed = time.perf_counter() - start
+        print(f"{path} [successors]: states={len(states)} generated={generated} time={elapsed:.4f}s generated/sec={generated / elapsed:.0f}")
+
+# Compare A* on the step formulation of the sokoban levels (SokobanProblem with the strong heuristic)
+# against A* on the push formulation (SokobanPushProblem with the push heuristic)
+# The length of the push solutions is the number of moves after converting the pushes back into directions
+def pushes_benchmark(levels: List[str]):
+    from sokoban import SokobanProblem, SokobanPushProblem
+    from search import AStarSearch
+    from sokoban_heuristic import strong_heuristic, push_heuristic
+    for path in levels:
+        print_row(f"{path} [astar steps]", measure_search(SokobanProblem.from_file(path), AStarSearch, strong_heuristic))
+        problem = SokobanProblem.from_file(path)
+        push_problem = SokobanPushProblem.from_state(problem.layout, problem.get_initial_state())
+        result = measure_search(push_problem, AStarSearch, push_heuristic)
+        pushes = AStarSearch(push_problem, push_problem.get_initial_state(), push_heuristic)
+        state = problem.get_initial_state()
+        result["path_length"] = len(push_problem.to_directions(state.player, state.crates, pushes))
+        print_row(f"{path} [astar pushes]", result)
+        print(f"{path} [astar pushes]: pushes={len(pushes)} regions cached={len(push_problem.cache()['regions'])}")
+
+# Collect up to "limit" states reachable from the initial state of the problem (in breadth first order)
+def reachable_states(problem, limit: int) -> List[Any]:
+    initial_state = problem.get_initial_state()
+    seen, frontier = {initial_state}, deque([initial_state])
+    states = [initial_state]
+    while frontier and len(states) < limit:
+        state = frontier.popleft()
+        for action in problem.get_actions(state):
+            new_state = problem.get_successor(state, action)
+            if new_state not in seen:
+                seen.add(new_state)
+                states.append(new_state)
+                frontier.append(new_state)
+    return states
+
+# Measure the throughput of the state sets used by the searches on the sokoban levels and the parking lots:
+#   the successor generation (get_successor calls over the collected states),
+#   the insertion of the collected states into a set,
+#   and the lookup of equal states (rebuilt by a second collection so they are not the same objects) in that set
+def zobrist_benchmark(levels: List[str], parks: List[str], limit: int, repeats: int):
+    from sokoban import SokobanProblem
+    from parking import ParkingProblem
+    for loader, paths in ((SokobanProblem.from_file, levels), (ParkingProblem.from_file, parks)):
+        for path in paths:
+            problem = loader(path)
+            states = reachable_states(problem, limit)
+            copies = reachable_states(problem, limit)
+            transitions = [(state, action) for state in states for action in problem.get_actions(state)]
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for state, action in transitions:
+                    problem.get_successor(state, action)
+            successor_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(repeats):
+                explored = set()
+                for state in states:
+                    explored.add(state)
+            insert_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(repeats):
+                found = 0
+                for state in copies:
+                    found += state in explored
+            lookup_time = time.perf_counter() - start
+            print(f"{path}: states={len(states)} found={found} successors/sec={len(transitions) * repeats / successor_time:.0f} "
+                  f"inserts/sec={len(states) * repeats / insert_time:.0f} lookups/sec={len(copies) * repeats / lookup_time:.0f}")
+
+# Run a function and return its result, the elapsed time and the peak memory it allocated (measured in a separate traced run)
+def measure_call(fn: Callable, *args: Any):
+    import tracemalloc
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+# Compare loading a large grid graph with GraphRoutingProblem.from_file (json.load then GraphNode objects),
+# with the streaming JSON reader of the compact graph and with the memory-mapped compact graph file,
+# then check that BFS finds the same path on the original and the compact problems
+def graph_loader_benchmark(sizes: List[int]):
+    from graph import GraphRoutingProblem
+    from compact_graph import CompactGraphRoutingProblem, read_compact_graph_json, save_compact_graph, load_compact_graph
+    from search import BreadthFirstSearch
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            json_path, compact_path = os.path.join(directory, "grid.json"), os.path.join(directory, "grid.csr")
+            write_grid_graph(json_path, size)
+            save_compact_graph(compact_path, read_compact_graph_json(json_path))
+            print(f"{size}x{size} grid: json={os.path.getsize(json_path) / 2**20:.1f}MB compact={os.path.getsize(compact_path) / 2**20:.1f}MB")
+            problems = {}
+            for name, loader in (("GraphRoutingProblem.from_file", GraphRoutingProblem.from_file),
+                                 ("streaming json to CSR", lambda path: CompactGraphRoutingProblem(read_compact_graph_json(path))),
+                                 ("memory-mapped CSR", lambda path: CompactGraphRoutingProblem(load_compact_graph(path)))):
+                problem, elapsed, peak = measure_call(loader, compact_path if name == "memory-mapped CSR" else json_path)
+                problems[name] = problem
+                print(f"  {name:<32} load={elapsed:8.4f}s peak={peak / 2**20:8.1f}MB")
+            paths = {}
+            for name, problem in problems.items():
+                start = time.perf_counter()
+                path = BreadthFirstSearch(problem, problem.get_initial_state())
+                elapsed = time.perf_counter() - start
+                names = [str(node) for node in path] if isinstance(problem, GraphRoutingProblem) else [problem.graph.name(node) for node in path]
+                paths[name] = names
+                print(f"  {name:<32} bfs={elapsed:8.4f}s length={len(path)}")
+            if len(set(map(tuple, paths.values()))) != 1:
+                raise Exception(f"The BFS paths differ on the {size}x{size} grid")
+
+# Create a grid graph (like random_grid_graph) split by vertical walls which only have a single gap each,
+# so the shortest paths have to detour through the gaps and the straight-line distance underestimates them a lot
+def wall_grid_graph(size: int, walls: int, obstacles: float, seed: int):
+    import random
+    from graph import GraphNode, GraphRoutingProblem
+    from mathutils import Point
+    rng = random.Random(seed)
+    wall_columns = {size * (i + 1) // (walls + 1): rng.randrange(size) for i in range(walls)}
+    # the gaps and the cells next to them are never obstacles, so the walls do not split the graph
+    gaps = {(x + dx, y) for x, y in wall_columns.items() for dx in (-1, 0, 1)}
+    nodes = {(x, y): GraphNode(f"{x}_{y}", Point(x, y)) for y in range(size) for x in range(size)
+             if (x, y) in gaps or (x not in wall_columns and rng.random() >= obstacles)}
+    adjacency = {
+        node: sorted((nodes[neighbor] for neighbor in ((x+1, y), (x, y-1), (x-1, y), (x, y+1)) if neighbor in nodes), key=lambda adjacent: adjacent.name)
+        for (x, y), node in nodes.items()
+    }
+    names = sorted(nodes.values(), key=lambda node: node.name)
+    return GraphRoutingProblem(names[0], names[-1], adjacency)
+
+# Compare A* with the straight-line heuristic and with the landmark heuristic on random queries (start and goal pairs)
+# on a grid graph with random obstacles and on a grid graph split by walls.
+# The landmark tables are built once per graph and stored in a temporary directory, then each query loads them from the file.
+def landmarks_benchmark(size: int, queries: int, count: int, seed: int):
+    import random, landmarks
+    from compact_graph import CompactGraphRoutingProblem, compact_graph_heuristic
+    from helpers.utils import fetch_recorded_calls
+    from landmarks import build_landmarks, get_landmark_graph, landmark_file_name, landmark_heuristic, save_landmarks
+    from search import AStarSearch
+    rng = random.Random(seed)
+    graphs = [("random obstacles", random_grid_graph(size, 0.25, seed)), ("walls", wall_grid_graph(size, 4, 0.05, seed))]
+    with tempfile.TemporaryDirectory() as directory:
+        landmarks.LANDMARK_DIRECTORY, landmarks.LANDMARK_COUNT = directory, count
+        for graph_name, problem in graphs:
+            graph, _ = get_landmark_graph(problem)
+            start = time.perf_counter()
+            tables = build_landmarks(graph, count)
+            save_landmarks(os.path.join(directory, landmark_file_name(graph, count)), graph.node_count, tables)
+            print(f"{size}x{size} {graph_name}: nodes={graph.node_count} landmarks={count} preprocessing={time.perf_counter() - start:.4f}s")
+            totals = {"euclidean": [0, 0.0], "landmarks": [0, 0.0]}
+            solved = 0
+            for _ in range(queries):
+                query = (rng.randrange(graph.node_count), rng.randrange(graph.node_count))
+                costs = {}
+                for name, heuristic in (("euclidean", compact_graph_heuristic), ("landmarks", landmark_heuristic)):
+                    query_problem = CompactGraphRoutingProblem(graph, *query)
+                    stats = SearchStats()
+                    path = AStarSearch(query_problem, query_problem.get_initial_state(), heuristic, stats=stats)
+                    totals[name][0] += stats.expanded
+                    totals[name][1] += stats.search_time
+                    costs[name] = None if path is None else sum(query_problem.get_cost(a, b) for a, b in zip([query[0]] + path, path))
+                    # the expanded nodes are counted by the stats, so the recorded calls are dropped instead of piling up across the queries
+                    fetch_recorded_calls(CompactGraphRoutingProblem.get_actions)
+                if (costs["euclidean"] is None) != (costs["landmarks"] is None) or \
+                        (costs["euclidean"] is not None and abs(costs["euclidean"] - costs["landmarks"]) > 1e-6):
+                    raise Exception(f"The landmark heuristic found a different cost for the query {query}: {costs}")
+                solved += costs["euclidean"] is not None
+            for name, (expanded, elapsed) in totals.items():
+                print(f"  [astar {name}] queries={queries} solved={solved} expanded={expanded} time={elapsed:.4f}s")
+
+# Count the calls of the given module functions while running "body" (each function is replaced by a counting wrapper then restored)
+def count_calls(module, names: List[str], body: Callable[[], Any]) -> int:
+    originals, calls = {name: getattr(module, name) for name in names}, [0]
+    def counted(original):
+        def wrapper(*args, **kwargs):
+            calls[0] += 1
+            return original(*args, **kwargs)
+        return wrapper
+    for name, original in originals.items():
+        setattr(module, name, counted(original))
+    try:
+        body()
+    finally:
+        for name, original in originals.items():
+            setattr(module, name, original)
+    return calls[0]
+
+# Check that the precomputed tables cached in the problem are loaded (or built) once per problem during a whole search:
+#   the landmark tables of the landmark heuristic on the graphs (the default landmark count is more than the nodes of the small graphs),
+#   the pattern database of the pattern database heuristic on the levels (level1 has fewer crates than the default pattern size)
+def cache_checks(graphs: List[str], levels: List[str]):
+    import landmarks, sokoban_heuristic
+    from graph import GraphRoutingProblem
+    from sokoban import SokobanProblem
+    from search import AStarSearch
+    for path in graphs:
+        problem = GraphRoutingProblem.from_file(path)
+        loads = count_calls(landmarks, ["load_landmarks", "build_landmarks"],
+                            lambda: AStarSearch(problem, problem.get_initial_state(), landmarks.landmark_heuristic))
+        print(f"{path} [landmark tables]: loaded or built {loads} times")
+        if loads > 1:
+            raise Exception(f"The landmark tables of {path} were loaded or built {loads} times in a single search")
+    for path in levels:
+        problem = SokobanProblem.from_file(path)
+        loads = count_calls(sokoban_heuristic, ["load_pattern_database", "build_pattern_database"],
+                            lambda: AStarSearch(problem, problem.get_initial_state(), sokoban_heuristic.pattern_database_heuristic))
+        print(f"{path} [pattern database]: loaded or built {loads} times")
+        if loads > 1:
+            raise Exception(f"The pattern database of {path} was loaded or built {loads} times in a single search")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the search algorithms")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    search_parser = subparsers.add_parser("search", help="measure all the search algorithms on sokoban levels and parking lots")
+    search_parser.add_argument("--compact", action="store_true", help="use the compact sokoban state representation")
+    search_parser.add_argument("--levels", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="the sokoban levels to solve")
+    search_parser.add_argument("--parks", nargs="*", default=sorted(glob.glob("parks/*.txt")), help="the parking lots to solve")
+
+    bfs_parser = subparsers.add_parser("bfs-grid", help="measure BFS on a large generated grid graph and check its expansion order")
+    bfs_parser.add_argument("--size", type=int, default=1000, help="the width and height of the grid (size*size nodes)")
+    bfs_parser.add_argument("--verify-size", type=int, default=100, help="the width and height of the grid used to check the expansion order")
+
+    queue_parser = subparsers.add_parser("priority-queue", help="compare the indexed priority queue against duplicate pushes on dense random graphs")
+    queue_parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 50000], help="the number of nodes in each random graph")
+    queue_parser.add_argument("--degree", type=int, default=50, help="the number of edges leaving each node")
+    queue_parser.add_argument("--seed", type=int, default=0, help="the random seed used to generate the graphs")
+
+    heuristic_parser = subparsers.add_parser("heuristic", help="measure A* node generation throughput with a sokoban heuristic")
+    heuristic_parser.add_argument("--compact", action="store_true", help="use the compact sokoban state representation")
+    heuristic_parser.add_argument("--levels", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="the sokoban levels to solve")
+    heuristic_parser.add_argument("--heuristic", "-hf", default="strong_heuristic", help="the name of the heuristic function in sokoban_heuristic.py")
+    heuristic_parser.add_argument("--checks", "-c", action="store_true", help="check the heuristic consistency for each transition (slower)")
+
+    bidirectional_parser = subparsers.add_parser("bidirectional", help="compare the bidirectional searches against BFS and A* on large grid graphs")
+    bidirectional_parser.add_argument("--sizes", type=int, nargs="*", default=[100, 300, 1000], help="the width and height of each grid")
+    bidirectional_parser.add_argument("--obstacles", type=float, default=0.25, help="the fraction of the grid nodes that are removed")
+    bidirectional_parser.add_argument("--seed", type=int, default=0, help="the random seed used to generate the graphs")
+
+    ida_parser = subparsers.add_parser("ida", help="compare the peak memory of A* and IDA* on sokoban levels and parking lots")
+    ida_parser.add_argument("--compact", action="store_true", help="use the compact sokoban state representation")
+    ida_parser.add_argument("--levels", nargs="*", default=sorted(glob.glob("levels/*.txt"))[:3], help="the sokoban levels to solve")
+    ida_parser.add_argument("--parks", nargs="*", default=sorted(glob.glob("parks/*.txt")), help="the parking lots to solve")
+    ida_parser.add_argument("--tt-sizes", type=int, nargs="*", default=[2**12, 2**16], help="the transposition table sizes to try (0 disables it, only practical on small levels)")
+
+    parking_parser = subparsers.add_parser("parking", help="measure A* with the parking heuristic and the parking successor generation throughput")
+    parking_parser.add_argument("--parks", nargs="*", default=sorted(glob.glob("parks/*.txt")), help="the parking lots to solve")
+    parking_parser.add_argument("--repeats", type=int, default=200, help="the number of times the successors of every reachable state are generated")
+
+    pushes_parser = subparsers.add_parser("pushes", help="compare A* on the step and the push formulations of the sokoban levels")
+    pushes_parser.add_argument("--levels", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="the sokoban levels to solve")
+
+    zobrist_parser = subparsers.add_parser("zobrist", help="measure the successor generation and the set insert/lookup throughput of the states")
+    zobrist_parser.add_argument("--levels", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="the sokoban levels to explore")
+    zobrist_parser.add_argument("--parks", nargs="*", default=sorted(glob.glob("parks/*.txt")), help="the parking lots to explore")
+    zobrist_parser.add_argument("--limit", type=int, default=100000, help="the maximum number of states collected from each problem")
+    zobrist_parser.add_argument("--repeats", type=int, default=5, help="the number of times each measurement is repeated")
+
+    loader_parser = subparsers.add_parser("graph-loader", help="compare the JSON graph loader against the compact (CSR) graph loaders on large grid graphs")
+    loader_parser.add_argument("--sizes", type=int, nargs="*", default=[300, 1000], help="the width and height of each grid")
+
+    landmarks_parser = subparsers.add_parser("landmarks", help="compare A* with the straight-line and the landmark heuristics on random queries")
+    landmarks_parser.add_argument("--size", type=int, default=300, help="the width and height of the grids")
+    landmarks_parser.add_argument("--queries", type=int, default=20, help="the number of random queries on each grid")
+    landmarks_parser.add_argument("--count", "-k", type=int, default=8, help="the number of landmarks")
+    landmarks_parser.add_argument("--seed", type=int, default=0, help="the random seed used to generate the grids and the queries")
+
+    cache_parser = subparsers.add_parser("cache-checks", help="check that the landmark tables and the pattern databases are loaded or built once per problem")
+    cache_parser.add_argument("--graphs", nargs="*", default=sorted(glob.glob("graphs/*.json")), help="the graphs searched with the landmark heuristic")
+    cache_parser.add_argument("--levels", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="the levels searched with the pattern database heuristic")
+
+    args = parser.parse_args()
+    if args.benchmark == "search":
+        search_benchmark(args.levels, args.parks, args.compact)
+    elif args.benchmark == "bfs-grid":
+        bfs_grid_benchmark(args.size, args.verify_size)
+    elif args.benchmark == "heuristic":
+        heuristic_benchmark(args.levels, args.heuristic, args.compact, args.checks)
+    elif args.benchmark == "priority-queue":
+        priority_queue_benchmark(args.sizes, args.degree, args.seed)
+    elif args.benchmark == "bidirectional":
+        bidirectional_benchmark(args.sizes, args.obstacles, args.seed)
+    elif args.benchmark == "ida":
+        ida_benchmark(args.levels, args.parks, args.tt_sizes, args.compact)
+    elif args.benchmark == "parking":
+        parking_benchmark(args.parks, args.repeats)
+    elif args.benchmark == "pushes":
+        pushes_benchmark(args.levels)
+    elif args.benchmark == "zobrist":
+        zobrist_benchmark(args.levels, args.parks, args.limit, args.repeats)
+    elif args.benchmark == "graph-loader":
+        graph_loader_benchmark(args.sizes)
+    elif args.benchmark == "landmarks":
+        landmarks_benchmark(args.size, args.queries, args.count, args.seed)
+    elif args.benchmark == "cache-checks":
+        cache_checks(args.graphs, args.levels)
@@ -0,0 +1,150 @@
+from typing import Dict, List, Tuple
+from collections import deque
+from graph import GraphNode, GraphRoutingProblem
+from problem import HeuristicFunction, Solution
+from priority_queue import IndexedPriorityQueue
+from search import NodeStore
+
+# This file contains bidirectional searches for the graph routing problem
+# They run a forward search from the initial state and a backward search from the goal at the same time
+# on the reversed graph (see GraphRoutingProblem.reversed) and stop when the two searches meet.
+# The nodes expanded by the forward search are recorded by GraphRoutingProblem.get_actions and the nodes expanded by
+# the backward search are recorded by ReversedGraphRoutingProblem.get_actions, so the two traversals are never mixed.
+# Both searches return the same solutions (a list of nodes to visit excluding the initial state) as the searches in search.py
+
+'''
+In all of the following functions:
+
+    forward, backward: the problems searched from the initial state and from the goal respectively
+
+    reached: dictionary that maps each state reached by a search to its node in the node store of that search
+
+    nodes: node store of each search, the path of a node in the backward search is the path from the goal in the reversed graph
+'''
+
+# Join the path from the initial state to the meeting node with the path from the meeting node to the goal
+# In the graph routing problem, the action is the next node, so the backward path [x1, ..., meeting] found from the goal
+# becomes [x(k-1), ..., x1, goal] after the meeting node in the original graph
+def join_paths(goal: GraphNode, forward_path: List[GraphNode], backward_path: List[GraphNode]) -> List[GraphNode]:
+    backward_states = [goal] + backward_path
+    return forward_path + backward_states[-2::-1]
+
+def BidirectionalBreadthFirstSearch(problem: GraphRoutingProblem, initial_state: GraphNode) -> Solution:
+    '''
+    Bidirectional Breadth First Search runs two BFS, one from the initial state and one from the goal on the reversed graph.
+    Each step expands a whole level of the search with the smaller frontier, and the search stops as soon as
+    a generated state was already reached by the other search. Each search only needs to go half way,
+    so it expands about O(b^(d/2)) nodes instead of O(b^d). It returns the path with the fewest edges.
+    '''
+
+    if problem.is_goal(initial_state):
+        return []
+
+    # build the reversed problem (the reversed adjacency is built once and cached in the problem)
+    forward, backward = problem, problem.reversed(initial_state)
+
+    # the frontier, the node store and the reached states for each direction
+    frontiers = (deque([initial_state]), deque([backward.get_initial_state()]))
+    nodes = (NodeStore(), NodeStore())
+    reached: Tuple[Dict[GraphNode, int], Dict[GraphNode, int]] = ({initial_state: NodeStore.ROOT}, {backward.get_initial_state(): NodeStore.ROOT})
+
+    # loop while both frontiers are not empty
+    while frontiers[0] and frontiers[1]:
+
+        # expand a whole level in the direction with the smaller frontier
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        search, frontier, side_nodes, side_reached, other_reached = (forward, backward)[side], frontiers[side], nodes[side], reached[side], reached[1 - side]
+
+        for _ in range(len(frontier)):
+            state = frontier.popleft()
+            node = side_reached[state]
+            for action in search.get_actions(state):
+                new_state = search.get_successor(state, action)
+                if new_state in side_reached:
+                    continue
+                new_node = side_nodes.add(node, action)
+                side_reached[new_state] = new_node
+
+                # the two searches met, join the two halves of the path
+                if new_state in other_reached:
+                    forward_node, backward_node = (new_node, other_reached[new_state]) if side == 0 else (other_reached[new_state], new_node)
+                    return join_paths(problem.goal, nodes[0].path(forward_node), nodes[1].path(backward_node))
+
+                frontier.append(new_state)
+    return None
+
+def BidirectionalAStarSearch(problem: GraphRoutingProblem, initial_state: GraphNode, heuristic: HeuristicFunction) -> Solution:
+    '''
+    Bidirectional A* runs two A* searches, one from the initial state towards the goal and one from the goal
+    towards the initial state on the reversed graph. The two searches are balanced with average potentials:
+    for every state v, p(v) = (h(v, goal) - h(v, initial state)) / 2 where h is the heuristic on the forward and the reversed problems.
+    The forward search orders its frontier by g(v) + p(v) and the backward search by g(v) - p(v).
+    If the heuristic is consistent, both potentials are consistent too (they are the average of two consistent heuristics),
+    so, like in A*, a state is never expanded twice by the same search.
+    Unlike front-to-end searches that each use their own heuristic, both searches use the same potential (with opposite signs),
+    so the sum of their keys on a path through v does not depend on v. This gives the balanced stopping rule:
+    the search stops when the sum of the lowest keys of the two frontiers is not lower than the cost of the best path found (mu),
+    since every path that was not found yet costs at least that sum.
+    Each step expands the state with the lowest key in the direction with the smaller frontier.
+    Every time a state is reached by both searches, the cost of the path through it is a candidate solution.
+    '''
+
+    if problem.is_goal(initial_state):
+        return []
+
+    # build the reversed problem (the reversed adjacency is built once and cached in the problem)
+    forward, backward = problem, problem.reversed(initial_state)
+    searches = (forward, backward)
+
+    # the potential of a state in each direction (the forward potential and its opposite)
+    def potential(side: int, state: GraphNode) -> float:
+        value = (heuristic(forward, state) - heuristic(backward, state)) / 2
+        return value if side == 0 else -value
+
+    # the frontier, the node store, the explored set and the reached states (with their cummulative path cost) for each direction
+    frontiers = (IndexedPriorityQueue(), IndexedPriorityQueue())
+    nodes = (NodeStore(), NodeStore())
+    explored = (set(), set())
+    reached: Tuple[Dict[GraphNode, Tuple[float, int]], Dict[GraphNode, Tuple[float, int]]] = ({}, {})
+    for side, search in enumerate(searches):
+        start = search.get_initial_state()
+        reached[side][start] = (0, NodeStore.ROOT)
+        frontiers[side].push(start, potential(side, start), (0, NodeStore.ROOT))
+
+    # the cost of the best path found so far (mu) and the nodes of the two searches where it meets
+    best_cost, meeting = float('inf'), None
+
+    # loop while both frontiers are not empty
+    while frontiers[0] and frontiers[1]:
+
+        # stop if no path cheaper than the best path can be found
+        if frontiers[0].peek()[0] + frontiers[1].peek()[0] >= best_cost:
+            break
+
+        # expand the node with the lowest key in the direction with the smaller frontier
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        search, frontier, side_nodes, side_reached, other_reached = searches[side], frontiers[side], nodes[side], reached[side], reached[1 - side]
+        _, state, (path_cost, node) = frontier.pop()
+        explored[side].add(state)
+
+        for action in search.get_actions(state):
+            new_state = search.get_successor(state, action)
+            if new_state in explored[side]:
+                continue
+            new_path_cost = path_cost + search.get_cost(state, action)
+            if new_state in side_reached and new_path_cost >= side_reached[new_state][0]:
+                continue
+            new_node = side_nodes.add(node, action)
+            side_reached[new_state] = (new_path_cost, new_node)
+            frontier.push(new_state, new_path_cost + potential(side, new_state), (new_path_cost, new_node))
+
+            # the state was reached by the other search, check if the path through it is the best path so far
+            if new_state in other_reached:
+                other_cost, other_node = other_reached[new_state]
+                if new_path_cost + other_cost < best_cost:
+                    best_cost = new_path_cost + other_cost
+                    meeting = (new_node, other_node) if side == 0 else (other_node, new_node)
+
+    if meeting is None:
+        return None
+    return join_paths(problem.goal, nodes[0].path(meeting[0]), nodes[1].path(meeting[1]))
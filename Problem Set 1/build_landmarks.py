@@ -0,0 +1,32 @@
+from compact_graph import CompactGraphRoutingProblem
+from landmarks import LANDMARK_COUNT, LANDMARK_DIRECTORY, build_landmarks, landmark_file_name, save_landmarks
+import argparse, glob, os, time
+
+# This script computes the landmark tables used by landmark_heuristic (see landmarks.py) for the given graphs
+# The graphs can be JSON graphs or compact graph files (see convert_graph.py), and each graph gets a single file named by a hash of the graph
+# Example: python build_landmarks.py graphs/*.json --count 16
+
+def main(args: argparse.Namespace):
+    os.makedirs(args.output, exist_ok=True)
+    for pattern in args.graphs:
+        for path in sorted(glob.glob(pattern)):
+            graph = CompactGraphRoutingProblem.from_file(path).graph
+            count = min(args.count, graph.node_count)
+            output = os.path.join(args.output, landmark_file_name(graph, count))
+            if os.path.exists(output) and not args.force:
+                print(f"{path}: {output} already exists")
+                continue
+            start = time.perf_counter()
+            tables = build_landmarks(graph, count)
+            save_landmarks(output, graph.node_count, tables)
+            print(f"{path}: {output} landmarks={','.join(graph.name(node) for node in tables.landmarks)} "
+                  f"size={os.path.getsize(output) / 1024:.1f}KB time={time.perf_counter() - start:.4f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the landmark tables of the graph routing problems")
+    parser.add_argument("graphs", nargs="+", help="the graphs (or glob patterns) to build the landmark tables for")
+    parser.add_argument("--count", "-k", type=int, default=LANDMARK_COUNT, help="the number of landmarks")
+    parser.add_argument("--output", "-o", default=LANDMARK_DIRECTORY, help="the directory where the landmark tables are stored")
+    parser.add_argument("--force", "-f", action="store_true", help="rebuild the landmark tables that already exist")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,38 @@
+from sokoban import SokobanProblem
+from sokoban_heuristic import (PATTERN_DATABASE_DIRECTORY, PATTERN_SIZE, build_pattern_database, get_pattern_squares,
+                               pattern_database_name, save_pattern_database, PATTERN_UNREACHABLE)
+import argparse, glob, os, time
+
+# This script builds the pattern databases used by pattern_database_heuristic (see sokoban_heuristic.py) for the given levels
+# Each layout gets a single file (named by a hash of the layout), so levels sharing a layout share the same database
+# The heuristic loads the databases of the size SOKOBAN_PATTERN_SIZE (default: 2) from the directory SOKOBAN_PATTERN_DATABASES,
+# so set the same environment variables when building databases of another size (or in another directory) and when solving the levels:
+#   SOKOBAN_PATTERN_SIZE=3 python build_pattern_databases.py levels/*.txt
+#   SOKOBAN_PATTERN_SIZE=3 python play_sokoban.py levels/level4.txt -a astar -hf pdb
+
+def main(args: argparse.Namespace):
+    os.makedirs(args.output, exist_ok=True)
+    for pattern in args.levels:
+        for path in sorted(glob.glob(pattern)):
+            problem = SokobanProblem.from_file(path)
+            pattern_size = min(args.size, len(problem.get_initial_state().crates))
+            output = os.path.join(args.output, pattern_database_name(problem.layout, pattern_size))
+            if os.path.exists(output) and not args.force:
+                print(f"{path}: {output} already exists")
+                continue
+            start = time.perf_counter()
+            squares = get_pattern_squares(problem)
+            table = build_pattern_database(problem, pattern_size)
+            save_pattern_database(output, pattern_size, len(squares), table)
+            reachable = sum(value != PATTERN_UNREACHABLE for value in table)
+            print(f"{path}: {output} pattern size={pattern_size} entries={len(table)} reachable={reachable} "
+                  f"size={os.path.getsize(output) / 1024:.1f}KB time={time.perf_counter() - start:.4f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the sokoban pattern databases")
+    parser.add_argument("levels", nargs="+", help="the sokoban levels (or glob patterns) to build the pattern databases for")
+    parser.add_argument("--size", "-k", type=int, default=PATTERN_SIZE, help="the number of crates in each pattern (default: SOKOBAN_PATTERN_SIZE or 2)")
+    parser.add_argument("--output", "-o", default=PATTERN_DATABASE_DIRECTORY, help="the directory where the pattern databases are stored (default: SOKOBAN_PATTERN_DATABASES or pattern_databases)")
+    parser.add_argument("--force", "-f", action="store_true", help="rebuild the pattern databases that already exist")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,336 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+from dataclasses import dataclass
+from array import array
+import json, math, mmap, struct, sys
+
+from problem import Problem
+from mathutils import Point
+from helpers.utils import record_calls
+
+# This file contains a compact representation of the graph routing problem for large graphs (such as road graphs with millions of nodes)
+# The nodes are integer ids and the graph is stored in the CSR (compressed sparse row) format:
+#   offsets[node] .. offsets[node + 1] is the range of the edges of the node in "targets",
+#   xs[node], ys[node] is the position of the node,
+#   name_offsets[node] .. name_offsets[node + 1] is the range of the (utf-8) name of the node in "names".
+# The node ids are assigned in the order of the node names, so the edges of each node (sorted by id) are sorted by name
+# like the adjacency lists of GraphRoutingProblem.from_file, and the searches explore the nodes in the same order.
+#
+# The graphs can be read from the JSON files of GraphRoutingProblem with a streaming parser (read_compact_graph_json)
+# which never holds the whole JSON document in memory, or they can be converted once (see convert_graph.py)
+# to a binary file (save_compact_graph) which is memory-mapped when it is loaded (load_compact_graph), so loading is almost instant.
+
+# The binary file header: magic, the number of nodes, the number of edges, the start node, the goal node,
+# the length of the names in bytes and the byte order of the arrays (0: little, 1: big)
+COMPACT_GRAPH_HEADER = struct.Struct("<8sQQqqQB7x")
+COMPACT_GRAPH_MAGIC = b"GRAPHCSR"
+# The arrays are stored after the header in this order with these typecodes, each padded to a multiple of 8 bytes
+# (the offsets and the names offsets have one more entry than the number of nodes)
+COMPACT_GRAPH_ARRAYS = (("offsets", 'q'), ("targets", 'i'), ("xs", 'd'), ("ys", 'd'), ("name_offsets", 'q'))
+
+@dataclass(eq=False, frozen=True)
+class CompactGraph:
+    offsets: memoryview         # The range of the edges of every node in targets (node_count + 1 entries)
+    targets: memoryview         # The target node of every edge
+    xs: memoryview              # The x coordinate of every node
+    ys: memoryview              # The y coordinate of every node
+    name_offsets: memoryview    # The range of the name of every node in names (node_count + 1 entries)
+    names: memoryview           # The utf-8 names of all the nodes (concatenated in the order of the ids, so they are sorted)
+    start: int
+    goal: int
+
+    @property
+    def node_count(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    # Return the name of a node
+    def name(self, node: int) -> str:
+        return bytes(self.names[self.name_offsets[node]:self.name_offsets[node + 1]]).decode()
+
+    # Return the id of the node with the given name (or None if there is no such node)
+    # The names are sorted by id, so this is a binary search
+    def find(self, name: str) -> Optional[int]:
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.name(middle) < name:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.node_count and self.name(low) == name else None
+
+    # Return the graph where every edge is reversed (the edges of a node are the nodes that lead to it)
+    # The sources are visited in the order of their ids, so the reversed edges of every node are also sorted by id
+    def reversed(self) -> 'CompactGraph':
+        offsets, targets = self.offsets, self.targets
+        counts = array('q', [0]) * (self.node_count + 1)
+        for target in targets:
+            counts[target + 1] += 1
+        for node in range(self.node_count):
+            counts[node + 1] += counts[node]
+        reversed_offsets = array('q', counts)
+        reversed_targets = array('i', [0]) * len(targets)
+        for source in range(self.node_count):
+            for edge in range(offsets[source], offsets[source + 1]):
+                target = targets[edge]
+                reversed_targets[counts[target]] = source
+                counts[target] += 1
+        return CompactGraph(memoryview(reversed_offsets), memoryview(reversed_targets), self.xs, self.ys,
+                            self.name_offsets, self.names, self.goal, self.start)
+
+# This is a minimal streaming JSON reader which reads the objects of a file member by member
+# The values inside the objects are decoded by the standard json module one at a time, so only a single value is held in memory
+class JSONStream:
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, file: TextIO) -> None:
+        self.file = file
+        self.buffer = ""
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    # Read the next chunk of the file and drop the part of the buffer that was already parsed (returns False at the end of the file)
+    def fill(self) -> bool:
+        chunk = self.file.read(JSONStream.CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    # Skip the whitespace and return the next character without consuming it (or an empty string at the end of the file)
+    def peek(self) -> str:
+        while True:
+            buffer, position = self.buffer, self.position
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            self.position = position
+            if position < len(buffer):
+                return buffer[position]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found}' in the JSON stream")
+        self.position += 1
+
+    # Read a complete value (a string, a number, a list or an object)
+    def read_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # the value continues in the next chunk
+                if not self.fill():
+                    raise
+                continue
+            # a number at the end of the buffer may also continue in the next chunk
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.position = end
+            return value
+
+    # Iterate over the keys of an object, the caller must read the value of each key (with read_value or iterate_object)
+    def iterate_object(self) -> Iterator[str]:
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.position += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or '}}' but found '{char}' in the JSON stream")
+
+# Read a graph from a JSON file of GraphRoutingProblem (the same format as GraphRoutingProblem.from_file) with a streaming parser
+# The nodes get temporary ids in the order they are mentioned (as a node or as an adjacent node),
+# then the nodes that are defined in the graph are sorted by name to get their final ids and the edges are grouped into the CSR arrays.
+# Like GraphRoutingProblem.from_file, the adjacent nodes that are not defined in the graph are ignored.
+def read_compact_graph_json(path: str) -> CompactGraph:
+    ids: Dict[str, int] = {}
+    names: List[str] = []
+    defined = bytearray()
+    xs, ys = array('d'), array('d')
+    sources, targets = array('i'), array('i')
+
+    def get_id(name: str) -> int:
+        node = ids.get(name)
+        if node is None:
+            node = ids[name] = len(names)
+            names.append(name)
+            defined.append(0)
+            xs.append(0.0)
+            ys.append(0.0)
+        return node
+
+    members = {}
+    with open(path, 'r') as f:
+        stream = JSONStream(f)
+        for key in stream.iterate_object():
+            if key != "graph":
+                members[key] = stream.read_value()
+                continue
+            for name in stream.iterate_object():
+                item = stream.read_value()
+                node = get_id(name)
+                defined[node] = 1
+                xs[node], ys[node] = item.get("position", [0, 0])
+                for adjacent in item.get("adjacent", []):
+                    sources.append(node)
+                    targets.append(get_id(adjacent))
+
+    # assign the final ids in the order of the names and drop the nodes that are not defined
+    order = sorted((node for node in range(len(names)) if defined[node]), key=names.__getitem__)
+    final = array('i', [-1]) * len(names)
+    for index, node in enumerate(order):
+        final[node] = index
+    node_count = len(order)
+
+    # count the edges of every node then place them in their ranges
+    offsets = array('q', [0]) * (node_count + 1)
+    for source, target in zip(sources, targets):
+        if final[target] >= 0:
+            offsets[final[source] + 1] += 1
+    for node in range(node_count):
+        offsets[node + 1] += offsets[node]
+    edges = array('i', [0]) * offsets[node_count]
+    positions = array('q', offsets[:node_count])
+    for source, target in zip(sources, targets):
+        target = final[target]
+        if target >= 0:
+            source = final[source]
+            edges[positions[source]] = target
+            positions[source] += 1
+    del sources, targets, positions
+    # sort the edges of every node by id (which is the order of the names)
+    for node in range(node_count):
+        begin, end = offsets[node], offsets[node + 1]
+        if end - begin > 1:
+            edges[begin:end] = array('i', sorted(edges[begin:end]))
+
+    encoded = [names[node].encode() for node in order]
+    name_offsets = array('q', [0]) * (node_count + 1)
+    for index, name in enumerate(encoded):
+        name_offsets[index + 1] = name_offsets[index] + len(name)
+    start, goal = final[ids[members.get("start", "")]], final[ids[members.get("goal", "")]]
+    if start < 0 or goal < 0:
+        raise KeyError("The start and the goal must be nodes of the graph")
+    return CompactGraph(
+        memoryview(offsets), memoryview(edges),
+        memoryview(array('d', (xs[node] for node in order))), memoryview(array('d', (ys[node] for node in order))),
+        memoryview(name_offsets), memoryview(b"".join(encoded)), start, goal
+    )
+
+# Write a compact graph to a binary file
+def save_compact_graph(path: str, graph: CompactGraph):
+    with open(path, 'wb') as f:
+        f.write(COMPACT_GRAPH_HEADER.pack(COMPACT_GRAPH_MAGIC, graph.node_count, graph.edge_count, graph.start, graph.goal,
+                                          len(graph.names), sys.byteorder == "big"))
+        for name, _ in COMPACT_GRAPH_ARRAYS:
+            data = getattr(graph, name).tobytes()
+            f.write(data)
+            f.write(bytes(-len(data) % 8))
+        f.write(graph.names.tobytes())
+
+# Check if a file is a compact graph file (by reading its magic)
+def is_compact_graph_file(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(COMPACT_GRAPH_MAGIC)) == COMPACT_GRAPH_MAGIC
+
+# Memory-map a compact graph file, the arrays are views of the mapping so the pages are only read when they are used
+def load_compact_graph(path: str) -> CompactGraph:
+    with open(path, 'rb') as f:
+        header = f.read(COMPACT_GRAPH_HEADER.size)
+        if len(header) < COMPACT_GRAPH_HEADER.size:
+            raise ValueError(f"{path} is not a compact graph file")
+        magic, node_count, edge_count, start, goal, names_size, big_endian = COMPACT_GRAPH_HEADER.unpack(header)
+        if magic != COMPACT_GRAPH_MAGIC:
+            raise ValueError(f"{path} is not a compact graph file")
+        if bool(big_endian) != (sys.byteorder == "big"):
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # the memoryviews keep the mapping alive as long as the graph is used
+    view = memoryview(mapping)
+    arrays, position = {}, COMPACT_GRAPH_HEADER.size
+    lengths = {"offsets": node_count + 1, "targets": edge_count, "xs": node_count, "ys": node_count, "name_offsets": node_count + 1}
+    for name, typecode in COMPACT_GRAPH_ARRAYS:
+        size = lengths[name] * array(typecode).itemsize
+        arrays[name] = view[position:position + size].cast(typecode)
+        position += size + (-size % 8)
+    return CompactGraph(names=view[position:position + names_size], start=start, goal=goal, **arrays)
+
+# This is the graph routing problem over a compact graph where the states and the actions are integer node ids
+# It has the same initial state, goal, actions (in the same order) and costs as GraphRoutingProblem on the same graph,
+# so the searches return the same paths (as node ids, use "graph.name" to get the names)
+class CompactGraphRoutingProblem(Problem[int, int]):
+    def __init__(self, graph: CompactGraph, start: Optional[int] = None, goal: Optional[int] = None) -> None:
+        super().__init__()
+        self.graph = graph
+        self.start = graph.start if start is None else start
+        self.goal = graph.goal if goal is None else goal
+
+    def get_initial_state(self) -> int:
+        return self.start
+
+    def is_goal(self, state: int) -> bool:
+        return state == self.goal
+
+    # The actions for this problem are the neighboring nodes we can reach from the current node
+    # This is a view of the targets array, so no list is allocated
+    # We use @record_calls to track the arguments with which this function is called to retrieve the traversal order (like GraphRoutingProblem)
+    @record_calls
+    def get_actions(self, state: int) -> Iterable[int]:
+        offsets = self.graph.offsets
+        return self.graph.targets[offsets[state]:offsets[state + 1]]
+
+    # The next state and the action are the exact same thing for this problem
+    def get_successor(self, state: int, action: int) -> int:
+        return action
+
+    # The cost of an action is the distance between the current node and the next node (computed like euclidean_distance)
+    def get_cost(self, state: int, action: int) -> float:
+        xs, ys = self.graph.xs, self.graph.ys
+        dx, dy = xs[state] - xs[action], ys[state] - ys[action]
+        return math.sqrt(dx * dx + dy * dy)
+
+    # Return the position of a node as a point
+    def position(self, node: int) -> Point:
+        return Point(self.graph.xs[node], self.graph.ys[node])
+
+    # Return the reversed problem which searches from the goal back to the given start (the initial state by default)
+    # The reversed graph is built once then stored in the problem cache
+    def reversed(self, start: Optional[int] = None) -> 'ReversedCompactGraphRoutingProblem':
+        cache = self.cache()
+        graph = cache.get("reversed_graph")
+        if graph is None:
+            graph = cache["reversed_graph"] = self.graph.reversed()
+        return ReversedCompactGraphRoutingProblem(graph, self.goal, self.start if start is None else start)
+
+    # Read the problem from a compact graph file (memory-mapped) or from a JSON graph file (with the streaming parser)
+    @staticmethod
+    def from_file(path: str) -> 'CompactGraphRoutingProblem':
+        graph = load_compact_graph(path) if is_compact_graph_file(path) else read_compact_graph_json(path)
+        return CompactGraphRoutingProblem(graph)
+
+# This is the problem searched backwards by the bidirectional searches (see CompactGraphRoutingProblem.reversed)
+# It records the calls of get_actions separately (like ReversedGraphRoutingProblem), so the nodes expanded by the backward search
+# are not mixed with the traversal of the forward search
+class ReversedCompactGraphRoutingProblem(CompactGraphRoutingProblem):
+    @record_calls
+    def get_actions(self, state: int) -> Iterable[int]:
+        offsets = self.graph.offsets
+        return self.graph.targets[offsets[state]:offsets[state + 1]]
+
+def compact_graph_heuristic(problem: CompactGraphRoutingProblem, state: int) -> float:
+    return problem.get_cost(state, problem.goal)
@@ -0,0 +1,32 @@
+from compact_graph import read_compact_graph_json, save_compact_graph
+import argparse, glob, os, time
+
+# This script converts the JSON graph files of the graph routing problem to compact graph files (see compact_graph.py)
+# which are memory-mapped when they are loaded by CompactGraphRoutingProblem.from_file
+# The output file is next to the input file with the extension ".csr" unless an output directory is given
+# Example: python convert_graph.py graphs/*.json --output compact_graphs
+
+def main(args: argparse.Namespace):
+    if args.output is not None:
+        os.makedirs(args.output, exist_ok=True)
+    for pattern in args.graphs:
+        for path in sorted(glob.glob(pattern)):
+            output = os.path.splitext(path)[0] + ".csr"
+            if args.output is not None:
+                output = os.path.join(args.output, os.path.basename(output))
+            if os.path.exists(output) and not args.force:
+                print(f"{path}: {output} already exists")
+                continue
+            start = time.perf_counter()
+            graph = read_compact_graph_json(path)
+            save_compact_graph(output, graph)
+            print(f"{path}: {output} nodes={graph.node_count} edges={graph.edge_count} "
+                  f"size={os.path.getsize(output) / 1024:.1f}KB time={time.perf_counter() - start:.4f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert JSON graphs to compact graph files")
+    parser.add_argument("graphs", nargs="+", help="the JSON graphs (or glob patterns) to convert")
+    parser.add_argument("--output", "-o", default=None, help="the directory where the compact graphs are written (next to the JSON graphs by default)")
+    parser.add_argument("--force", "-f", action="store_true", help="convert the graphs whose compact graph file already exists")
+    args = parser.parse_args()
+    main(args)
@@ -47,6 +47,24 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
     def get_cost(self, state: GraphNode, action: GraphNode) -> float:
         return euclidean_distance(state.position, action.position)
     
+    # Return the reversed problem which searches from the goal back to the given start (the initial state by default)
+    # Every edge is reversed so the actions of a node are the nodes that lead to it in the original graph
+    # The reversed adjacency is built once then stored in the problem cache
+    # The reversed problem records its expanded nodes separately (see ReversedGraphRoutingProblem)
+    def reversed(self, start: GraphNode = None) -> 'ReversedGraphRoutingProblem':
+        cache = self.cache()
+        adjacency = cache.get("reversed_adjacency")
+        if adjacency is None:
+            adjacency = {node: [] for node in self.adjacency}
+            for node, adjacent in self.adjacency.items():
+                for neighbor in adjacent:
+                    adjacency.setdefault(neighbor, []).append(node)
+            # sort the reversed adjacency lists by name like from_file does for the original adjacency lists
+            for adjacent in adjacency.values():
+                adjacent.sort(key=lambda node: node.name)
+            cache["reversed_adjacency"] = adjacency
+        return ReversedGraphRoutingProblem(self.goal, self.start if start is None else start, adjacency)
+
     # Read a graph routing problem from file
     @staticmethod
     def from_file(path: str) -> 'GraphRoutingProblem':
@@ -62,5 +80,13 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
         goal = node_dict[problem_def.get("goal", "")]
         return GraphRoutingProblem(start, goal, adjacency)
 
+# This is the problem searched backwards by the bidirectional searches (see GraphRoutingProblem.reversed)
+# Its get_actions records its calls in its own list, so the traversal order recorded for GraphRoutingProblem.get_actions
+# only contains the nodes expanded by the forward search. The backward traversal is retrieved from ReversedGraphRoutingProblem.get_actions
+class ReversedGraphRoutingProblem(GraphRoutingProblem):
+    @record_calls
+    def get_actions(self, state: GraphNode) -> Iterable[GraphNode]:
+        return self.adjacency.get(state, [])
+
 def graphrouting_heuristic(problem: GraphRoutingProblem, state: GraphNode) -> float:
     return euclidean_distance(state.position, problem.goal.position)
\ No newline at end of file
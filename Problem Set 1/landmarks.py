@@ -0,0 +1,184 @@
+from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass
+from array import array
+import hashlib, heapq, math, mmap, os, struct, sys
+
+from graph import GraphNode, GraphRoutingProblem, graphrouting_heuristic
+from compact_graph import CompactGraph, CompactGraphRoutingProblem
+
+# This file contains the landmark (ALT: A*, Landmarks and the Triangle inequality) heuristic for the graph routing problems.
+# A few nodes are selected as landmarks and, for every landmark L, Dijkstra computes the distances from L to every node (d(L, v))
+# and from every node to L (d(v, L), using the reversed graph). By the triangle inequality, for every node v and the goal g:
+#   d(v, g) >= d(L, g) - d(L, v)    and    d(v, g) >= d(v, L) - d(g, L)
+# so the maximum of these bounds over all the landmarks is an admissible heuristic. Since the edges may detour,
+# it is usually much closer to the actual distance than the straight-line distance, so A* expands fewer nodes.
+# The landmarks are selected by the farthest point method: each new landmark is the node that is the farthest from the selected ones.
+#
+# The distance tables are stored in LANDMARK_DIRECTORY (one file per graph, named by a hash of the graph) as arrays of doubles
+# which are memory-mapped when they are loaded. If there is no file for a graph, the tables are computed when the heuristic is first called.
+# Use build_landmarks.py to compute and store the tables of the graphs offline.
+
+LANDMARK_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "landmarks")
+LANDMARK_COUNT = 8
+# The file header: magic, the number of nodes, the number of landmarks and the byte order of the tables (0: little, 1: big)
+LANDMARK_HEADER = struct.Struct("<8sQQB7x")
+LANDMARK_MAGIC = b"GRAPHALT"
+
+@dataclass(frozen=True)
+class LandmarkTables:
+    landmarks: Tuple[int, ...] # The node ids of the landmarks
+    forward: memoryview        # forward[i * node_count + v] is the distance from landmark 'i' to node 'v' (inf if unreachable)
+    backward: memoryview       # backward[i * node_count + v] is the distance from node 'v' to landmark 'i' (inf if unreachable)
+
+# Return the compact graph of a problem and the id of every node (None if the states are already node ids)
+# The compact graph of a GraphRoutingProblem is built once (with the node ids in the order of the names) and stored in the problem cache
+def get_landmark_graph(problem: Union[GraphRoutingProblem, CompactGraphRoutingProblem]) -> Tuple[CompactGraph, Optional[Dict[GraphNode, int]]]:
+    if isinstance(problem, CompactGraphRoutingProblem):
+        return problem.graph, None
+    cache = problem.cache()
+    graph = cache.get("landmark_graph")
+    if graph is None:
+        nodes = sorted(set(problem.adjacency) | {problem.start, problem.goal}, key=lambda node: node.name)
+        ids = {node: index for index, node in enumerate(nodes)}
+        offsets, targets = array('q', [0]), array('i')
+        for node in nodes:
+            targets.extend(ids[neighbor] for neighbor in problem.adjacency.get(node, []))
+            offsets.append(len(targets))
+        encoded = [node.name.encode() for node in nodes]
+        name_offsets = array('q', [0])
+        for name in encoded:
+            name_offsets.append(name_offsets[-1] + len(name))
+        compact = CompactGraph(
+            memoryview(offsets), memoryview(targets),
+            memoryview(array('d', (node.position.x for node in nodes))), memoryview(array('d', (node.position.y for node in nodes))),
+            memoryview(name_offsets), memoryview(b"".join(encoded)), ids[problem.start], ids[problem.goal]
+        )
+        graph = cache["landmark_graph"] = (compact, ids)
+    return graph
+
+# Compute the distances from the source to every node with Dijkstra (the edge costs are the euclidean distances like get_cost)
+def dijkstra(graph: CompactGraph, source: int) -> array:
+    offsets, targets, xs, ys = graph.offsets, graph.targets, graph.xs, graph.ys
+    distances = array('d', [math.inf]) * graph.node_count
+    distances[source] = 0.0
+    frontier = [(0.0, source)]
+    while frontier:
+        distance, node = heapq.heappop(frontier)
+        if distance > distances[node]:
+            continue
+        x, y = xs[node], ys[node]
+        for edge in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[edge]
+            dx, dy = x - xs[neighbor], y - ys[neighbor]
+            new_distance = distance + math.sqrt(dx * dx + dy * dy)
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                heapq.heappush(frontier, (new_distance, neighbor))
+    return distances
+
+# Select the landmarks with the farthest point method and compute their distance tables
+# The first landmark is the node that is the farthest from node 0, then each landmark is the node whose distance
+# from the nearest selected landmark is the largest (only the nodes reachable from the landmarks are considered)
+def build_landmarks(graph: CompactGraph, count: int = LANDMARK_COUNT) -> LandmarkTables:
+    node_count = graph.node_count
+    reversed_graph = graph.reversed()
+    count = min(count, node_count)
+    landmarks: List[int] = []
+    forward, backward = array('d'), array('d')
+    nearest = dijkstra(graph, 0) if node_count else array('d')
+    for _ in range(count):
+        candidates = [node for node in range(node_count) if node not in landmarks and nearest[node] != math.inf]
+        if not candidates:
+            candidates = [node for node in range(node_count) if node not in landmarks]
+        landmark = max(candidates, key=nearest.__getitem__)
+        landmarks.append(landmark)
+        distances = dijkstra(graph, landmark)
+        forward.extend(distances)
+        backward.extend(dijkstra(reversed_graph, landmark))
+        if len(landmarks) == 1:
+            nearest = distances
+        else:
+            nearest = array('d', map(min, nearest, distances))
+    return LandmarkTables(tuple(landmarks), memoryview(forward), memoryview(backward))
+
+# The name of the landmark file of a graph (a hash of the graph arrays and the number of landmarks)
+def landmark_file_name(graph: CompactGraph, count: int) -> str:
+    digest = hashlib.sha256()
+    for data in (graph.offsets, graph.targets, graph.xs, graph.ys):
+        digest.update(data.tobytes())
+    return f"{digest.hexdigest()[:16]}_{count}.alt"
+
+# Write the landmark tables to a file
+def save_landmarks(path: str, node_count: int, tables: LandmarkTables):
+    with open(path, 'wb') as f:
+        f.write(LANDMARK_HEADER.pack(LANDMARK_MAGIC, node_count, len(tables.landmarks), sys.byteorder == "big"))
+        array('q', tables.landmarks).tofile(f)
+        f.write(tables.forward.tobytes())
+        f.write(tables.backward.tobytes())
+
+# Memory-map the landmark tables of a file, or return None if the file does not match the expected number of nodes and landmarks
+def load_landmarks(path: str, node_count: int, count: int) -> Optional[LandmarkTables]:
+    with open(path, 'rb') as f:
+        header = f.read(LANDMARK_HEADER.size)
+        if len(header) < LANDMARK_HEADER.size:
+            return None
+        magic, file_node_count, file_count, big_endian = LANDMARK_HEADER.unpack(header)
+        if (magic, file_node_count, file_count, bool(big_endian)) != (LANDMARK_MAGIC, node_count, count, sys.byteorder == "big"):
+            return None
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # the memoryviews keep the mapping alive as long as the tables are used
+    view = memoryview(mapping)[LANDMARK_HEADER.size:]
+    landmarks = tuple(view[:8 * count].cast('q'))
+    size = 8 * count * node_count
+    forward = view[8 * count:8 * count + size].cast('d')
+    backward = view[8 * count + size:8 * count + 2 * size].cast('d')
+    return LandmarkTables(landmarks, forward, backward)
+
+# Get the landmark tables of the problem graph from the problem cache, the landmark file, or compute them
+# (the number of landmarks is LANDMARK_COUNT by default, or the number of nodes if there are fewer nodes)
+def get_landmarks(problem: Union[GraphRoutingProblem, CompactGraphRoutingProblem], count: Optional[int] = None) -> LandmarkTables:
+    # the count is clamped before the lookup so the tables are found under the same key they are stored with
+    graph, _ = get_landmark_graph(problem)
+    count = min(count or LANDMARK_COUNT, graph.node_count)
+    cache = problem.cache()
+    tables = cache.get(("landmarks", count))
+    if tables is None:
+        path = os.path.join(LANDMARK_DIRECTORY, landmark_file_name(graph, count))
+        tables = load_landmarks(path, graph.node_count, count) if os.path.exists(path) else None
+        if tables is None:
+            tables = build_landmarks(graph, count)
+        cache[("landmarks", count)] = tables
+    return tables
+
+# This heuristic is the maximum of the straight-line distance and the landmark lower bounds (see the top of this file)
+# The distances between the landmarks and the goal are the same for every state, so they are computed once per goal and cached.
+# Both bounds are admissible, so their maximum is admissible.
+def landmark_heuristic(problem: Union[GraphRoutingProblem, CompactGraphRoutingProblem], state: Union[GraphNode, int]) -> float:
+    tables = get_landmarks(problem)
+    graph, ids = get_landmark_graph(problem)
+    node_count = graph.node_count
+    cache = problem.cache()
+    goal = problem.goal if ids is None else ids[problem.goal]
+    goal_distances = cache.get(("landmark_goal", goal))
+    if goal_distances is None:
+        goal_distances = cache[("landmark_goal", goal)] = [
+            (i * node_count, tables.forward[i * node_count + goal], tables.backward[i * node_count + goal])
+            for i in range(len(tables.landmarks))
+        ]
+    if ids is None:
+        node = state
+        heuristic = problem.get_cost(state, goal)
+    else:
+        node = ids[state]
+        heuristic = graphrouting_heuristic(problem, state)
+    forward, backward = tables.forward, tables.backward
+    for offset, from_landmark_to_goal, from_goal_to_landmark in goal_distances:
+        from_landmark = forward[offset + node]
+        to_landmark = backward[offset + node]
+        # a bound is skipped if the landmark does not reach the node (or the goal does not reach the landmark) since it is -inf
+        # otherwise, if the landmark does not reach the goal (or the node does not reach the landmark), the goal can not be reached (inf)
+        if from_landmark != math.inf:
+            heuristic = max(heuristic, from_landmark_to_goal - from_landmark)
+        if from_goal_to_landmark != math.inf:
+            heuristic = max(heuristic, to_landmark - from_goal_to_landmark)
+    return heuristic
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Iterator
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
 import math
 
 # the class Point will hold a 2D coordinate on a discrete grid
@@ -14,14 +15,15 @@ class Point:
     y: int
 
     # The following functions implement the operators +, -, negative and str
+    # They create the result with _create_point which skips the dataclass constructor since they are called very often
     def __add__(self, other: 'Point') -> 'Point':
-        return Point(self.x + other.x, self.y + other.y)
+        return _create_point(self.x + other.x, self.y + other.y)
     
     def __sub__(self, other: 'Point') -> 'Point':
-        return Point(self.x - other.x, self.y - other.y)
+        return _create_point(self.x - other.x, self.y - other.y)
     
     def __neg__(self) -> 'Point':
-        return Point(-self.x, -self.y)
+        return _create_point(-self.x, -self.y)
     
     def __str__(self) -> str:
         return f'({self.x}, {self.y})'
@@ -32,6 +34,22 @@ class Point:
     def __iter__(self) -> Iterator[int]:
         return iter((self.x, self.y))
 
+    # The default pickling of a frozen class with __slots__ assigns the slots after creating the object which fails,
+    # so the point is pickled as a call to the constructor instead (used to store solutions containing points on disk)
+    def __reduce__(self):
+        return (Point, (self.x, self.y))
+
+# Aliases used to create frozen points without calling their constructor
+_new_object, _set_attribute = object.__new__, object.__setattr__
+
+# Create a point by setting its slots directly
+# The frozen dataclass constructor sets each field with object.__setattr__ anyway, so this only skips the call to the constructor
+def _create_point(x: int, y: int) -> Point:
+    point = _new_object(Point)
+    _set_attribute(point, 'x', x)
+    _set_attribute(point, 'y', y)
+    return point
+
 # This is a helper function to compute the manhattan distance between 2 points
 def manhattan_distance(p1: Point, p2: Point) -> int:
     return abs(p1.x - p2.x) + abs(p1.y - p2.y)
@@ -41,6 +59,31 @@ def euclidean_distance(p1: Point, p2: Point) -> int:
     difference = p1 - p2
     return math.sqrt(difference.x * difference.x + difference.y * difference.y)
 
+# This is a batch version of manhattan_distance which computes the distances from a point to every point in a collection
+# It computes the distances in a single comprehension instead of a function call per point, which is faster in the heuristics
+def manhattan_distances(origin: Point, points: Iterable[Point]) -> List[int]:
+    x, y = origin.x, origin.y
+    return [abs(point.x - x) + abs(point.y - y) for point in points]
+
+# The following functions convert between points and cell indices (y * width + x) on a grid with the given width
+# The cell index is the integer encoding used by the compact sokoban representation, the heuristic tables and the point pools
+def to_cell(point: Point, width: int) -> int:
+    return point.y * width + point.x
+
+def from_cell(cell: int, width: int) -> Point:
+    return Point(cell % width, cell // width)
+
+# This is a helper function that returns the Zobrist key of a feature at a position (for example, a crate or the player at the position)
+# where "index" identifies the feature. A Zobrist hash of a state is the XOR of the keys of all its features,
+# so when a single feature moves, the hash is updated by XORing out the key of its old position and XORing in the key of its new position.
+# The keys are pseudo-random 61-bit integers computed by mixing the inputs (the splitmix64 finalizer), so they are the same across runs
+# and they fit in a Python hash without being hashed again.
+def zobrist_key(index: int, x: int, y: int) -> int:
+    z = (index * 0x9E3779B97F4A7C15 + x * 0xBF58476D1CE4E5B9 + y * 0x94D049BB133111EB + 0x2545F4914F6CDD1D) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return (z ^ (z >> 31)) & 0x1FFFFFFFFFFFFFFF
+
 # This enum represent 4 directions (RIGHT, UP, LEFT, RIGHT)
 class Direction(IntEnum):
     RIGHT = 0
@@ -75,4 +118,39 @@ Direction._Vectors = [
     Point( 0, -1),
     Point(-1,  0),
     Point( 0,  1)
-]
\ No newline at end of file
+]
+
+# A point pool contains a single (interned) point for every cell of a width x height grid,
+# and for every direction, a table containing the cell next to each cell (or -1 if the neighbor is outside the grid).
+# Moving a point inside the grid with "neighbor" returns an existing point instead of allocating a new one,
+# and the point of a cell index is a table lookup (points[cell]).
+# Use get_point_pool to get the pool of a grid size, so the pools are shared by all the problems with the same size.
+class PointPool:
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        # points[cell] is the point at the given cell
+        self.points: Tuple[Point, ...] = tuple(from_cell(cell, width) for cell in range(width * height))
+        # neighbors[direction][cell] is the cell next to the given cell in the given direction (-1 if it is outside the grid)
+        self.neighbors: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(
+                (point.y + vector.y) * width + point.x + vector.x
+                if 0 <= point.x + vector.x < width and 0 <= point.y + vector.y < height else -1
+                for point in self.points
+            )
+            for vector in Direction._Vectors
+        )
+
+    # Return the point next to the given point in the given direction
+    # The point is interned if both points are inside the grid, otherwise a new point is created
+    def neighbor(self, point: Point, direction: Direction) -> Point:
+        if 0 <= point.x < self.width and 0 <= point.y < self.height:
+            cell = self.neighbors[direction][point.y * self.width + point.x]
+            if cell >= 0:
+                return self.points[cell]
+        return point + Direction._Vectors[direction]
+
+# Return the point pool of a width x height grid (the most recently used pools are kept in memory)
+@lru_cache(maxsize=32)
+def get_point_pool(width: int, height: int) -> PointPool:
+    return PointPool(width, height)
@@ -1,6 +1,7 @@
 from typing import Any, Dict, Set, Tuple, List
+from collections import deque
 from problem import Problem
-from mathutils import Direction, Point
+from mathutils import Direction, Point, get_point_pool
 from helpers.utils import NotImplemented
 
 #TODO: (Optional) Instead of Any, you can define a type for the parking state
@@ -61,21 +62,34 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         # list of the posible actions for the current state
         possible_actions: List[ParkingAction] = []
 
-        # loop over the current state (current cars positions)
-        for i in range(len(state)): 
+        # the set of occupied positions, so checking if a position has a car in it is O(1) instead of O(cars)
+        occupied = set(state)
 
-            # check for each possible direction of the car to move (right, left, up, down)
-            for dir in Direction:
-                
-                # try to move in the current direction by summing the current position and the direction vector
-                new_position = state[i] + dir.to_vector()
+        # the passage neighbors of every position (computed once per problem)
+        neighbors = self.get_neighbors()
+
+        # loop over the current state (current cars positions)
+        for i, position in enumerate(state): 
 
-                # check if this new position is available to the car to be in (not a wall which means in passages, there is not another car in it)
-                if new_position in self.passages and new_position not in state:
+            # check for each possible direction of the car to move (right, left, up, down) where the new position is not a wall,
+            # if there is no other car in it, the car can move there
+            for dir, new_position in neighbors[position]:
+                if new_position not in occupied:
                     possible_actions.append((i,dir))
 
         return possible_actions
 
+    # Return a dictionary that maps each passage to a list of (direction, neighbor position) for every direction that leads to another passage
+    # The directions are in the same order as the Direction enum, and the dictionary is computed once and stored in the problem cache
+    def get_neighbors(self) -> Dict[Point, List[Tuple[Direction, Point]]]:
+        cache = self.cache()
+        neighbors = cache.get("neighbors")
+        if neighbors is None:
+            neighbors = {}
+            for position in self.passages:
+                neighbors[position] = [(dir, position + dir.to_vector()) for dir in Direction if position + dir.to_vector() in self.passages]
+            cache["neighbors"] = neighbors
+        return neighbors
     
     # This function returns a new state which is the result of applying the given action to the given state
     def get_successor(self, state: ParkingState, action: ParkingAction) -> ParkingState:
@@ -85,20 +99,12 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         # action contains car index and direction
         # new_position = state[i] + dir.to_vector()
         # get the new position by summing the current position and the direction vector
-        new_position =  state[action[0]] + action[1].to_vector()
+        index, dir = action
+        new_position = get_point_pool(self.width, self.height).neighbor(state[index], dir)
 
-        # convert tuple to list to be able to change it 
-        updated_state = list(state) 
+        # build the new state by replacing the position of the car (without converting the state to a list and back)
+        return state[:index] + (new_position,) + state[index + 1:]
 
-        # update the position of the car 
-        updated_state[action[0]] = new_position
-
-        state = tuple(updated_state) # convert back to tuple 
-        
-        return state
-
-
-    
     # This function returns the cost of applying the given action to the given state
     def get_cost(self, state: ParkingState, action: ParkingAction) -> float:
         #TODO: ADD YOUR CODE HERE
@@ -120,9 +126,30 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
 
         return cost
 
-
-
-
+    # Return a list where entry 'i' maps each passage to the length of the shortest path (number of moves) of car 'i' from it to its slot
+    # Passages from which the slot cannot be reached are not in the dictionary
+    # The distances are computed by a BFS from each slot over the passages (ignoring the other cars) once and stored in the problem cache
+    def get_slot_distances(self) -> List[Dict[Point, int]]:
+        cache = self.cache()
+        slot_distances = cache.get("slot_distances")
+        if slot_distances is None:
+            neighbors = self.get_neighbors()
+            slot_positions = {index: position for position, index in self.slots.items()}
+            slot_distances = []
+            for i in range(len(self.cars)):
+                distances = {}
+                if i in slot_positions:
+                    distances[slot_positions[i]] = 0
+                    frontier = deque([slot_positions[i]])
+                    while frontier:
+                        position = frontier.popleft()
+                        for _, neighbor in neighbors[position]:
+                            if neighbor not in distances:
+                                distances[neighbor] = distances[position] + 1
+                                frontier.append(neighbor)
+                slot_distances.append(distances)
+            cache["slot_distances"] = slot_distances
+        return slot_distances
 
     # Read a parking problem from text containing a grid of tiles
     @staticmethod
@@ -155,3 +182,17 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         with open(path, 'r') as f:
             return ParkingProblem.from_text(f.read())
     
+
+# This heuristic sums, for every car, the shortest path distance from its position to its slot multiplied by the cost of moving this car
+# (26 - i for car 'i'). Every action moves a single car one step and costs at least 26 - i, so it decreases the heuristic by at most the action cost.
+# The heuristic is consistent (and admissible) since it ignores the other cars and the cost of passing through the slots of the other cars.
+# If a car cannot reach its slot at all, the goal cannot be reached and the heuristic returns infinity.
+def parking_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    slot_distances = problem.get_slot_distances()
+    heuristic = 0
+    for i, position in enumerate(state):
+        distance = slot_distances[i].get(position)
+        if distance is None:
+            return float('inf')
+        heuristic += (26 - i) * distance
+    return heuristic
@@ -1,11 +1,17 @@
 import time
+from typing import Optional
 from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
 from helpers.utils import fetch_recorded_calls
+from search_stats import SearchStats
+from solution_store import SolutionStore
+from functools import partial
 import argparse, os, json
 
 # Create an agent based on the user selections
-def create_agent(args: argparse.Namespace):
+# The search agents collect their statistics into the given stats object
+# and look up their solutions in the given solution store (if it is not None)
+def create_agent(args: argparse.Namespace, stats: SearchStats, store: Optional[SolutionStore]):
     agent_type: str = args.agent
     if agent_type == "human":
         # This function reads the action from the user (human)
@@ -28,22 +34,32 @@ def create_agent(args: argparse.Namespace):
         return HumanAgent(graph_user_action)
     if agent_type == "bfs":
         from search import BreadthFirstSearch
-        return UninformedSearchAgent(BreadthFirstSearch)
+        return UninformedSearchAgent(partial(BreadthFirstSearch, stats=stats), store)
     if agent_type == "dfs":
         from search import DepthFirstSearch
-        return UninformedSearchAgent(DepthFirstSearch)
+        return UninformedSearchAgent(partial(DepthFirstSearch, stats=stats), store)
     if agent_type == "ucs":
         from search import UniformCostSearch
-        return UninformedSearchAgent(UniformCostSearch)
+        return UninformedSearchAgent(partial(UniformCostSearch, stats=stats), store)
     if agent_type == "astar":
         from search import AStarSearch
-        return InformedSearchAgent(AStarSearch, graphrouting_heuristic)
+        return InformedSearchAgent(partial(AStarSearch, stats=stats), get_heuristic(args.heuristic), store)
     if agent_type == "gbfs":
         from search import BestFirstSearch
-        return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic)
+        return InformedSearchAgent(partial(BestFirstSearch, stats=stats), get_heuristic(args.heuristic), store)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
+# Return the heuristic selected by the user
+def get_heuristic(name: str):
+    if name == "euclidean":
+        return graphrouting_heuristic
+    if name == "landmarks":
+        from landmarks import landmark_heuristic
+        return landmark_heuristic
+    print(f"Requested Heuristic '{name}' is invalid")
+    exit(-1)
+
 def main(args: argparse.Namespace):
     start = time.time() # Track run time
     graph_path = args.graph
@@ -60,16 +76,20 @@ def main(args: argparse.Namespace):
     if figure:
         print(figure)
     print("Current Node:", state)
-    agent = create_agent(args)
+    stats = SearchStats(trace_memory=args.trace_memory) # This will collect the search statistics
+    store = SolutionStore(args.solution_store, args.store_size) if args.solution_store else None # The persistent solution store (if any)
+    if store is not None and args.clear_store:
+        store.clear()
+    agent = create_agent(args, stats, store)
     step = 0 # This will store the current step
     path_cost = 0 # This will store the total path cost
     traversed_nodes = [] # This will store all the traversed nodes in order of traversal
     unsolvable = False # This will store whether the problem is unsolvable or not
     while not problem.is_goal(state):
-        fetch_recorded_calls(GraphRoutingProblem.is_goal) # Clear the recorded calls
+        fetch_recorded_calls(GraphRoutingProblem.get_actions) # Clear the recorded calls
         action = agent.act(problem, state) # Request an action from the agent
         # Retrieve the traversed nodes
-        traversed_nodes += [call["args"][1].name for call in list(fetch_recorded_calls(GraphRoutingProblem.is_goal))]
+        traversed_nodes += [call["args"][1].name for call in list(fetch_recorded_calls(GraphRoutingProblem.get_actions))]
         # If no solution was found, break
         if action is None:
             print("Agent cannot find a solution, exiting...")
@@ -89,9 +109,13 @@ def main(args: argparse.Namespace):
         print("Current Node:", state)
     if not unsolvable: print("YOU WON!!")
     print("Path Cost:", path_cost)
-    # This was a search agent, display the traversed nodes
+    # This was a search agent, display the traversed nodes and the search statistics
     if not isinstance(agent, HumanAgent):
         print(f"Traversal Order: {'->'.join(traversed_nodes)}")
+        print(stats)
+        if store is not None:
+            print(store.report())
+            store.close()
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -102,6 +126,16 @@ if __name__ == "__main__":
     parser.add_argument("--agent", "-a", default="human",
                         choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
                         help="the agent that will play the game")
+    parser.add_argument("--heuristic", "-hf", default="euclidean", choices=["euclidean", "landmarks"],
+                        help="choose the heuristic to use with A* or Greedy Best First Search")
+    parser.add_argument("--solution-store", "-s", default=None,
+                        help="path to a sqlite file where the solutions are stored, so the same problem is not searched again")
+    parser.add_argument("--store-size", type=int, default=10000,
+                        help="the maximum number of solutions in the solution store (the least recently used are evicted)")
+    parser.add_argument("--clear-store", action="store_true", default=False,
+                        help="remove every solution from the solution store before searching")
+    parser.add_argument("--trace-memory", action="store_true", default=False,
+                        help="Measure the peak memory of the search (slows down the search)")
 
     args = parser.parse_args()
     try:
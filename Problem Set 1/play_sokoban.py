@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Optional
 from sokoban import SokobanProblem, Direction, SokobanState, SokobanTile
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
-from helpers.utils import fetch_tracked_call_count
+from search_stats import SearchStats
+from solution_store import SolutionStore
 from helpers.heuristic_checks import test_heuristic_consistency
-from functools import lru_cache
+from functools import lru_cache, partial
 import argparse, time
 
 def colored_sokoban(level: str):
@@ -27,11 +28,52 @@ def get_heuristic(name: str):
     if name == "strong":
         from sokoban_heuristic import strong_heuristic
         return strong_heuristic
+    if name == "matching":
+        from sokoban_heuristic import matching_heuristic
+        return matching_heuristic
+    if name == "pdb":
+        from sokoban_heuristic import pattern_database_heuristic
+        return pattern_database_heuristic
+    if name == "pushes":
+        from sokoban_heuristic import push_heuristic
+        return push_heuristic
     print(f"Requested Heuristic '{name}' is invalid")
     exit(-1)
 
+# Raised by anytime_search when the time budget runs out before ARA* finds any solution
+# It is not the same as returning None, which means that the level has no solution
+class TimeBudgetExceeded(Exception):
+    pass
+
+# Run ARA* until it finds an optimal solution or the time budget (in seconds) runs out, then return the last solution it found
+# The time budget is passed to ARA* as a deadline that is checked before every expansion,
+# so the search stops on time even in the middle of an iteration
+def anytime_search(problem: SokobanProblem, state: SokobanState, heuristic, time_budget: float, stats: SearchStats):
+    from search import AnytimeRepairingAStar
+    start = time.perf_counter()
+    solution = None
+    for solution, bound in AnytimeRepairingAStar(problem, state, heuristic, deadline=start + time_budget, stats=stats):
+        elapsed = time.perf_counter() - start
+        print(f"ARA* found a solution with {len(solution)} steps (at most {bound:.3f} times the optimal cost) after {elapsed:.4f} seconds")
+    elapsed = time.perf_counter() - start
+    stats.search_time += elapsed
+    # ARA* does not yield anything if there is no solution or if the deadline was reached first
+    if solution is None and elapsed >= time_budget:
+        raise TimeBudgetExceeded(f"ARA* did not find a solution within the time budget of {time_budget} seconds")
+    return solution
+
+# If requested by the user, the search function solves the push formulation of the problem (see SokobanPushProblem)
+# and its solution is converted back into directions, so the agent still plays one step at a time
+def with_pushes(args: argparse.Namespace, search_fn):
+    if not args.pushes:
+        return search_fn
+    from sokoban import search_with_pushes
+    return partial(search_with_pushes, search_fn)
+
 # Create an agent based on the user selections
-def create_agent(args: argparse.Namespace):
+# The search agents collect their statistics into the given stats object
+# and look up their solutions in the given solution store (if it is not None)
+def create_agent(args: argparse.Namespace, stats: SearchStats, store: Optional[SolutionStore]):
     agent_type: str = args.agent
     if agent_type == "human":
         # This function reads the action from the user (human)
@@ -50,15 +92,19 @@ def create_agent(args: argparse.Namespace):
                 else:
                     print("Invalid Action")
         return HumanAgent(sokoban_user_action)
+    # The push formulation costs 1 per push, so the heuristics that count the walking steps overestimate its costs
+    if args.pushes and args.heuristic not in ("zero", "pushes"):
+        print(f"Heuristic '{args.heuristic}' counts the walking steps, use 'zero' or 'pushes' with --pushes")
+        exit(-1)
     if agent_type == "bfs":
         from search import BreadthFirstSearch
-        return UninformedSearchAgent(BreadthFirstSearch)
+        return UninformedSearchAgent(with_pushes(args, partial(BreadthFirstSearch, stats=stats)), store)
     if agent_type == "dfs":
         from search import DepthFirstSearch
-        return UninformedSearchAgent(DepthFirstSearch)
+        return UninformedSearchAgent(with_pushes(args, partial(DepthFirstSearch, stats=stats)), store)
     if agent_type == "ucs":
         from search import UniformCostSearch
-        return UninformedSearchAgent(UniformCostSearch)
+        return UninformedSearchAgent(with_pushes(args, partial(UniformCostSearch, stats=stats)), store)
     if agent_type == "astar":
         from search import AStarSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
@@ -66,7 +112,35 @@ def create_agent(args: argparse.Namespace):
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
             SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
-        return InformedSearchAgent(AStarSearch, heuristic)
+        return InformedSearchAgent(with_pushes(args, partial(AStarSearch, stats=stats)), heuristic, store)
+    if agent_type == "wastar":
+        from search import WeightedAStarSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+        return InformedSearchAgent(with_pushes(args, partial(WeightedAStarSearch, weight=args.weight, stats=stats)), heuristic, store)
+    if agent_type == "arastar":
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+        # The solution of ARA* depends on the time budget (it may be suboptimal), so it is not looked up in or saved to the solution store
+        if store is not None:
+            print("ARA* solutions depend on the time budget, so the solution store is not used")
+        return InformedSearchAgent(with_pushes(args, partial(anytime_search, time_budget=args.time_budget, stats=stats)), heuristic)
+    if agent_type == "idastar":
+        from search import IterativeDeepeningAStar
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+        # IDA* only stores the current path, plus a bounded transposition table (disabled if its size is 0)
+        search_fn = partial(IterativeDeepeningAStar, transposition_table_size=args.tt_size, stats=stats)
+        return InformedSearchAgent(with_pushes(args, search_fn), heuristic, store)
     if agent_type == "gbfs":
         from search import BestFirstSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
@@ -74,7 +148,7 @@ def create_agent(args: argparse.Namespace):
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
             SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
-        return InformedSearchAgent(BestFirstSearch, heuristic)
+        return InformedSearchAgent(with_pushes(args, partial(BestFirstSearch, stats=stats)), heuristic, store)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -82,24 +156,30 @@ def main(args: argparse.Namespace):
     state_printer = lambda state: print(state)
     if args.ansicolors: state_printer = lambda state: print(colored_sokoban(str(state)))
     start = time.time() # Track run time
-    problem = SokobanProblem.from_file(args.level) # create the problem
+    problem = SokobanProblem.from_file(args.level, args.compact) # create the problem
     state = problem.get_initial_state() # Get the initial state
     print("Initial State:")
     state_printer(state)
-    agent = create_agent(args)
+    stats = SearchStats(trace_memory=args.trace_memory) # This will collect the search statistics
+    store = SolutionStore(args.solution_store, args.store_size) if args.solution_store else None # The persistent solution store (if any)
+    if store is not None and args.clear_store:
+        store.clear()
+    agent = create_agent(args, stats, store)
     step = 0 # This will store the current step
-    total_explored_nodes = 0 # This will store the number of traversed nodes during search
     unsolvable = False # This will store whether the problem is unsolvable or not
+    out_of_time = False # This will store whether the search ran out of time before finding a solution
     while not problem.is_goal(state):
-        fetch_tracked_call_count(SokobanProblem.is_goal) # Clear the call counter
-        action = agent.act(problem, state) # Request an action from the agent
+        try:
+            action = agent.act(problem, state) # Request an action from the agent
+        except TimeBudgetExceeded as error:
+            print(f"{error}, exiting... (increase --time-budget to search longer)")
+            out_of_time = True
+            break
         # If no solution was found, break
         if action is None:
             print("Agent cannot find a solution, exiting...")
             unsolvable = True
             break
-        # Get the number of traversed nodes
-        total_explored_nodes += fetch_tracked_call_count(SokobanProblem.is_goal)
         # Apply the action to the state
         state = problem.get_successor(state, action)
         step += 1
@@ -107,16 +187,19 @@ def main(args: argparse.Namespace):
         print("Step:", step)
         print("Action:", str(action))
         state_printer(state)
-    if not unsolvable: 
+    if not unsolvable and not out_of_time:
         # If desired by the user, we check that the heuristic is zero at the goal state
         if args.checks and isinstance(agent, InformedSearchAgent):
             goal_heuristic = agent.heuristic(problem, state)
             if goal_heuristic != 0:
                 print(f"ERROR: Expected heuristic at goal to be 0, got {goal_heuristic}")
         print("YOU WON!!")
-    # This was a search agent, display the number of traversed nodes
+    # This was a search agent, display the search statistics
     if not isinstance(agent, HumanAgent):
-        print(f"Search explored {total_explored_nodes} nodes")
+        print(stats)
+        if store is not None:
+            print(store.report())
+            store.close()
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -126,13 +209,31 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Sokoban as Human or AI")
     parser.add_argument("level", help="path to the sokoban level to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'wastar', 'arastar', 'idastar', 'gbfs'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
-                        choices=["zero", "weak", "strong"],
-                        help="choose the heuristic to use with A* or Greedy Best First Search")
+                        choices=["zero", "weak", "strong", "matching", "pdb", "pushes"],
+                        help="choose the heuristic to use with A*, Weighted A*, ARA*, IDA* or Greedy Best First Search")
     parser.add_argument("--checks", "-c", action='store_true', default=False,
                         help="Enable consistency checks for the heuristic")
+    parser.add_argument("--weight", "-w", type=float, default=2.0,
+                        help="the heuristic weight of Weighted A* (the solution costs at most weight times the optimal cost)")
+    parser.add_argument("--time-budget", "-t", type=float, default=10.0,
+                        help="the time budget of ARA* in seconds (it returns the best solution found when the budget runs out)")
+    parser.add_argument("--tt-size", type=int, default=2**16,
+                        help="the maximum number of states in the IDA* transposition table (0 to disable it)")
+    parser.add_argument("--solution-store", "-s", default=None,
+                        help="path to a sqlite file where the solutions are stored, so the same problem is not searched again")
+    parser.add_argument("--store-size", type=int, default=10000,
+                        help="the maximum number of solutions in the solution store (the least recently used are evicted)")
+    parser.add_argument("--clear-store", action="store_true", default=False,
+                        help="remove every solution from the solution store before searching")
+    parser.add_argument("--trace-memory", action="store_true", default=False,
+                        help="Measure the peak memory of the search (slows down the search)")
+    parser.add_argument("--compact", action="store_true", default=False,
+                        help="Use the compact state representation (integer cells and a crates bitmask)")
+    parser.add_argument("--pushes", "-p", action="store_true", default=False,
+                        help="Search over crate pushes instead of single steps (finds the solutions with the fewest pushes)")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
                         help="Print the level on the console with ANSI colors (only works on some terminals)")
 
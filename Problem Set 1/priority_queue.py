@@ -0,0 +1,112 @@
+from typing import Any, Dict, Generic, Hashable, Iterator, List, Tuple, TypeVar
+
+# T is used for generic typing where T represents the item type (for example, the state type of a search problem)
+T = TypeVar("T", bound=Hashable)
+
+# This is an indexed binary min-heap which supports decrease-key
+# Each item can only be in the queue once, and the queue keeps the position of every item in the heap
+# so that its priority can be changed in O(log n) instead of pushing a duplicate entry.
+# Ties are broken by insertion order: if two items have the same priority, the one pushed first is popped first.
+# Changing the priority of an item gives it a new insertion order, exactly as if it was removed then pushed again.
+# Each item can also carry a value (for example, the search node of a state) which is replaced when its priority changes.
+class IndexedPriorityQueue(Generic[T]):
+    def __init__(self) -> None:
+        # Each heap entry is a list [priority, order, item, value]
+        self._heap: List[List[Any]] = []
+        # The position of each item in the heap
+        self._index: Dict[T, int] = {}
+        # The number of pushes so far, used as the insertion order to break ties
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def __contains__(self, item: T) -> bool:
+        return item in self._index
+
+    # Iterate over the items in the queue (in no particular order)
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._index)
+
+    # Return the priority of an item that is in the queue
+    def priority(self, item: T) -> float:
+        return self._heap[self._index[item]][0]
+
+    # Return the entry with the lowest priority as a tuple (priority, item, value) without removing it
+    def peek(self) -> Tuple[float, T, Any]:
+        priority, _, item, value = self._heap[0]
+        return priority, item, value
+
+    # Push a new item, or change the priority and value of an item that is already in the queue
+    def push(self, item: T, priority: float, value: Any = None) -> None:
+        self._counter += 1
+        position = self._index.get(item)
+        if position is None:
+            self._heap.append([priority, self._counter, item, value])
+            self._index[item] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+        else:
+            entry = self._heap[position]
+            old_key = (entry[0], entry[1])
+            entry[0], entry[1], entry[3] = priority, self._counter, value
+            if (priority, self._counter) < old_key:
+                self._sift_up(position)
+            else:
+                self._sift_down(position)
+
+    # Remove the item with the lowest priority and return it as a tuple (priority, item, value)
+    def pop(self) -> Tuple[float, T, Any]:
+        heap = self._heap
+        last = heap.pop()
+        if heap:
+            entry = heap[0]
+            heap[0] = last
+            self._index[last[2]] = 0
+            self._sift_down(0)
+        else:
+            entry = last
+        del self._index[entry[2]]
+        return entry[0], entry[2], entry[3]
+
+    def _sift_up(self, position: int) -> None:
+        heap, index = self._heap, self._index
+        entry = heap[position]
+        key = (entry[0], entry[1])
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent = heap[parent_position]
+            if key >= (parent[0], parent[1]):
+                break
+            heap[position] = parent
+            index[parent[2]] = position
+            position = parent_position
+        heap[position] = entry
+        index[entry[2]] = position
+
+    def _sift_down(self, position: int) -> None:
+        heap, index = self._heap, self._index
+        size = len(heap)
+        entry = heap[position]
+        key = (entry[0], entry[1])
+        while True:
+            child_position = 2 * position + 1
+            if child_position >= size:
+                break
+            child = heap[child_position]
+            child_key = (child[0], child[1])
+            right_position = child_position + 1
+            if right_position < size:
+                right = heap[right_position]
+                right_key = (right[0], right[1])
+                if right_key < child_key:
+                    child_position, child, child_key = right_position, right, right_key
+            if key <= child_key:
+                break
+            heap[position] = child
+            index[child[2]] = position
+            position = child_position
+        heap[position] = entry
+        index[entry[2]] = position
@@ -4,6 +4,12 @@ from helpers.utils import NotImplemented
 
 #TODO: Import any modules you want to use
 import heapq
+from priority_queue import IndexedPriorityQueue
+from array import array
+from collections import OrderedDict
+from typing import Generic, Iterator, List, Optional, Tuple
+import itertools, time
+from search_stats import SearchStats, collect_stats
 
 # All search functions take a problem and a state
 # If it is an informed search function, it will also receive a heuristic function
@@ -13,6 +19,10 @@ import heapq
 # 1. A list of actions which represent the path from the initial state to the final state
 # 2. None if there is no solution
 
+# All the search functions also accept an optional keyword argument "stats" (a SearchStats object, see search_stats.py)
+# If it is given, the search counts the expanded, generated and pruned nodes and the maximum frontier size into it
+# If it is None (the default), nothing is counted
+
 '''
 In all of the following functions:
 
@@ -27,9 +37,47 @@ In all of the following functions:
     problem.get_successor(state, action): function to get the next state given the current state and an action applied on it
 
     problem.get_cost(state, action): function to get the cost given the current state and an action applied on it
+
+    nodes: node store that keeps the parent and the action of every generated node,
+           so the frontier only carries a node index instead of a full copy of the path
+
+    stats: the search statistics collector (or None), stats.on_expand is called with the size of the frontier when a node is expanded
 '''
 
-def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+# The node store is an arena shared by all the nodes generated during a single search
+# Each node is an index into two parallel arrays: the index of its parent and the action that generated it
+# Storing the path this way takes O(1) memory per node (instead of O(depth) when each node copies the path of its parent)
+# and the path is only reconstructed once when a goal is found
+class NodeStore(Generic[A]):
+    # The index of the root node (the node of the initial state)
+    ROOT = 0
+
+    def __init__(self) -> None:
+        # The root has no parent and no action
+        self.parents = array('q', [-1])
+        self.actions: List[A] = [None]
+
+    # Add a new node given the index of its parent and the action applied on the parent, then return its index
+    def add(self, parent: int, action: A) -> int:
+        self.parents.append(parent)
+        self.actions.append(action)
+        return len(self.actions) - 1
+
+    # Follow the parent pointers from the given node back to the root to get the actions from the initial state to this node
+    def path(self, node: int) -> List[A]:
+        parents, actions = self.parents, self.actions
+        path = []
+        while node != NodeStore.ROOT:
+            path.append(actions[node])
+            node = parents[node]
+        path.reverse()
+        return path
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+@collect_stats
+def BreadthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
     # NotImplemented()
 
@@ -42,27 +90,28 @@ def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     # define the frontier -> Queue (FIFO) in BFS algorithm
     frontier = deque()
     
-    # define the explored set
-    explored = set()
+    # define the seen set which contains every state that was added to the frontier (explored or still in the frontier)
+    # states are added when they are enqueued, so checking if a state is explored or in the frontier is O(1)
+    seen = {initial_state}
+
+    # define the node store which will be used to retrieve the path once a goal is found
+    nodes = NodeStore()
 
-    # add the first node in frontier (initial state, empty list for actions)
-    frontier.append((initial_state, []))
+    # add the first node in frontier (initial state, root node)
+    frontier.append((initial_state, NodeStore.ROOT))
 
     # loop while frontier is not empty
     while frontier:
 
         # pop the left/first added node in frontier  
-        state, path = frontier.popleft()
+        state, node = frontier.popleft()
 
         # check if this state is a goal, then return the path from the initial state to the final state
         if problem.is_goal(state):
-            return path
-        
-        # if this state is not a goal, add it to the explored set
-        explored.add(state)
+            return nodes.path(node)
 
-        # get states in the nodes which in frontier
-        frontier_set = set([s[0] for s in frontier])
+        if stats is not None:
+            stats.on_expand(len(frontier))
         
         # loop over possible actions for the current state 
         for action in problem.get_actions(state):
@@ -70,22 +119,30 @@ def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
             # get the next state based on the action
             new_state = problem.get_successor(state, action)
 
+            if stats is not None:
+                stats.generated += 1
+                stats.duplicates_pruned += new_state in seen
+
             # if this new state is not explored yet and not in frontier, explore it 
-            if new_state not in explored and new_state not in frontier_set:
+            if new_state not in seen:
                         
-                        # append this action to the path 
-                        new_path = path + [action]
+                        # mark the new state as seen
+                        seen.add(new_state)
+
+                        # create a child node for this action 
+                        new_node = nodes.add(node, action)
                         
                         # check if this new state is a goal
                         if problem.is_goal(new_state):
-                            return new_path
+                            return nodes.path(new_node)
                         
-                        # add the new node (new_state, new_path) to frontier
-                        frontier.append((new_state, new_path))
+                        # add the new node (new_state, new_node) to frontier
+                        frontier.append((new_state, new_node))
     return None   
 
 
-def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+@collect_stats
+def DepthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
     # NotImplemented()
 
@@ -101,40 +158,54 @@ def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     # define the explored set
     explored = set()
 
-    # add the first node in frontier (initial state, empty list for actions)
-    frontier.append((initial_state, []))
+    # define the node store which will be used to retrieve the path once a goal is found
+    nodes = NodeStore()
+
+    # add the first node in frontier (initial state, root node)
+    frontier.append((initial_state, NodeStore.ROOT))
 
     # loop while frontier is not empty
     while frontier:
 
         # pop the top/newly added node in frontier  
-        state, path = frontier.pop()
+        state, node = frontier.pop()
+
+        # the children are pushed without checking if they were explored, so the explored states are pruned when they are popped
+        if stats is not None and state in explored:
+            stats.duplicates_pruned += 1
         
         # if the current state is not explored yet
         if state not in explored:
             
             # check if this new state is a goal
             if problem.is_goal(state):
-                return path
+                return nodes.path(node)
             
             # if this state is not a goal, add it to the explored set
             explored.add(state)
 
+            if stats is not None:
+                stats.on_expand(len(frontier))
+
             # loop over possible actions for the current state 
             for action in problem.get_actions(state):
                 
                 # get the next state based on the action
                 new_state = problem.get_successor(state, action)
+
+                if stats is not None:
+                    stats.generated += 1
                         
-                # append this action to the path 
-                new_path = path + [action]
+                # create a child node for this action 
+                new_node = nodes.add(node, action)
                 
-                # add the new node (new_state, new_path) to frontier
-                frontier.append((new_state, new_path))
+                # add the new node (new_state, new_node) to frontier
+                frontier.append((new_state, new_node))
     return None  
     
 
-def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+@collect_stats
+def UniformCostSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
     # NotImplemented()
 
@@ -145,74 +216,71 @@ def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
     '''
 
     # define the frontier -> Priority Queue based on lowest g function (cummulative path cost) 
-    frontier = []
-    heapq.heapify(frontier)
+    # the queue is indexed by state, so when a cheaper path to a state in the frontier is found its cost is decreased in place
+    # instead of pushing a duplicate node; ties are broken by insertion order (the first added node is chosen)
+    frontier = IndexedPriorityQueue()
 
     # define the explored set
     explored = set()
 
-    # store each state and its path cost
-    state_cost = {initial_state: 0}
-    
-    # cummulative path cost
-    path_cost = 0
-
-    # variable to store unique value for each iteration 
-    # it is used for if the queue has two nodes with same priority, then choose the first added one
-    unique_id = 0
+    # define the node store which will be used to retrieve the path once a goal is found
+    nodes = NodeStore()
 
-    # push the node to frontier
-    heapq.heappush(frontier,(path_cost, unique_id ,initial_state, []))
+    # push the node to frontier with a cummulative path cost of 0
+    frontier.push(initial_state, 0, NodeStore.ROOT)
 
     # loop while frontier is not empty
     while frontier:
             
         # pop the highest priority / lowest value node in frontier
-        path_cost, _, state, path = heapq.heappop(frontier)
+        # the frontier contains each state once, so the popped state is never explored
+        path_cost, state, node = frontier.pop()
 
-        # if the current state is not explored yet
-        if state not in explored:
+        # check if this new state is a goal
+        if problem.is_goal(state):
+            return nodes.path(node)
+        
+        # if this state is not a goal, add it to the explored set
+        explored.add(state)
 
-            # check if this new state is a goal
-            if problem.is_goal(state):
-                return path
-            
-            # if this state is not a goal, add it to the explored set
-            explored.add(state)
+        if stats is not None:
+            stats.on_expand(len(frontier))
 
-            # loop over possible actions for the current state 
-            for action in problem.get_actions(state):
+        # loop over possible actions for the current state 
+        for action in problem.get_actions(state):
 
-                # get the next state based on the action
-                new_state = problem.get_successor(state, action)
+            # get the next state based on the action
+            new_state = problem.get_successor(state, action)
 
-                # if the current state is not explored yet
-                if new_state not in explored:
+            if stats is not None:
+                stats.generated += 1
 
-                    # get cummulative cost of the new state
-                    new_path_cost = path_cost + problem.get_cost(state, action) 
+            # if the current state is not explored yet
+            if new_state not in explored:
 
-                    # if the new state has lower cost than current state
-                    if new_state not in state_cost or new_path_cost < state_cost[new_state]:
-                        
-                        # update the new state with its cummulative path cost
-                        state_cost[new_state] = new_path_cost
+                # get cummulative cost of the new state
+                new_path_cost = path_cost + problem.get_cost(state, action) 
 
-                        # append this action to the path 
-                        new_path = path + [action]
-                        
-                        # update the id
-                        unique_id += 1
+                # if the new state is not in the frontier or has lower cost than its node in the frontier
+                if new_state not in frontier or new_path_cost < frontier.priority(new_state):
 
-                        # push the new node into frontier
-                        heapq.heappush(frontier,(new_path_cost, unique_id ,new_state, new_path))
-                        
-                        
+                    # create a child node for this action 
+                    new_node = nodes.add(node, action)
+
+                    # push the new node into frontier (or decrease the cost of the state if it is already there)
+                    frontier.push(new_state, new_path_cost, new_node)
+
+                elif stats is not None:
+                    stats.duplicates_pruned += 1
+
+            elif stats is not None:
+                stats.duplicates_pruned += 1
 
     return None  
 
 
-def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+@collect_stats
+def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
     # NotImplemented()
 
@@ -225,14 +293,15 @@ def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFu
     '''
 
     # define the frontier -> Priority Queue based on lowest f function (cummulative path cost + heuristic) 
-    frontier = []
-    heapq.heapify(frontier)
+    # the queue is indexed by state, so when a cheaper path to a state in the frontier is found its cost is decreased in place
+    # instead of pushing a duplicate node; ties are broken by insertion order (the first added node is chosen)
+    frontier = IndexedPriorityQueue()
 
     # define the explored set
     explored = set()
-    
-    # store each state and f value
-    state_cost = {initial_state: 0}
+
+    # define the node store which will be used to retrieve the path once a goal is found
+    nodes = NodeStore()
 
     # cummulative path cost
     path_cost = 0
@@ -242,62 +311,356 @@ def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFu
 
     # get f = g + h
     total_cost = path_cost + heuristic_cost
-
-    # variable to store unique value for each iteration 
-    # it is used for if the queue has two nodes with same priority, then choose the first added one
-    unique_id = 0
     
     # push the node to frontier
-    heapq.heappush(frontier,(total_cost, unique_id ,initial_state, []))
+    # the cummulative path cost is stored with the node so the heuristic is only computed once for each generated state
+    frontier.push(initial_state, total_cost, (path_cost, NodeStore.ROOT))
 
     # loop while frontier is not empty
     while frontier:
             
             # pop the highest priority / lowest value node in frontier
-            total_cost, _ , state, path = heapq.heappop(frontier)
+            # the frontier contains each state once, so the popped state is never explored
+            _, state, (path_cost, node) = frontier.pop()
+
+            # check if this new state is a goal
+            if problem.is_goal(state):
+                return nodes.path(node)
             
-            # if the current state is not explored yet
-            if state not in explored:
+            # if this state is not a goal, add it to the explored set           
+            explored.add(state)
 
-                # check if this new state is a goal
-                if problem.is_goal(state):
-                    return path
-                
-                # if this state is not a goal, add it to the explored set           
-                explored.add(state)
+            if stats is not None:
+                stats.on_expand(len(frontier))
 
-                # loop over possible actions for the current state 
-                for action in problem.get_actions(state):
+            # loop over possible actions for the current state 
+            for action in problem.get_actions(state):
 
-                    # get the next state based on the action
-                    new_state = problem.get_successor(state, action)
+                # get the next state based on the action
+                new_state = problem.get_successor(state, action)
 
-                    # if the current state is not explored yet
-                    if new_state not in explored:
+                if stats is not None:
+                    stats.generated += 1
+
+                # if the current state is not explored yet
+                if new_state not in explored:
+                    
+                    # calculate the total cost = cummulative path cost + heuristic value
+                    new_path_cost = path_cost + problem.get_cost(state, action) 
+                    new_total_cost = new_path_cost + heuristic(problem, new_state)
+
+                    # if the new state is not in the frontier or has lower total cost than its node in the frontier
+                    if new_state not in frontier or new_total_cost < frontier.priority(new_state):
+
+                        # create a child node for this action 
+                        new_node = nodes.add(node, action)
                         
-                        # calculate the total cost = cummulative path cost + heuristic value
-                        path_cost = total_cost - heuristic(problem, state)
-                        new_path_cost = path_cost + problem.get_cost(state, action) 
-                        new_total_cost = new_path_cost + heuristic(problem, new_state)
+                        # push the new node into frontier (or decrease the cost of the state if it is already there)
+                        frontier.push(new_state, new_total_cost, (new_path_cost, new_node))
 
-                        # if the new state has lower total cost than current state
-                        if new_state not in state_cost or new_total_cost < state_cost[new_state]:
-                            
-                            # update the new state with its new total cost
-                            state_cost[new_state] = new_total_cost 
+                    elif stats is not None:
+                        stats.duplicates_pruned += 1
 
-                            # append this action to the path 
-                            new_path = path + [action]
-                            
-                            # update the id                            
-                            unique_id += 1
-                            
-                            # push the new node into frontier
-                            heapq.heappush(frontier,(new_total_cost, unique_id ,new_state, new_path))
-                            
+                elif stats is not None:
+                    stats.duplicates_pruned += 1
+                        
     return None  
 
-def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+@collect_stats
+def WeightedAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, weight: float = 2.0, stats: Optional[SearchStats] = None) -> Solution:
+    '''
+    Weighted A* Search is A* where the heuristic value is multiplied by a weight w >= 1
+    (f(n) = g(n) + w * h(n))
+    so the search is greedier and expands fewer nodes, at the cost of optimality:
+    with a consistent heuristic, the cost of the returned path is at most w times the optimal cost.
+    With w = 1, it is the same as A*.
+    '''
+
+    # define the frontier -> Priority Queue based on lowest weighted f function (cummulative path cost + weight * heuristic)
+    frontier = IndexedPriorityQueue()
+
+    # define the explored set
+    explored = set()
+
+    # define the node store which will be used to retrieve the path once a goal is found
+    nodes = NodeStore()
+
+    # push the node to frontier with its cummulative path cost
+    frontier.push(initial_state, weight * heuristic(problem, initial_state), (0, NodeStore.ROOT))
+
+    # loop while frontier is not empty
+    while frontier:
+
+            # pop the highest priority / lowest value node in frontier
+            _, state, (path_cost, node) = frontier.pop()
+
+            # check if this new state is a goal
+            if problem.is_goal(state):
+                return nodes.path(node)
+
+            # if this state is not a goal, add it to the explored set
+            explored.add(state)
+
+            if stats is not None:
+                stats.on_expand(len(frontier))
+
+            # loop over possible actions for the current state
+            for action in problem.get_actions(state):
+
+                # get the next state based on the action
+                new_state = problem.get_successor(state, action)
+
+                if stats is not None:
+                    stats.generated += 1
+
+                # if the current state is not explored yet
+                if new_state not in explored:
+
+                    # calculate the weighted total cost = cummulative path cost + weight * heuristic value
+                    new_path_cost = path_cost + problem.get_cost(state, action)
+                    new_total_cost = new_path_cost + weight * heuristic(problem, new_state)
+
+                    # if the new state is not in the frontier or has lower total cost than its node in the frontier
+                    if new_state not in frontier or new_total_cost < frontier.priority(new_state):
+
+                        # create a child node for this action
+                        new_node = nodes.add(node, action)
+
+                        # push the new node into frontier (or decrease the cost of the state if it is already there)
+                        frontier.push(new_state, new_total_cost, (new_path_cost, new_node))
+
+                    elif stats is not None:
+                        stats.duplicates_pruned += 1
+
+                elif stats is not None:
+                    stats.duplicates_pruned += 1
+
+    return None
+
+def AnytimeRepairingAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                          initial_weight: float = 5.0, weight_step: float = 1.0, deadline: Optional[float] = None,
+                          stats: Optional[SearchStats] = None) -> Iterator[Tuple[List[A], float]]:
+    '''
+    Anytime Repairing A* (ARA*) runs a sequence of weighted A* searches with a decreasing weight and yields
+    every solution it finds as a tuple (solution, bound) where the cost of the solution is at most "bound" times the optimal cost.
+    Instead of starting every search from scratch, it reuses the search tree and the frontier of the previous search:
+    the nodes whose cost decreased after they were explored (inconsistent nodes) are added back to the frontier,
+    and the frontier is reordered using the new weight. It stops after the search with weight 1, whose solution is optimal.
+    The caller can stop iterating at any time and use the last yielded solution.
+    The optional deadline is a time.perf_counter() value: it is checked before every expansion, and once it is reached
+    the search stops in the middle of the current iteration and yields the best solution found so far (if it was not yielded yet).
+    If there is no solution (or none was found before the deadline), it does not yield anything.
+    Since this is a generator, the search time is not measured into stats (only the node counts and the heuristic evaluations).
+    '''
+
+    if stats is not None:
+        heuristic = stats.track_heuristic(heuristic)
+
+    # the node store which will be used to retrieve the path once a goal is found
+    nodes = NodeStore()
+
+    # for every reached state: its lowest cummulative path cost, its node and its heuristic value (computed once per state)
+    reached = {initial_state: (0, NodeStore.ROOT, heuristic(problem, initial_state))}
+
+    # the frontier (OPEN), the explored set (CLOSED) and the explored states whose cost decreased during the current search (INCONS)
+    frontier = IndexedPriorityQueue()
+    explored = set()
+    inconsistent = set()
+
+    # the cost and the node of the best goal found so far
+    best_cost, best_node = float('inf'), None
+    if problem.is_goal(initial_state):
+        best_cost, best_node = 0, NodeStore.ROOT
+
+    # the cost and the bound of the last yielded solution
+    last_yielded = None
+
+    weight = initial_weight
+    frontier.push(initial_state, weight * reached[initial_state][2])
+
+    # whether the deadline was reached during the current search
+    interrupted = False
+
+    while True:
+
+        # expand the nodes while their weighted f is lower than the cost of the best goal
+        while frontier and frontier.peek()[0] < best_cost:
+            if deadline is not None and time.perf_counter() >= deadline:
+                interrupted = True
+                break
+
+            _, state, _ = frontier.pop()
+            explored.add(state)
+            path_cost, node, _ = reached[state]
+
+            # there is no need to expand a goal
+            if problem.is_goal(state):
+                continue
+
+            if stats is not None:
+                stats.on_expand(len(frontier))
+
+            for action in problem.get_actions(state):
+                new_state = problem.get_successor(state, action)
+                new_path_cost = path_cost + problem.get_cost(state, action)
+
+                if stats is not None:
+                    stats.generated += 1
+
+                # skip the new state if it was already reached with a lower or equal cost
+                previous = reached.get(new_state)
+                if previous is not None and previous[0] <= new_path_cost:
+                    if stats is not None:
+                        stats.duplicates_pruned += 1
+                    continue
+
+                new_heuristic = heuristic(problem, new_state) if previous is None else previous[2]
+                new_node = nodes.add(node, action)
+                reached[new_state] = (new_path_cost, new_node, new_heuristic)
+
+                # a goal was reached with a lower cost
+                if new_path_cost < best_cost and problem.is_goal(new_state):
+                    best_cost, best_node = new_path_cost, new_node
+
+                # an explored state is not expanded again during the same search, it is kept for the next search instead
+                if new_state in explored:
+                    inconsistent.add(new_state)
+                else:
+                    frontier.push(new_state, new_path_cost + weight * new_heuristic)
+
+        # no goal is reachable
+        if best_node is None:
+            return
+
+        # the optimal cost is at least the lowest unweighted f of the nodes in the frontier and the inconsistent nodes
+        # the weight is only a bound if the search with this weight was completed
+        lower_bound = min((reached[state][0] + reached[state][2] for state in itertools.chain(frontier, inconsistent)), default=best_cost)
+        weight_bound = float('inf') if interrupted else weight
+        bound = max(1.0, min(weight_bound, best_cost / lower_bound) if lower_bound > 0 else weight_bound)
+
+        # only yield if the solution or its bound improved since the last search
+        if (best_cost, bound) != last_yielded:
+            last_yielded = (best_cost, bound)
+            yield nodes.path(best_node), bound
+
+        if interrupted or weight == 1 or bound <= 1:
+            return
+
+        # decrease the weight, then move the inconsistent nodes to the frontier and reorder the frontier with the new weight
+        weight = max(1.0, weight - weight_step)
+        states = list(itertools.chain(frontier, inconsistent))
+        frontier = IndexedPriorityQueue()
+        for state in states:
+            frontier.push(state, reached[state][0] + weight * reached[state][2])
+        inconsistent.clear()
+        explored.clear()
+
+@collect_stats
+def IterativeDeepeningAStar(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, transposition_table_size: Optional[int] = 2**16, stats: Optional[SearchStats] = None) -> Solution:
+    '''
+    Iterative Deepening A* (IDA*) runs a sequence of depth first searches, each one bounded by a threshold on the total cost
+    (f(n) = g(n) + h(n)). Nodes with f above the threshold are cut off, and the next iteration uses the smallest f that was cut off.
+    It finds the same optimal cost as A* (given an admissible heuristic), but it only keeps the current path in memory
+    instead of every explored state, at the cost of expanding the shallow nodes again in every iteration.
+    The optional transposition table remembers the lowest cummulative path cost each state was reached with in the current iteration,
+    so a state reached again by another path that is not cheaper is not searched twice. It is bounded and evicts the least recently used state.
+    Set transposition_table_size to None or 0 to disable it (then only the states on the current path are used to skip cycles).
+    '''
+
+    # the threshold of the first iteration is the heuristic value of the initial state
+    threshold = heuristic(problem, initial_state)
+
+    # define the transposition table, it maps each state to (the lowest cummulative path cost it was reached with, the iteration)
+    transposition_table = OrderedDict() if transposition_table_size else None
+
+    iteration = 0
+
+    # loop until a solution is found or no node was cut off (the whole reachable space was searched)
+    while True:
+        iteration += 1
+
+        # the smallest total cost above the threshold seen during this iteration
+        next_threshold = float('inf')
+
+        # define the stack of the depth first search, each entry is (state, cummulative path cost, iterator over the remaining actions)
+        # the path is the list of actions from the initial state to the state at the top of the stack
+        # and the states on the path are kept in a set to skip cycles
+        stack = [(initial_state, 0, None)]
+        path: List[A] = []
+        on_path = {initial_state}
+
+        while stack:
+            state, path_cost, actions = stack[-1]
+
+            # the state is visited for the first time, expand it
+            if actions is None:
+
+                # check if this state is a goal
+                if problem.is_goal(state):
+                    return path.copy()
+
+                actions = iter(problem.get_actions(state))
+                stack[-1] = (state, path_cost, actions)
+
+                # the frontier of IDA* is the stack of the current path
+                if stats is not None:
+                    stats.on_expand(len(stack))
+
+            # get the next action of the state, or backtrack if all of its actions were tried
+            action = next(actions, None)
+            if action is None:
+                stack.pop()
+                on_path.discard(state)
+                if path:
+                    path.pop()
+                continue
+
+            # get the next state based on the action
+            new_state = problem.get_successor(state, action)
+
+            if stats is not None:
+                stats.generated += 1
+
+            # skip the states on the current path (cycles)
+            if new_state in on_path:
+                if stats is not None:
+                    stats.duplicates_pruned += 1
+                continue
+
+            # calculate the total cost = cummulative path cost + heuristic value
+            new_path_cost = path_cost + problem.get_cost(state, action)
+            new_total_cost = new_path_cost + heuristic(problem, new_state)
+
+            # cut off the nodes above the threshold and remember the smallest cut off total cost
+            if new_total_cost > threshold:
+                next_threshold = min(next_threshold, new_total_cost)
+                continue
+
+            # skip the state if it was already reached in this iteration with a lower or equal cummulative path cost
+            if transposition_table is not None:
+                entry = transposition_table.get(new_state)
+                if entry is not None and entry[1] == iteration and entry[0] <= new_path_cost:
+                    transposition_table.move_to_end(new_state)
+                    if stats is not None:
+                        stats.duplicates_pruned += 1
+                    continue
+                transposition_table[new_state] = (new_path_cost, iteration)
+                transposition_table.move_to_end(new_state)
+                if len(transposition_table) > transposition_table_size:
+                    transposition_table.popitem(last=False)
+
+            # go deeper into the new state
+            stack.append((new_state, new_path_cost, None))
+            on_path.add(new_state)
+            path.append(action)
+
+        # no node was cut off, so there is no solution
+        if next_threshold == float('inf'):
+            return None
+        threshold = next_threshold
+
+@collect_stats
+def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
     #TODO: ADD YOUR CODE HERE
     # NotImplemented()
 
@@ -314,7 +677,10 @@ def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: Heurist
     # define the explored set
     explored = set()
 
-    # get heuristic value of the initial state 
+    # define the node store which will be used to retrieve the path once a goal is found
+    nodes = NodeStore()
+
+    # get heuristic value of the initial state
     heuristic_cost = heuristic(problem, initial_state)
 
     # store each state and its heuristic value
@@ -325,29 +691,39 @@ def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: Heurist
     unique_id = 0
 
     # push the node to frontier
-    heapq.heappush(frontier,(heuristic_cost, unique_id ,initial_state, []))
+    heapq.heappush(frontier,(heuristic_cost, unique_id ,initial_state, NodeStore.ROOT))
 
     # loop while frontier is not empty
     while frontier:
             
             # pop the highest priority / lowest value node in frontier
-            _, _ , state, path = heapq.heappop(frontier)
+            _, _ , state, node = heapq.heappop(frontier)
+
+            # a state can be pushed again with a lower heuristic value, so the explored states are pruned when they are popped
+            if stats is not None and state in explored:
+                stats.duplicates_pruned += 1
 
             # if the current state is not explored yet
             if state not in explored:
 
                 # check if this new state is a goal
                 if problem.is_goal(state):
-                    return path
+                    return nodes.path(node)
                 
                 # if this state is not a goal, add it to the explored set           
                 explored.add(state)
 
+                if stats is not None:
+                    stats.on_expand(len(frontier))
+
                 # loop over possible actions for the current state 
                 for action in problem.get_actions(state):
                     
                     # get the next state based on the action
                     new_state = problem.get_successor(state, action)
+
+                    if stats is not None:
+                        stats.generated += 1
                     
                     # if the current state is not explored yet
                     if new_state not in explored:
@@ -361,13 +737,19 @@ def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: Heurist
                             # update the new state with its new heuristic value
                             state_cost[new_state] = new_heuristic_cost 
 
-                            # append this action to the path 
-                            new_path = path + [action]
+                            # create a child node for this action 
+                            new_node = nodes.add(node, action)
                             
                             # update the id
                             unique_id += 1
 
                             # push the new node into frontier
-                            heapq.heappush(frontier,(new_heuristic_cost, unique_id ,new_state, new_path))
+                            heapq.heappush(frontier,(new_heuristic_cost, unique_id ,new_state, new_node))
+
+                        elif stats is not None:
+                            stats.duplicates_pruned += 1
+
+                    elif stats is not None:
+                        stats.duplicates_pruned += 1
                             
     return None  
\ No newline at end of file
@@ -0,0 +1,74 @@
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Optional
+from problem import HeuristicFunction
+import time, tracemalloc
+
+# SearchStats collects statistics about a search while it runs
+# An instance can be passed to any search function in search.py using the keyword argument "stats"
+# If no stats object is passed (the default), the search does not collect anything so there is no overhead
+# If the same object is passed to multiple searches, the statistics are accumulated
+@dataclass
+class SearchStats:
+    expanded: int = 0               # The number of expanded nodes (nodes whose actions were generated)
+    generated: int = 0              # The number of generated nodes (successors computed during the expansions)
+    duplicates_pruned: int = 0      # The number of generated nodes that were dropped since their state was already reached with a lower or equal cost
+    max_frontier: int = 0           # The maximum size of the frontier
+    heuristic_evaluations: int = 0  # The number of heuristic calls
+    heuristic_time: float = 0       # The total time spent in the heuristic (in seconds)
+    search_time: float = 0          # The total time spent in the search, including the heuristic (in seconds)
+    peak_memory: Optional[int] = None # The peak memory allocated during the search (in bytes), only measured if trace_memory is True
+    trace_memory: bool = False      # If True, use tracemalloc to measure the peak memory (it slows down the search considerably)
+
+    # Called by the search after expanding a node, with the size of the frontier after adding the children
+    def on_expand(self, frontier_size: int) -> None:
+        self.expanded += 1
+        if frontier_size > self.max_frontier:
+            self.max_frontier = frontier_size
+
+    # Wrap a heuristic function to count its calls and measure the time spent in it
+    def track_heuristic(self, heuristic: HeuristicFunction) -> HeuristicFunction:
+        def tracked_heuristic(problem, state):
+            start = time.perf_counter()
+            value = heuristic(problem, state)
+            self.heuristic_time += time.perf_counter() - start
+            self.heuristic_evaluations += 1
+            return value
+        return tracked_heuristic
+
+    def __str__(self) -> str:
+        lines = [
+            f"Expanded nodes: {self.expanded}",
+            f"Generated nodes: {self.generated}",
+            f"Duplicates pruned: {self.duplicates_pruned}",
+            f"Max frontier size: {self.max_frontier}",
+            f"Heuristic evaluations: {self.heuristic_evaluations} ({self.heuristic_time:.4f} seconds)",
+            f"Search time: {self.search_time:.4f} seconds",
+        ]
+        if self.peak_memory is not None:
+            lines.append(f"Peak memory: {self.peak_memory / 1024:.1f} KB")
+        return '\n'.join(lines)
+
+# This decorator adds the keyword argument "stats" to a search function
+# If stats is None, the search function is called directly (with stats=None) so nothing is measured.
+# Otherwise, the heuristic (the third argument, if any) is wrapped to be tracked, and the search time and the peak memory are measured.
+# The search function itself is responsible for counting the expanded, generated and pruned nodes if stats is not None.
+def collect_stats(search_fn: Callable) -> Callable:
+    @wraps(search_fn)
+    def search_with_stats(problem, initial_state, *args, stats: Optional[SearchStats] = None, **kwargs):
+        if stats is None:
+            return search_fn(problem, initial_state, *args, **kwargs)
+        if args:
+            args = (stats.track_heuristic(args[0]),) + args[1:]
+        if stats.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return search_fn(problem, initial_state, *args, stats=stats, **kwargs)
+        finally:
+            stats.search_time += time.perf_counter() - start
+            if stats.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                stats.peak_memory = max(stats.peak_memory or 0, peak)
+    return search_with_stats
@@ -1,8 +1,9 @@
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+from collections import OrderedDict, deque
 from enum import Enum
 
-from mathutils import Direction, Point
+from mathutils import Direction, Point, get_point_pool, to_cell, zobrist_key
 from problem import Problem
 from helpers.utils import track_call_count
 
@@ -34,18 +35,53 @@ class SokobanLayout:
     walkable: FrozenSet[Point]
     goals: FrozenSet[Point]
 
-# For the sokoban state, we use dataclass with frozen=True to automatically implement:
-#   the constructor, the == operator, the hash function and to make the class immutable
-# Now it can be added to sets and used as keys in dictionaries
+# Aliases used to create frozen states without calling their constructor (see SokobanState.with_hash)
+_new_object, _set_attribute = object.__new__, object.__setattr__
+
+# For the sokoban state, we use dataclass with frozen=True to implement the constructor and to make the class immutable
 # This will contain a reference to the sokoban layout and it will contain environment details that change across states such as:
 #   The player location and the locations of the crates 
+# The state also stores its Zobrist hash (the XOR of the keys of the player and the crates positions, see zobrist_key),
+# which is computed once in __post_init__ so hashing the state does not hash the crates set and the player point.
+# The == operator and the hash function are overridden (instead of the ones generated by the dataclass):
+#   __hash__ returns the stored Zobrist hash, and __eq__ compares the Zobrist hashes first
+#   then compares the player, the crates and the layout only when the hashes are equal.
+# Now it can be added to sets and used as keys in dictionaries
+# The problems update the hash incrementally in get_successor by XORing the keys of the moved player and crate,
+# then create the state with SokobanState.with_hash which skips __post_init__.
+# Every caller of with_hash must pass the hash that __post_init__ would compute for the same player and crates,
+# otherwise equal states would have different hashes.
 @dataclass(frozen=True)
 class SokobanState:
-    __slots__ = ("layout", "player", "crates")
+    __slots__ = ("layout", "player", "crates", "zobrist")
     layout: SokobanLayout
     player: Point
     crates: FrozenSet[Point]
 
+    def __post_init__(self):
+        object.__setattr__(self, "zobrist", sokoban_zobrist_hash(self.player, self.crates))
+
+    def __hash__(self) -> int:
+        return self.zobrist
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, SokobanState):
+            return NotImplemented
+        return self.zobrist == other.zobrist and self.player == other.player and self.crates == other.crates and self.layout is other.layout
+
+    # Create a state whose Zobrist hash is already known (computed incrementally from the hash of its parent)
+    # It skips the dataclass constructor (and __post_init__) and sets the slots directly since the state is frozen
+    @staticmethod
+    def with_hash(layout: SokobanLayout, player: Point, crates: FrozenSet[Point], zobrist: int) -> 'SokobanState':
+        state = _new_object(SokobanState)
+        _set_attribute(state, "layout", layout)
+        _set_attribute(state, "player", player)
+        _set_attribute(state, "crates", crates)
+        _set_attribute(state, "zobrist", zobrist)
+        return state
+
     # This operator will convert the state to a string containing the grid representation of the level at the current state
     def __str__(self) -> str:
         def position_to_str(position):
@@ -68,6 +104,25 @@ AllSokobanActions = [
     Direction.LEFT
 ]
 
+# The Zobrist keys of the crates use the feature index 0 and the keys of the player use the feature index 1
+def sokoban_zobrist_hash(player: Point, crates: Iterable[Point]) -> int:
+    zobrist = zobrist_key(1, player.x, player.y)
+    for crate in crates:
+        zobrist ^= zobrist_key(0, crate.x, crate.y)
+    return zobrist
+
+# Return the Zobrist keys of the crates and the player for every cell (y * width + x) of the layout
+# The tables are computed once per problem and stored in the problem cache
+def get_zobrist_tables(problem: Problem) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    cache = problem.cache()
+    tables = cache.get("zobrist")
+    if tables is None:
+        width, height = problem.layout.width, problem.layout.height
+        tables = cache["zobrist"] = tuple(
+            tuple(zobrist_key(index, cell % width, cell // width) for cell in range(width * height)) for index in (0, 1)
+        )
+    return tables
+
 # This is the implementation of the sokoban problem
 class SokobanProblem(Problem[SokobanState, Direction]):
     # The problem will contain the sokoban layout and the inital state
@@ -83,42 +138,51 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
     @track_call_count
     def get_actions(self, state: SokobanState) -> Iterable[Direction]:
+        # the pool returns the existing point next to a position instead of allocating a new one
+        pool = get_point_pool(self.layout.width, self.layout.height)
         actions = []
         for direction in Direction:
-            position = state.player + direction.to_vector()
+            position = pool.neighbor(state.player, direction)
             # Disallow walking into walls
             if position not in self.layout.walkable: continue
             # Check if walking into a crate
             if position in state.crates:
                 # make sure that the crate is not pushed into a wall or another crate
-                crate_position = position + direction.to_vector()
+                crate_position = pool.neighbor(position, direction)
                 if crate_position not in self.layout.walkable or crate_position in state.crates:
                     continue
             actions.append(direction)
         return actions
 
     def get_successor(self, state: SokobanState, action: Direction) -> SokobanState:
-        player = state.player + action.to_vector()
+        pool = get_point_pool(self.layout.width, self.layout.height)
+        player = pool.neighbor(state.player, action)
         crates = state.crates
         if player not in self.layout.walkable:
             # If we try to walk into a wall, then this action is wrong
             raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        crate_keys, player_keys = get_zobrist_tables(self)
+        width = self.layout.width
+        # move the player key from the old position to the new position
+        zobrist = state.zobrist ^ player_keys[state.player.y * width + state.player.x] ^ player_keys[player.y * width + player.x]
         if player in crates:
-            crate_position = player + action.to_vector()
+            crate_position = pool.neighbor(player, action)
             if crate_position not in self.layout.walkable or crate_position in crates:
                 # If we try to push a crate into a wall or another crate, then this action is wrong
                 raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
             # If we walk to a crate, we push it
             crates = crates.symmetric_difference({player,crate_position})
-        return SokobanState(state.layout, player, crates)
+            zobrist ^= crate_keys[player.y * width + player.x] ^ crate_keys[crate_position.y * width + crate_position.x]
+        return SokobanState.with_hash(state.layout, player, crates, zobrist)
 
     def get_cost(self, state: SokobanState, action: Direction) -> float:
         # All actions have the same cost
         return 1
 
     # Read a sokoban problem from text containing a grid of tiles
+    # If compact is True, the problem will use the compact state representation (see CompactSokobanProblem)
     @staticmethod
-    def from_text(text: str) -> 'SokobanProblem':
+    def from_text(text: str, compact: bool = False) -> 'SokobanProblem':
         walkable, crates, goals =  set(), set(), set()
         player: Point = None
         lines = [line for line in (line.strip() for line in text.splitlines()) if line]
@@ -139,13 +203,322 @@ class SokobanProblem(Problem[SokobanState, Direction]):
                     elif char == SokobanTile.CRATE_ON_GOAL:
                         crates.add(Point(x, y))
                         goals.add(Point(x, y))
+        layout = SokobanLayout(width, height, frozenset(walkable), frozenset(goals))
+        if compact:
+            return CompactSokobanProblem.from_layout(layout, player, crates)
         problem = SokobanProblem()
-        problem.layout = SokobanLayout(width, height, frozenset(walkable), frozenset(goals))
+        problem.layout = layout
         problem.initial_state = SokobanState(problem.layout, player, frozenset(crates))
         return problem
 
     # Read a sokoban problem from file containing a grid of tiles
     @staticmethod
-    def from_file(path: str) -> 'SokobanProblem':
+    def from_file(path: str, compact: bool = False) -> 'SokobanProblem':
         with open(path, 'r') as f:
-            return SokobanProblem.from_text(f.read())
\ No newline at end of file
+            return SokobanProblem.from_text(f.read(), compact)
+
+# The compact sokoban representation encodes every cell as an integer index (y * width + x)
+# and the crates as a bitmask where bit 'i' is set if cell 'i' contains a crate.
+# The layout precomputes, for every direction, the index of the neighbor of each cell (or -1 if the neighbor is a wall)
+# so generating actions and successors only involves integer operations instead of allocating points and sets.
+# The compact layout also keeps the walkable and goals sets of the original layout so it can be printed and used by the heuristics.
+@dataclass(eq=False, frozen=True)
+class CompactSokobanLayout:
+    __slots__ = ("width", "height", "walkable", "goals", "goal_mask", "points", "neighbors")
+    width: int
+    height: int
+    walkable: FrozenSet[Point]
+    goals: FrozenSet[Point]
+    goal_mask: int                          # The bitmask of the goal cells
+    points: Tuple[Point, ...]               # points[i] is the position of cell 'i'
+    neighbors: Tuple[Tuple[int, ...], ...]  # neighbors[direction][i] is the cell next to cell 'i' in the given direction (-1 if it is a wall)
+
+    # Convert a position into a cell index
+    def to_cell(self, position: Point) -> int:
+        return to_cell(position, self.width)
+
+    # Convert a cell index into a position
+    def to_point(self, cell: int) -> Point:
+        return self.points[cell]
+
+    # Convert a set of positions into a bitmask
+    def to_mask(self, positions: Iterable[Point]) -> int:
+        mask = 0
+        for position in positions:
+            mask |= 1 << self.to_cell(position)
+        return mask
+
+    # Convert a bitmask into a set of positions
+    def to_points(self, mask: int) -> FrozenSet[Point]:
+        points = []
+        while mask:
+            lowest = mask & -mask
+            points.append(self.points[lowest.bit_length() - 1])
+            mask ^= lowest
+        return frozenset(points)
+
+    # Create a compact layout from a sokoban layout
+    @staticmethod
+    def from_layout(layout: SokobanLayout) -> 'CompactSokobanLayout':
+        width, height, walkable = layout.width, layout.height, layout.walkable
+        points = get_point_pool(width, height).points
+        neighbors = []
+        for direction in Direction:
+            vector = direction.to_vector()
+            table = []
+            for point in points:
+                neighbor = point + vector
+                table.append(to_cell(neighbor, width) if point in walkable and neighbor in walkable else -1)
+            neighbors.append(tuple(table))
+        goal_mask = 0
+        for goal in layout.goals:
+            goal_mask |= 1 << to_cell(goal, width)
+        return CompactSokobanLayout(width, height, walkable, layout.goals, goal_mask, points, tuple(neighbors))
+
+# The compact sokoban state stores the player cell index and the crates bitmask, so hashing and comparing states are integer operations
+# It also exposes "player" and "crates" as a Point and a set of Points (computed on demand)
+# so that it can be printed and used by the heuristics written for SokobanState
+@dataclass(frozen=True)
+class CompactSokobanState:
+    __slots__ = ("layout", "player_cell", "crate_mask")
+    layout: CompactSokobanLayout
+    player_cell: int
+    crate_mask: int
+
+    @property
+    def player(self) -> Point:
+        return self.layout.points[self.player_cell]
+
+    @property
+    def crates(self) -> FrozenSet[Point]:
+        return self.layout.to_points(self.crate_mask)
+
+    __str__ = SokobanState.__str__
+
+# This is the implementation of the sokoban problem using the compact state representation
+# It has the same actions, costs and goal as SokobanProblem, so it can be used by the same agents
+class CompactSokobanProblem(SokobanProblem):
+    layout: CompactSokobanLayout
+    initial_state: CompactSokobanState
+
+    def is_goal(self, state: CompactSokobanState) -> bool:
+        return self.layout.goal_mask == state.crate_mask
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: CompactSokobanState) -> Iterable[Direction]:
+        neighbors = self.layout.neighbors
+        player, crates = state.player_cell, state.crate_mask
+        actions = []
+        for direction in Direction:
+            table = neighbors[direction]
+            position = table[player]
+            # Disallow walking into walls
+            if position < 0: continue
+            # Check if walking into a crate
+            if crates >> position & 1:
+                # make sure that the crate is not pushed into a wall or another crate
+                crate_position = table[position]
+                if crate_position < 0 or crates >> crate_position & 1:
+                    continue
+            actions.append(direction)
+        return actions
+
+    def get_successor(self, state: CompactSokobanState, action: Direction) -> CompactSokobanState:
+        table = self.layout.neighbors[action]
+        player = table[state.player_cell]
+        crates = state.crate_mask
+        if player < 0:
+            # If we try to walk into a wall, then this action is wrong
+            raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        if crates >> player & 1:
+            crate_position = table[player]
+            if crate_position < 0 or crates >> crate_position & 1:
+                # If we try to push a crate into a wall or another crate, then this action is wrong
+                raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+            # If we walk to a crate, we push it
+            crates ^= (1 << player) | (1 << crate_position)
+        return CompactSokobanState(state.layout, player, crates)
+
+    # Create a compact sokoban problem from a sokoban layout, the player position and the crate positions
+    @staticmethod
+    def from_layout(layout: SokobanLayout, player: Point, crates: Iterable[Point]) -> 'CompactSokobanProblem':
+        problem = CompactSokobanProblem()
+        problem.layout = CompactSokobanLayout.from_layout(layout)
+        problem.initial_state = CompactSokobanState(problem.layout, problem.layout.to_cell(player), problem.layout.to_mask(crates))
+        return problem
+
+# A push moves the crate at "crate" by one cell in "direction"
+# The player has to walk to the cell behind the crate (crate - direction) first, the walk is not a part of the action
+@dataclass(frozen=True)
+class SokobanPush:
+    __slots__ = ("crate", "direction")
+    crate: Point
+    direction: Direction
+
+    def __str__(self) -> str:
+        return f"{self.crate}{self.direction}"
+
+# The maximum number of player regions stored in the problem cache of SokobanPushProblem
+REACHABILITY_CACHE_SIZE = 2**16
+
+# This is the macro-move formulation of the sokoban problem where every action is a crate push.
+# Most of the actions of SokobanProblem only walk the player around without changing the crates,
+# and the same crates with the player at different cells of the same region are different states.
+# Here, the player is free to walk anywhere in its region (the cells it can reach without pushing a crate),
+# so the state stores the crates and a normalized player position: the top-left cell of the region (the smallest (y, x)).
+# The states are SokobanState objects so the sokoban heuristics and printing can be used on them directly.
+# Every push costs 1, so the optimal solutions minimize the number of pushes (not the number of moves),
+# and the heuristics must not count the walking steps (use push_heuristic from sokoban_heuristic.py).
+# The solutions (lists of pushes) are converted back into directions using "to_directions"
+# (see also "search_with_pushes" which does that for any search function).
+class SokobanPushProblem(Problem[SokobanState, SokobanPush]):
+    layout: SokobanLayout
+    initial_state: SokobanState
+
+    def get_initial_state(self) -> SokobanState:
+        return self.initial_state
+
+    def is_goal(self, state: SokobanState) -> bool:
+        return self.layout.goals == state.crates
+
+    # Flood fill the cells that the player can reach from "player" without pushing any crate
+    def flood_fill(self, player: Point, crates: FrozenSet[Point]) -> FrozenSet[Point]:
+        walkable, pool = self.layout.walkable, get_point_pool(self.layout.width, self.layout.height)
+        region = {player}
+        frontier = [player]
+        while frontier:
+            position = frontier.pop()
+            for direction in AllSokobanActions:
+                neighbor = pool.neighbor(position, direction)
+                if neighbor in walkable and neighbor not in crates and neighbor not in region:
+                    region.add(neighbor)
+                    frontier.append(neighbor)
+        return frozenset(region)
+
+    # Return the region of the player in the given state
+    # The regions are cached (LRU) in the problem cache since get_successor computes the region of every new state
+    # to normalize its player position, then get_actions needs the same region when the state is expanded
+    def get_region(self, state: SokobanState) -> FrozenSet[Point]:
+        regions: OrderedDict = self.cache().get("regions")
+        region = None if regions is None else regions.get(state)
+        if region is None:
+            return self.store_region(state, self.flood_fill(state.player, state.crates))
+        regions.move_to_end(state)
+        return region
+
+    # Store the region of a state in the problem cache and evict the least recently used region if the cache is full
+    def store_region(self, state: SokobanState, region: FrozenSet[Point]) -> FrozenSet[Point]:
+        cache = self.cache()
+        regions: OrderedDict = cache.get("regions")
+        if regions is None:
+            regions = cache["regions"] = OrderedDict()
+        regions[state] = region
+        if len(regions) > REACHABILITY_CACHE_SIZE:
+            regions.popitem(last=False)
+        return region
+
+    # Create the state of the given crates where the player is at "player", with the player position normalized
+    # If the Zobrist hash of the crates alone is given, the hash of the state is computed from it instead of hashing every crate
+    def create_state(self, player: Point, crates: FrozenSet[Point], crates_zobrist: Optional[int] = None) -> SokobanState:
+        region = self.flood_fill(player, crates)
+        player = min(region, key=lambda position: (position.y, position.x))
+        if crates_zobrist is None:
+            state = SokobanState(self.layout, player, crates)
+        else:
+            _, player_keys = get_zobrist_tables(self)
+            state = SokobanState.with_hash(self.layout, player, crates, crates_zobrist ^ player_keys[player.y * self.layout.width + player.x])
+        self.store_region(state, region)
+        return state
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: SokobanState) -> Iterable[SokobanPush]:
+        walkable, crates = self.layout.walkable, state.crates
+        region = self.get_region(state)
+        actions = []
+        # the crates are sorted so the order of the actions does not depend on the iteration order of the set
+        for crate in sorted(crates, key=lambda position: (position.y, position.x)):
+            for direction in AllSokobanActions:
+                vector = direction.to_vector()
+                # the player must be able to reach the cell behind the crate
+                if crate - vector not in region: continue
+                # make sure that the crate is not pushed into a wall or another crate
+                target = crate + vector
+                if target not in walkable or target in crates: continue
+                actions.append(SokobanPush(crate, direction))
+        return actions
+
+    def get_successor(self, state: SokobanState, action: SokobanPush) -> SokobanState:
+        crate, vector = action.crate, action.direction.to_vector()
+        target = action.crate + vector
+        if crate not in state.crates or crate - vector not in self.get_region(state) \
+                or target not in self.layout.walkable or target in state.crates:
+            raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        crate_keys, player_keys = get_zobrist_tables(self)
+        width = self.layout.width
+        # remove the player key from the hash and move the crate key from the old position to the new position
+        crates_zobrist = state.zobrist ^ player_keys[state.player.y * width + state.player.x] \
+            ^ crate_keys[crate.y * width + crate.x] ^ crate_keys[target.y * width + target.x]
+        # after the push, the player stands where the crate was
+        return self.create_state(crate, state.crates.symmetric_difference({crate, target}), crates_zobrist)
+
+    def get_cost(self, state: SokobanState, action: SokobanPush) -> float:
+        # Every push has the same cost regardless of the number of steps walked before it
+        return 1
+
+    # Find the shortest walk of the player from "start" to "goal" without pushing any crate (None if there is none)
+    def walk(self, start: Point, goal: Point, crates: FrozenSet[Point]) -> Optional[List[Direction]]:
+        walkable, pool = self.layout.walkable, get_point_pool(self.layout.width, self.layout.height)
+        parents: Dict[Point, Tuple[Point, Direction]] = {start: None}
+        frontier = deque([start])
+        while frontier:
+            position = frontier.popleft()
+            if position == goal:
+                path = []
+                while parents[position] is not None:
+                    position, direction = parents[position]
+                    path.append(direction)
+                return path[::-1]
+            for direction in AllSokobanActions:
+                neighbor = pool.neighbor(position, direction)
+                if neighbor in walkable and neighbor not in crates and neighbor not in parents:
+                    parents[neighbor] = (position, direction)
+                    frontier.append(neighbor)
+        return None
+
+    # Convert a solution made of pushes into the directions that solve the original problem
+    # starting from the given (not normalized) player position and crates
+    # Before each push, the player takes the shortest walk to the cell behind the crate
+    def to_directions(self, player: Point, crates: Iterable[Point], pushes: Iterable[SokobanPush]) -> List[Direction]:
+        crates = frozenset(crates)
+        directions = []
+        for push in pushes:
+            vector = push.direction.to_vector()
+            path = self.walk(player, push.crate - vector, crates)
+            if path is None or push.crate not in crates:
+                raise Exception(f"Invalid push {push} with the player at {player}")
+            directions.extend(path)
+            directions.append(push.direction)
+            player = push.crate
+            crates = crates.symmetric_difference({push.crate, push.crate + vector})
+        return directions
+
+    # Create the push problem for a sokoban problem starting from the given state (a SokobanState or a CompactSokobanState)
+    @staticmethod
+    def from_state(layout: Union[SokobanLayout, CompactSokobanLayout], state: Union[SokobanState, CompactSokobanState]) -> 'SokobanPushProblem':
+        problem = SokobanPushProblem()
+        problem.layout = layout if isinstance(layout, SokobanLayout) else SokobanLayout(layout.width, layout.height, layout.walkable, layout.goals)
+        problem.initial_state = problem.create_state(state.player, frozenset(state.crates))
+        return problem
+
+# Solve a sokoban problem using the push formulation with the given search function (any search function of search.py)
+# and return the solution as a list of directions (or None if there is no solution) so it can be used by the existing agents
+# The extra arguments (such as the heuristic) are passed to the search function
+# Example: search_with_pushes(AStarSearch, problem, state, push_heuristic)
+def search_with_pushes(search_fn: Callable, problem: SokobanProblem, state: SokobanState, *args, **kwargs) -> Optional[List[Direction]]:
+    push_problem = SokobanPushProblem.from_state(problem.layout, state)
+    pushes = search_fn(push_problem, push_problem.get_initial_state(), *args, **kwargs)
+    if pushes is None:
+        return None
+    return push_problem.to_directions(state.player, state.crates, pushes)
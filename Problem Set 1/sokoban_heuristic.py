@@ -1,17 +1,147 @@
-from sokoban import SokobanProblem, SokobanState
-from mathutils import Direction, Point, manhattan_distance
+from sokoban import CompactSokobanState, SokobanProblem, SokobanState
+from mathutils import Direction, Point, manhattan_distance, manhattan_distances, to_cell
 from helpers.utils import NotImplemented
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+from array import array
+import hashlib, mmap, os, struct, sys
 
 # This heuristic returns the distance between the player and the nearest crate as an estimate for the path cost
 # While it is consistent, it does a bad job at estimating the actual cost thus the search will explore a lot of nodes before finding a goal
 def weak_heuristic(problem: SokobanProblem, state: SokobanState):
-    return min(manhattan_distance(state.player, crate) for crate in state.crates) - 1
+    return min(manhattan_distances(state.player, state.crates)) - 1
 
 #TODO: Import any modules and write any functions you want to use
 
 def calculate_manhattan_distance(crate, goal):
     return abs(crate.x - goal.x) + abs(crate.y - goal.y)
 
+# The layout analysis contains information about the layout that does not depend on the state
+# so it is computed once per problem (see get_layout_analysis) and reused for every state.
+# Cells are indexed by "y * width + x" (the same index used by the compact sokoban representation)
+@dataclass(frozen=True)
+class SokobanLayoutAnalysis:
+    width: int
+    # The bitmask of the dead cells: cells from which a crate can never be pushed to any goal (even if there were no other crates)
+    dead_mask: int
+    # For every goal, a table containing the minimum number of pushes needed to move a crate from each cell to this goal (inf if impossible)
+    push_distances: Dict[Point, Tuple[float, ...]]
+    # A table containing the minimum number of pushes needed to move a crate from each cell to its nearest goal (inf for dead cells)
+    nearest_goal_distance: Tuple[float, ...]
+    # For every cell, the push distances to every goal (in the order of push_distances) where infinity is replaced by UNREACHABLE
+    push_costs: Tuple[Tuple[float, ...], ...]
+    # The bitmask of the goal cells
+    goal_mask: int
+    # The bitmask of the walls (every cell that is not walkable)
+    wall_mask: int
+    # The bitmask of the cells that are the top-left corner of a 2x2 square inside the grid
+    square_mask: int
+
+# Compute the push distances from every cell to the given goal
+# This is a BFS that starts at the goal and pulls the crate backwards:
+# a crate at 'cell' can be pushed in a direction to 'cell + direction' if the player can stand at 'cell - direction',
+# so from a crate position we can move backwards to 'position - direction' if both it and 'position - 2 * direction' are walkable.
+# Other crates are ignored, so the distances are lower bounds on the actual number of pushes.
+def compute_push_distances(layout, goal: Point) -> Tuple[float, ...]:
+    width, walkable = layout.width, layout.walkable
+    distances = [float('inf')] * (layout.width * layout.height)
+    distances[to_cell(goal, width)] = 0
+    frontier = deque([goal])
+    while frontier:
+        position = frontier.popleft()
+        distance = distances[to_cell(position, width)] + 1
+        for direction in Direction:
+            vector = direction.to_vector()
+            previous = position - vector
+            if previous not in walkable or previous - vector not in walkable:
+                continue
+            cell = to_cell(previous, width)
+            if distances[cell] > distance:
+                distances[cell] = distance
+                frontier.append(previous)
+    return tuple(distances)
+
+# Analyze the layout of the problem once and store the result in the problem cache
+def get_layout_analysis(problem: SokobanProblem) -> SokobanLayoutAnalysis:
+    cache = problem.cache()
+    analysis = cache.get("layout_analysis")
+    if analysis is None:
+        layout = problem.layout
+        push_distances = {goal: compute_push_distances(layout, goal) for goal in layout.goals}
+        nearest_goal_distance = tuple(map(min, zip(*push_distances.values())))
+        width, height = layout.width, layout.height
+        dead_mask, goal_mask, wall_mask, square_mask = 0, 0, 0, 0
+        for y in range(height):
+            for x in range(width):
+                cell = y * width + x
+                if Point(x, y) not in layout.walkable:
+                    wall_mask |= 1 << cell
+                elif nearest_goal_distance[cell] == float('inf'):
+                    dead_mask |= 1 << cell
+                if Point(x, y) in layout.goals:
+                    goal_mask |= 1 << cell
+                if x < width - 1 and y < height - 1:
+                    square_mask |= 1 << cell
+        push_costs = tuple(tuple(min(distance, UNREACHABLE) for distance in distances) for distances in zip(*push_distances.values()))
+        analysis = SokobanLayoutAnalysis(width, dead_mask, push_distances, nearest_goal_distance, push_costs, goal_mask, wall_mask, square_mask)
+        cache["layout_analysis"] = analysis
+    return analysis
+
+# Return the crates bitmask for both the original and the compact sokoban states
+def get_crate_mask(state: SokobanState) -> int:
+    if isinstance(state, CompactSokobanState):
+        return state.crate_mask
+    width, mask = state.layout.width, 0
+    for crate in state.crates:
+        mask |= 1 << (crate.y * width + crate.x)
+    return mask
+
+# Check if any 2x2 square is fully blocked by walls and crates while containing a crate that is not on a goal
+# None of the crates in such a square can ever be pushed, so the state is a deadlock
+def has_frozen_square(analysis: SokobanLayoutAnalysis, crates: int) -> bool:
+    width = analysis.width
+    blocked = crates | analysis.wall_mask
+    squares = blocked & (blocked >> 1) & (blocked >> width) & (blocked >> (width + 1)) & analysis.square_mask
+    if not squares:
+        return False
+    loose = crates & ~analysis.goal_mask
+    return bool(squares & (loose | (loose >> 1) | (loose >> width) | (loose >> (width + 1))))
+
+# Check if the crate at 'cell' can never move again (a freeze deadlock if it is not on a goal)
+# A crate is blocked along an axis (horizontal or vertical) if one of its two neighbors on this axis is a wall,
+# if both neighbors are dead cells (pushing it either way puts it on a dead cell),
+# or if one of the neighbors is a crate that is itself frozen. While checking the neighbor crate, the current crate is treated as a wall
+# (the 'walls' bitmask) so the recursion ends. A crate that is blocked along both axes can never be pushed.
+def is_frozen_crate(analysis: SokobanLayoutAnalysis, crates: int, cell: int, walls: int) -> bool:
+    walls |= 1 << cell
+    for step in (1, analysis.width):
+        before, after = cell - step, cell + step
+        if (walls >> before) & 1 or (walls >> after) & 1:
+            continue
+        if (analysis.dead_mask >> before) & 1 and (analysis.dead_mask >> after) & 1:
+            continue
+        if (crates >> before) & 1 and is_frozen_crate(analysis, crates, before, walls):
+            continue
+        if (crates >> after) & 1 and is_frozen_crate(analysis, crates, after, walls):
+            continue
+        return False
+    return True
+
+# Check if any crate that is not on a goal is frozen (see is_frozen_crate)
+# Only the crates that touch another crate are checked, since a single crate against the walls is already on a dead cell
+def has_frozen_crate(analysis: SokobanLayoutAnalysis, crates: int) -> bool:
+    width = analysis.width
+    touching = crates & ((crates << 1) | (crates >> 1) | (crates << width) | (crates >> width))
+    loose = touching & ~analysis.goal_mask
+    while loose:
+        lowest = loose & -loose
+        loose ^= lowest
+        if is_frozen_crate(analysis, crates, lowest.bit_length() - 1, analysis.wall_mask):
+            return True
+    return False
+
 def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     #TODO: ADD YOUR CODE HERE
     #IMPORTANT: DO NOT USE "problem.get_actions" HERE.
@@ -21,121 +151,310 @@ def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     # This could be useful if you want to store the results heavy computations that can be cached and used across multiple calls of this function
     # NotImplemented()
 
-    
-    # total distance
-    distance = 0
-
-    # penalty for deadlocks to be avoided in exploration because it will have high heuristic value
-    penalty = float('inf')
-
-    # just for simplicity
-    goals = state.layout.goals
-    crates = state.crates
-    walkable = state.layout.walkable
-    width = state.layout.width
-    height = state.layout.height
-    
-    # check if the current state is a goal state
-    if goals == crates:
+
+    # the strong heuristic is the crate to goal matching heuristic (see matching_heuristic below)
+    # it uses the layout analysis (dead cells and push distances) which is computed once per problem then cached
+    return matching_heuristic(problem, state)
+
+# The cost used in the assignment problem instead of an infinite push distance
+# Any assignment whose cost reaches it contains a crate that can not reach its goal
+UNREACHABLE = 1 << 20
+
+# This is the solution of the crate to goal assignment problem for a certain set of crates
+# It stores the dual potentials of the Hungarian algorithm so it can be updated when a single crate moves
+@dataclass(frozen=True)
+class CrateGoalMatching:
+    crates: Tuple[int, ...]     # The cell of the crate assigned to each row
+    row_potentials: List[float] # u[1..n] (index 0 is unused)
+    goal_potentials: List[float]# v[0..m]
+    assignment: List[int]       # assignment[j] is the row (1-based) assigned to goal j (0 if no row is assigned)
+    cost: float                 # The total push distance of the assignment (inf if a crate can not reach its goal)
+
+# Add a row to a partial assignment using a shortest augmenting path (one step of the Hungarian algorithm in O(n*m))
+# 'costs' is a list of rows where costs[i-1][j-1] is the cost of assigning row i to goal j
+# The potentials and the assignment are updated in place
+def augment_row(costs: List[Tuple[float, ...]], u: List[float], v: List[float], p: List[int], row: int):
+    m = len(v) - 1
+    way = [0] * (m + 1)
+    minv = [float('inf')] * (m + 1)
+    used = [False] * (m + 1)
+    p[0] = row
+    j0 = 0
+    while True:
+        used[j0] = True
+        i0 = p[j0]
+        row_costs, ui = costs[i0 - 1], u[i0]
+        delta, j1 = float('inf'), 0
+        for j in range(1, m + 1):
+            if not used[j]:
+                current = row_costs[j - 1] - ui - v[j]
+                if current < minv[j]:
+                    minv[j], way[j] = current, j0
+                if minv[j] < delta:
+                    delta, j1 = minv[j], j
+        for j in range(m + 1):
+            if used[j]:
+                u[p[j]] += delta
+                v[j] -= delta
+            else:
+                minv[j] -= delta
+        j0 = j1
+        if p[j0] == 0:
+            break
+    while j0:
+        j1 = way[j0]
+        p[j0] = p[j1]
+        j0 = j1
+
+# Compute the total cost of an assignment (inf if a crate is assigned to a goal it can not reach)
+def assignment_cost(costs: List[Tuple[float, ...]], p: List[int]) -> float:
+    total = sum(costs[p[j] - 1][j - 1] for j in range(1, len(p)) if p[j])
+    return float('inf') if total >= UNREACHABLE else total
+
+# Solve the crate to goal assignment from scratch with the Hungarian algorithm
+# With more crates than goals, some crate can never be assigned (augment_row would never find a free goal),
+# and since the goal requires every crate to be on a goal, the state can never be solved
+def solve_matching(analysis: 'SokobanLayoutAnalysis', crates: Tuple[int, ...]) -> CrateGoalMatching:
+    costs = [analysis.push_costs[cell] for cell in crates]
+    n, m = len(crates), len(analysis.push_distances)
+    u, v, p = [0] * (n + 1), [0] * (m + 1), [0] * (m + 1)
+    if n > m:
+        return CrateGoalMatching(crates, u, v, p, float('inf'))
+    for row in range(1, n + 1):
+        augment_row(costs, u, v, p, row)
+    return CrateGoalMatching(crates, u, v, p, assignment_cost(costs, p))
+
+# Update the assignment of a parent state after one of its crates moved from 'old_cell' to 'new_cell'
+# Only the row of the moved crate changes: it is unassigned, its potential is reset so its reduced costs are feasible,
+# then it is added back with one augmenting path in O(n*m) instead of solving the whole problem in O(n^2*m).
+# This is only exact when every goal is assigned (as many crates as goals), otherwise the matching is solved from scratch.
+def update_matching(analysis: 'SokobanLayoutAnalysis', parent: CrateGoalMatching, old_cell: int, new_cell: int) -> CrateGoalMatching:
+    crates = list(parent.crates)
+    if len(crates) != len(parent.goal_potentials) - 1:
+        crates[crates.index(old_cell)] = new_cell
+        return solve_matching(analysis, tuple(crates))
+    row = crates.index(old_cell) + 1
+    crates[row - 1] = new_cell
+    costs = [analysis.push_costs[cell] for cell in crates]
+    u, v, p = list(parent.row_potentials), list(parent.goal_potentials), list(parent.assignment)
+    p[p.index(row, 1)] = 0
+    u[row] = min(cost - potential for cost, potential in zip(costs[row - 1], v[1:]))
+    augment_row(costs, u, v, p, row)
+    return CrateGoalMatching(tuple(crates), u, v, p, assignment_cost(costs, p))
+
+# Return the crate to goal assignment for the given crates bitmask
+# The matchings are cached (LRU) in the problem cache. If the crates did not change (the player only walked), the cached matching is reused.
+# Otherwise, we look for a cached matching of a parent state where a single crate was one push away and update it.
+def get_matching(problem: SokobanProblem, analysis: 'SokobanLayoutAnalysis', crates: int) -> CrateGoalMatching:
+    cache = problem.cache()
+    matchings: OrderedDict = cache.get("matchings")
+    if matchings is None:
+        matchings = cache["matchings"] = OrderedDict()
+    matching = matchings.get(crates)
+    if matching is not None:
+        matchings.move_to_end(crates)
+        return matching
+    width = analysis.width
+    remaining = crates
+    while remaining and matching is None:
+        lowest = remaining & -remaining
+        remaining ^= lowest
+        cell = lowest.bit_length() - 1
+        for step in (1, -1, width, -width):
+            previous = cell - step
+            # the crate was pushed from 'previous' to 'cell', so both the previous cell and the player cell behind it are walkable
+            if previous < 0 or (crates >> previous) & 1 or (analysis.wall_mask >> previous) & 1:
+                continue
+            parent = matchings.get(crates ^ lowest ^ (1 << previous))
+            if parent is not None:
+                matching = update_matching(analysis, parent, previous, cell)
+                break
+    if matching is None:
+        cells, remaining = [], crates
+        while remaining:
+            lowest = remaining & -remaining
+            cells.append(lowest.bit_length() - 1)
+            remaining ^= lowest
+        matching = solve_matching(analysis, tuple(cells))
+    matchings[crates] = matching
+    if len(matchings) > MATCHING_CACHE_SIZE:
+        matchings.popitem(last=False)
+    return matching
+
+# The maximum number of assignments stored in the problem cache
+MATCHING_CACHE_SIZE = 2**16
+
+# This heuristic assigns every crate to a different goal (a minimum cost perfect matching computed with the Hungarian algorithm)
+# where the cost of assigning a crate to a goal is the minimum number of pushes needed to move it there (ignoring other crates).
+# Unlike summing the distance of each crate to its nearest goal, two crates can not both count the same goal, so the estimate is tighter.
+# It is consistent since a push moves a single crate by one cell, which changes the cost of any assignment by at most 1.
+def matching_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+    distance = push_heuristic(problem, state)
+    # every crate is on a goal or the state is a deadlock
+    if distance == 0 or distance == float('inf'):
+        return distance
+
+    # before the first push, the player has to walk next to a crate (any crate since pushing a crate off a goal may be needed)
+    # these steps are not pushes so they can be added to the push distances
+    return distance + weak_heuristic(problem, state)
+
+# This heuristic estimates the number of pushes only (the cost of the matching without the walking steps)
+# It is the admissible heuristic of SokobanPushProblem where every push costs 1 and walking is free
+def push_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+    analysis = get_layout_analysis(problem)
+    crates = get_crate_mask(state)
+
+    # a crate on a dead cell can never reach a goal, and crates in a frozen square or frozen crates (see has_frozen_crate) can never move
+    # so the state is a deadlock and it should never be explored
+    if crates & analysis.dead_mask or has_frozen_square(analysis, crates) or has_frozen_crate(analysis, crates):
+        return float('inf')
+    # every crate is on a goal
+    if crates & analysis.goal_mask == crates:
         return 0
 
-    # loop over all crates
-    for crate in crates:
-        
-        # check if the current crate is already in a goal position
-        if crate in goals:
-            continue
-        
-        # check for deadlocks 
-
-        # check for corners 
-        # (left of right) and (up or down)
-
-        '''
-        ##    ##    #$   $#
-        #$    $#    ##   ##
-        '''
-        if (
-            (Point(crate.x + 1, crate.y) not in walkable or Point(crate.x - 1, crate.y) not in walkable) and 
-            (Point(crate.x , crate.y + 1) not in walkable or Point(crate.x, crate.y - 1) not in walkable)
-        ):
-            return penalty   
-        
-        # check for adjacent crates and it is at start or end (next to border) 
-        # trapped by crate and border
-        '''
-        start (crate me) or (crate me) end
-
-        start (me crate) or (me crate) end
-        
-        start
-        (crate
-        me)
-        or
-        (crate
-        me)
-        end
-
-        start
-        (me
-        crate)
-        or
-        (me
-        crate)
-        end
-
-        '''
-        if (
-            Point(crate.x - 1, crate.y) in crates and (crate.x - 2 == 0 or crate.x + 1 == width - 1) or
-            Point(crate.x + 1, crate.y) in crates and (crate.x - 1 == 0 or crate.x + 2 == width - 1) or
-            Point(crate.x, crate.y - 1) in crates and (crate.y - 2 == 0 or crate.y + 1 == height - 1) or
-            Point(crate.x, crate.y + 1) in crates and (crate.y - 1 == 0 or crate.y + 2 == height - 1)
-        ):
-            return penalty  
-        
-        # check if crate next to border and no goals can be reached
-        '''
-        start me (can't move horizontally) and no goals vertically on same column
-        me end and no goals vertically on same column
-
-        srart
-        me 
-        (can't move vertically)
-        and no goals horizontally on same row
-
-        me
-        end 
-        (can't move vertically)
-        and no goals horizontally on same row
-        '''
-            
-        if(
-            (crate.x + 1 == width - 1  and len([goal for goal in goals if goal.x == width - 2]) == 0) or
-            (crate.x == 1              and len([goal for goal in goals if goal.x == 1]) == 0) or
-            (crate.y - 1 == height - 1 and len([goal for goal in goals if goal.y == height - 2]) == 0) or
-            (crate.y == 1              and len([goal for goal in goals if goal.y == 1]) == 0)
-        ):
-            return penalty 
-
-        # check if trapped at least 3 sides 
-        # wall or crate or border 
-        sides = 0
-        if (Point(crate.x - 1, crate.y) not in walkable or Point(crate.x - 1, crate.y) in crates or crate.x - 1 == 0):
-            sides += 1
-        if(Point(crate.x + 1, crate.y) not in walkable or Point(crate.x + 1, crate.y) in crates or crate.x + 1 == width - 1):
-            sides += 1
-        if(Point(crate.x , crate.y + 1) not in walkable or Point(crate.x, crate.y + 1) in crates or crate.y - 1 == 0):
-            sides += 1
-        if(Point(crate.x , crate.y - 1) not in walkable or Point(crate.x, crate.y - 1) in crates or crate.y + 1 == height - 1):
-            sides += 1
-
-        if(sides >=3):
-            return penalty
-
-        
-        # no deadlocks -> calculate the distance between crate and all goals 
-        # then get the distance to the closest goal and add it to the total distance
-        min_dist = min(abs(crate.x - goal.x) + abs(crate.y - goal.y) for goal in goals)
-        distance += min_dist
-
-    return distance
\ No newline at end of file
+    return get_matching(problem, analysis, crates).cost
+
+# A pattern database stores, for every placement of a subset of crates (a pattern of "pattern_size" crates),
+# the minimum number of pushes needed to move these crates onto distinct goals when the other crates are removed (an abstraction of the problem).
+# The player is also relaxed: it can stand at any free walkable square, so it can push a crate whenever the square behind the crate is free.
+# Unlike the matching heuristic, the pattern captures the interactions between its crates (a crate blocking the push of another crate).
+# The databases are built offline by build_pattern_databases.py and stored in PATTERN_DATABASE_DIRECTORY,
+# where each file contains a header followed by a table of unsigned 16-bit integers that is memory-mapped when it is loaded,
+# so loading is fast and multiple processes solving the same layout share the same pages.
+# If there is no file for a layout, the table is built in memory when the heuristic is first called.
+# The directory and the pattern size used by the heuristic can be changed with the environment variables
+# SOKOBAN_PATTERN_DATABASES and SOKOBAN_PATTERN_SIZE (they are also the defaults of build_pattern_databases.py),
+# or by assigning PATTERN_DATABASE_DIRECTORY and PATTERN_SIZE before the heuristic is first called.
+
+PATTERN_DATABASE_DIRECTORY = os.environ.get("SOKOBAN_PATTERN_DATABASES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pattern_databases"))
+PATTERN_SIZE = int(os.environ.get("SOKOBAN_PATTERN_SIZE", 2))
+# The file header: magic, pattern size, the number of squares and the byte order of the table (0: little, 1: big)
+PATTERN_DATABASE_HEADER = struct.Struct("<8sIIB7x")
+PATTERN_DATABASE_MAGIC = b"SOKOPDB1"
+# The table value of a placement from which the crates can never reach the goals
+PATTERN_UNREACHABLE = 0xFFFF
+
+@dataclass(frozen=True)
+class PatternDatabase:
+    pattern_size: int
+    # The index of every square in the table (the square of a cell is -1 if a crate can never be on it)
+    square_of_cell: Tuple[int, ...]
+    # binomials[k][n] = n choose k, used to rank a sorted placement of squares (s1 < s2 < ... < sk) as the sum of binomials[i][si]
+    binomials: Tuple[Tuple[int, ...], ...]
+    # The minimum number of pushes for every placement (PATTERN_UNREACHABLE if the goals cannot be reached)
+    table: memoryview
+
+# Return the name of the pattern database file for a layout, it is a hash of the layout so it does not depend on the level file name
+def pattern_database_name(layout, pattern_size: int) -> str:
+    description = (layout.width, layout.height, sorted(layout.walkable, key=lambda p: (p.y, p.x)), sorted(layout.goals, key=lambda p: (p.y, p.x)))
+    return f"{hashlib.sha256(repr(description).encode()).hexdigest()[:16]}_{pattern_size}.pdb"
+
+# Return the squares on which a crate can be (walkable cells that are not dead) in the order of their cells
+def get_pattern_squares(problem: SokobanProblem) -> List[int]:
+    analysis = get_layout_analysis(problem)
+    return [cell for cell, distance in enumerate(analysis.nearest_goal_distance) if distance != float('inf')]
+
+def get_binomials(count: int, pattern_size: int) -> Tuple[Tuple[int, ...], ...]:
+    binomials = [[1] * (count + 1)]
+    for k in range(1, pattern_size + 1):
+        row = [0] * (count + 1)
+        for n in range(1, count + 1):
+            row[n] = row[n - 1] + binomials[k - 1][n - 1]
+        binomials.append(row)
+    return tuple(map(tuple, binomials))
+
+# Build the table of the pattern database of a layout with a BFS that starts from every placement of the pattern crates on distinct goals
+# and pulls the crates backwards (the same moves as compute_push_distances, but the other crates of the pattern block the crate and the player)
+def build_pattern_database(problem: SokobanProblem, pattern_size: int) -> array:
+    layout, width = problem.layout, problem.layout.width
+    squares = get_pattern_squares(problem)
+    square_of_cell = {cell: square for square, cell in enumerate(squares)}
+    walkable = {to_cell(position, width) for position in layout.walkable}
+    binomials = get_binomials(len(squares), pattern_size)
+    rank = lambda placement: sum(binomials[i + 1][square] for i, square in enumerate(placement))
+
+    table = array('H', [PATTERN_UNREACHABLE]) * binomials[pattern_size][len(squares)]
+    goals = sorted(square_of_cell[to_cell(goal, width)] for goal in layout.goals)
+    frontier = deque()
+    for placement in combinations(goals, pattern_size):
+        table[rank(placement)] = 0
+        frontier.append(placement)
+
+    offsets = [to_cell(vector, width) for vector in map(Direction.to_vector, Direction)]
+    while frontier:
+        placement = frontier.popleft()
+        distance = table[rank(placement)] + 1
+        occupied = {squares[square] for square in placement}
+        for index, square in enumerate(placement):
+            cell = squares[square]
+            for offset in offsets:
+                # the crate was pushed from "previous" by the player standing at "player"
+                previous, player = cell - offset, cell - 2 * offset
+                if previous not in square_of_cell or player not in walkable or previous in occupied or player in occupied:
+                    continue
+                new_placement = tuple(sorted(placement[:index] + (square_of_cell[previous],) + placement[index + 1:]))
+                new_rank = rank(new_placement)
+                if table[new_rank] == PATTERN_UNREACHABLE and distance < PATTERN_UNREACHABLE:
+                    table[new_rank] = distance
+                    frontier.append(new_placement)
+    return table
+
+# Write the table of a pattern database to a file
+def save_pattern_database(path: str, pattern_size: int, square_count: int, table: array):
+    with open(path, 'wb') as f:
+        f.write(PATTERN_DATABASE_HEADER.pack(PATTERN_DATABASE_MAGIC, pattern_size, square_count, sys.byteorder == "big"))
+        table.tofile(f)
+
+# Memory-map the table of a pattern database file, or return None if the file does not match the expected pattern size and squares
+def load_pattern_database(path: str, pattern_size: int, square_count: int) -> Optional[memoryview]:
+    with open(path, 'rb') as f:
+        header = f.read(PATTERN_DATABASE_HEADER.size)
+        if len(header) < PATTERN_DATABASE_HEADER.size:
+            return None
+        magic, file_pattern_size, file_square_count, big_endian = PATTERN_DATABASE_HEADER.unpack(header)
+        if (magic, file_pattern_size, file_square_count, bool(big_endian)) != (PATTERN_DATABASE_MAGIC, pattern_size, square_count, sys.byteorder == "big"):
+            return None
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # the memoryview keeps the mapping alive as long as the table is used
+    return memoryview(mapping)[PATTERN_DATABASE_HEADER.size:].cast('H')
+
+# Get the pattern database of the problem layout from the problem cache, the pattern database file, or build it
+# (the pattern size is PATTERN_SIZE by default, or the number of crates if there are fewer crates)
+def get_pattern_database(problem: SokobanProblem, pattern_size: Optional[int] = None) -> PatternDatabase:
+    # the pattern size is clamped before the lookup so the database is found under the same key it is stored with
+    pattern_size = min(pattern_size or PATTERN_SIZE, len(problem.get_initial_state().crates))
+    cache = problem.cache()
+    database = cache.get(("pattern_database", pattern_size))
+    if database is None:
+        squares = get_pattern_squares(problem)
+        path = os.path.join(PATTERN_DATABASE_DIRECTORY, pattern_database_name(problem.layout, pattern_size))
+        table = load_pattern_database(path, pattern_size, len(squares)) if os.path.exists(path) else None
+        if table is None:
+            table = memoryview(build_pattern_database(problem, pattern_size))
+        square_of_cell = [-1] * (problem.layout.width * problem.layout.height)
+        for square, cell in enumerate(squares):
+            square_of_cell[cell] = square
+        database = PatternDatabase(pattern_size, tuple(square_of_cell), get_binomials(len(squares), pattern_size), table)
+        cache[("pattern_database", pattern_size)] = database
+    return database
+
+# This heuristic is the maximum of the matching heuristic and the pattern database heuristic
+# The pattern database heuristic is the maximum, over every subset of "pattern_size" crates, of the pushes needed for this subset
+# (plus the steps the player needs to reach a crate). The crates are identical, so a fixed partition of the crates into disjoint patterns
+# (to add their values) would change from a state to the next and the sum would not be consistent.
+# The maximum over all the subsets is consistent: a push moves a single crate, so the value of every subset decreases by at most 1.
+def pattern_database_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+    heuristic = matching_heuristic(problem, state)
+    if heuristic == 0 or heuristic == float('inf'):
+        return heuristic
+    database = get_pattern_database(problem)
+    width, square_of_cell, binomials, table = problem.layout.width, database.square_of_cell, database.binomials, database.table
+    squares = sorted(square_of_cell[crate.y * width + crate.x] for crate in state.crates)
+    pushes = 0
+    for placement in combinations(squares, database.pattern_size):
+        value = table[sum(binomials[i + 1][square] for i, square in enumerate(placement))]
+        if value > pushes:
+            if value == PATTERN_UNREACHABLE:
+                return float('inf')
+            pushes = value
+    return max(heuristic, pushes + weak_heuristic(problem, state))
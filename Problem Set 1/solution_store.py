@@ -0,0 +1,161 @@
+from typing import Any, Callable, List, Optional, Tuple
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from functools import partial
+from types import CodeType, FunctionType
+from problem import Problem, Solution
+import hashlib, inspect, os, pickle, sqlite3, sys
+
+# This file contains a persistent solution store which keeps the solutions found by the search agents on disk (in a sqlite database)
+# so running the same problem again with the same search algorithm and heuristic does not search again.
+# Each solution is stored under a key which is the hash of the canonical form of:
+#   the problem (its attributes such as the layout), the state the search started from, the search function and the heuristic
+# The store keeps at most "max_entries" solutions and evicts the least recently used ones.
+
+# Convert a value into a canonical form made of tuples, strings and numbers whose repr does not depend on
+# the memory addresses of the objects or the iteration order of sets and dictionaries
+def canonical_form(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, Enum):
+        return (type(value).__name__, value.value)
+    if is_dataclass(value):
+        return (type(value).__name__,) + tuple(canonical_form(getattr(value, field.name)) for field in fields(value))
+    if isinstance(value, dict):
+        return ("dict",) + tuple(sorted(((canonical_form(key), canonical_form(item)) for key, item in value.items()), key=repr))
+    if isinstance(value, (set, frozenset)):
+        return ("set",) + tuple(sorted((canonical_form(item) for item in value), key=repr))
+    if isinstance(value, (list, tuple)):
+        return ("list",) + tuple(canonical_form(item) for item in value)
+    if isinstance(value, Problem):
+        # the attributes starting with an underscore (such as the problem cache) are not a part of the problem definition
+        attributes = {name: item for name, item in vars(value).items() if not name.startswith('_')}
+        return (type(value).__name__, canonical_form(attributes))
+    if callable(value):
+        return function_identity(value)
+    return (type(value).__name__, repr(value))
+
+# Return an identity for a function (a search function or a heuristic) which is the same across runs
+# Wrapped functions (such as lru_cache or collect_stats) are unwrapped and partial functions include their arguments,
+# except the "stats" keyword argument which does not change the solution.
+# The identity includes a hash of the code of the function and of the functions and classes it uses (see code_digest),
+# so changing the function or one of its helpers invalidates its stored solutions.
+def function_identity(fn: Callable) -> Any:
+    if isinstance(fn, partial):
+        keywords = {name: item for name, item in fn.keywords.items() if name != "stats"}
+        return ("partial", function_identity(fn.func), canonical_form(fn.args), canonical_form(keywords))
+    fn = inspect.unwrap(fn)
+    code_hash = code_digest(fn) if isinstance(fn, FunctionType) else None
+    return (getattr(fn, "__module__", None), getattr(fn, "__qualname__", repr(fn)), code_hash)
+
+# Return the functions and classes named in a code object (and its nested code objects such as comprehensions and lambdas)
+# and add its bytecode, constants and names to the digest
+def hash_code(digest, code: CodeType) -> List[str]:
+    digest.update(code.co_code)
+    names = list(code.co_names)
+    for constant in code.co_consts:
+        # the repr of a code object contains its memory address, so the nested code objects are hashed recursively instead
+        if isinstance(constant, CodeType):
+            names.extend(hash_code(digest, constant))
+        else:
+            digest.update(repr(constant).encode())
+    digest.update(repr(code.co_names).encode())
+    return names
+
+# Check if a function or a class is defined in a file under the given directory (the project files, not the standard library)
+def is_project_object(value: Any, directory: str) -> bool:
+    if isinstance(value, FunctionType):
+        return value.__code__.co_filename.startswith(directory)
+    if isinstance(value, type):
+        module = sys.modules.get(value.__module__)
+        return (getattr(module, "__file__", None) or "").startswith(directory)
+    return False
+
+# Hash the code of a function and, recursively, the code of every function and class method of the project
+# that it reaches through its global names (for example, the helpers called by a heuristic).
+# Attributes of other objects (such as the methods of the problem or modules imported as a whole) are not followed,
+# so use SolutionStore.clear after changing them.
+def code_digest(fn: FunctionType) -> str:
+    digest = hashlib.sha256()
+    directory = os.path.dirname(fn.__code__.co_filename)
+    pending, visited = [fn], set()
+    while pending:
+        item = pending.pop()
+        if id(item) in visited:
+            continue
+        visited.add(id(item))
+        digest.update(item.__qualname__.encode())
+        if isinstance(item, type):
+            members = (getattr(member, "__func__", member) for member in vars(item).values())
+            pending.extend(inspect.unwrap(member) for member in members if isinstance(member, FunctionType))
+            continue
+        for name in hash_code(digest, item.__code__):
+            value = item.__globals__.get(name)
+            if value is not None and not isinstance(value, type):
+                value = inspect.unwrap(value) if callable(value) else value
+            if is_project_object(value, directory):
+                pending.append(value)
+    return digest.hexdigest()
+
+# Return the key of a solution as a hex string
+def solution_key(problem: Problem, state: Any, search_fn: Callable, heuristic: Optional[Callable] = None) -> str:
+    key = (canonical_form(problem), canonical_form(state), function_identity(search_fn), None if heuristic is None else function_identity(heuristic))
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+class SolutionStore:
+    def __init__(self, path: str, max_entries: int = 10000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        # The number of lookups that found (hits) or did not find (misses) a solution since the store was opened
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        # last_used is a counter which increases with every lookup and insertion, it is used to evict the least recently used solutions
+        self.connection.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, solution BLOB NOT NULL, last_used INTEGER NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+        self.connection.commit()
+        self.clock = self.connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM solutions").fetchone()[0]
+
+    # Return (True, solution) if a solution is stored for the given key, otherwise (False, None)
+    # A stored None (written by older versions of the store) is treated as a miss, so the problem is searched again
+    def get(self, key: str) -> Tuple[bool, Solution]:
+        row = self.connection.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+        if row is None or pickle.loads(row[0]) is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.clock += 1
+        self.connection.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (self.clock, key))
+        self.connection.commit()
+        return True, pickle.loads(row[0])
+
+    # Store a solution then evict the least recently used solutions if the store is full
+    # None is never stored: a search may return None because it was stopped (for example by a time budget),
+    # so it does not prove that the problem has no solution
+    def put(self, key: str, solution: Solution) -> None:
+        if solution is None:
+            return
+        self.clock += 1
+        self.connection.execute("INSERT OR REPLACE INTO solutions (key, solution, last_used) VALUES (?, ?, ?)", (key, pickle.dumps(solution), self.clock))
+        self.connection.execute(
+            "DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.connection.commit()
+
+    # Remove every stored solution (for example, after changing the problem definitions which are not a part of the keys)
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM solutions")
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    # Return a report of the hits, misses and hit rate since the store was opened
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0
+        return f"Solution store: {self.hits} hits, {self.misses} misses (hit rate: {hit_rate:.1%}), {len(self)}/{self.max_entries} solutions stored"
+
+    def close(self) -> None:
+        self.connection.close()
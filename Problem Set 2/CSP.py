@@ -1,4 +1,5 @@
-from typing import Callable, Dict, List, Any, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from collections.abc import Mapping
 from helpers.utils import track_call_count
 
 # This is the type definition for an Assignment
@@ -46,9 +47,16 @@ class BinaryConstraint(Constraint):
     # Important: If the value of a variable in the assignment is None, then it is assumed as if it is unassigned.
     def is_satisfied(self, assignment: Assignment) -> bool:
         variable1, variable2 = self.variables
-        value1, value2 = assignment.get(variable1), assignment.get(variable2)
-        if value1 is None or value2 is None: return False
-        return self.condition(value1, value2)
+        return self.is_satisfied_by(variable1, assignment.get(variable1), assignment.get(variable2))
+
+    # This function checks if the constraint is satisfied when the given variable has the given value and the other variable has other_value,
+    # without creating an assignment (the values are passed to the condition in the order of the constraint's variables).
+    # Like "is_satisfied", if any of the values is None, it is assumed as if the variable is unassigned so the condition is not satisfied.
+    def is_satisfied_by(self, variable: str, value: Any, other_value: Any) -> bool:
+        if value is None or other_value is None: return False
+        if variable == self.variables[0]:
+            return self.condition(value, other_value)
+        return self.condition(other_value, value)
     
     # Given the name of a variable in the constraint, this function returns the other variable.
     # For example, if the constraint contains the variables A & B, this function will return A if given B, and will return B if given A.
@@ -57,6 +65,264 @@ class BinaryConstraint(Constraint):
         variable1, variable2 = self.variables
         return variable2 if variable == variable1 else variable1
 
+# This is a class for the all-different global constraint (all the variables in the constraint must have different values).
+# It replaces the pairwise "!=" binary constraints between the variables (n*(n-1)/2 constraints and condition calls for n variables).
+# Forward checking removes the assigned value from the domains of the other variables directly, which gives the same domains
+# as the pairwise constraints. The "filter" function can also prune the domains further using bipartite matching (see below).
+class AllDifferentConstraint(Constraint):
+    variables: Tuple[str, ...]  # The name of the variables that are in the constraint.
+
+    def __init__(self, variables: Iterable[str]) -> None:
+        super().__init__()
+        self.variables = tuple(variables)
+
+    # This function returns True if all the variables are assigned and their values are different.
+    # Important: If the value of a variable in the assignment is None, then it is assumed as if it is unassigned.
+    def is_satisfied(self, assignment: Assignment) -> bool:
+        values = [assignment.get(variable) for variable in self.variables]
+        if any(value is None for value in values): return False
+        return len(set(values)) == len(values)
+
+    # Given the domains of the unassigned variables (the assigned variables are not in "domains" and their values are
+    # assumed to be already removed from the other domains by forward checking), this function removes every value that
+    # can not be part of any solution of this constraint (Régin's filtering algorithm):
+    #   1. Find a maximum matching between the unassigned variables and their values. If some variable can not be
+    #      matched, the constraint can not be satisfied and None is returned.
+    #   2. Orient the graph: the matched edges go from the variables to the values and the other edges go from the values to the variables.
+    #      A value can be kept in the domain of a variable if it is matched to it, or if it is reachable from a free (unmatched) value
+    #      (an even alternating path), or if both are in the same strongly connected component (an even alternating cycle).
+    # This removes the naked and hidden singles (and pairs, triples, ...) in a single pass.
+    # The function returns the new domains of the variables whose domains changed (without modifying the given domains).
+    def filter(self, domains: Dict[str, set]) -> Optional[Dict[str, set]]:
+        variables = [variable for variable in self.variables if variable in domains]
+        count = len(variables)
+        # The nodes of the graph are numbered: the variables are 0 to count-1 and the values come after them
+        value_nodes: Dict[Any, int] = {}
+        neighbors: List[List[int]] = [] # The value nodes in the domain of each variable
+        for variable in variables:
+            nodes = []
+            for value in domains[variable]:
+                node = value_nodes.get(value)
+                if node is None:
+                    node = value_nodes[value] = count + len(value_nodes)
+                nodes.append(node)
+            neighbors.append(nodes)
+        size = count + len(value_nodes)
+        match = [-1] * size # The node matched to each node (-1 if it is free)
+
+        def augment(node: int, visited: List[bool]) -> bool:
+            for value in neighbors[node]:
+                if visited[value]: continue
+                visited[value] = True
+                owner = match[value]
+                if owner < 0 or augment(owner, visited):
+                    match[value], match[node] = node, value
+                    return True
+            return False
+
+        for node in range(count):
+            if not augment(node, [False] * size):
+                return None
+
+        # The successors of the nodes in the oriented graph
+        successors: List[List[int]] = [[match[node]] for node in range(count)] + [[] for _ in value_nodes]
+        for node, nodes in enumerate(neighbors):
+            for value in nodes:
+                if match[value] != node:
+                    successors[value].append(node)
+
+        # Mark the nodes that are reachable from the free values
+        reachable = [False] * size
+        frontier = [value for value in range(count, size) if match[value] < 0]
+        while frontier:
+            node = frontier.pop()
+            if reachable[node]: continue
+            reachable[node] = True
+            frontier.extend(successors[node])
+
+        # Find the strongly connected components (an iterative version of Tarjan's algorithm)
+        # The component of each node is the id of its root node (-1 if the node was not visited)
+        order, lowlink, component = [-1] * size, [0] * size, [-1] * size
+        stack, on_stack = [], [False] * size
+        counter = 0
+        for root in range(count):
+            if order[root] >= 0: continue
+            order[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, iter(successors[root]))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if order[child] < 0:
+                        order[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack[child] = True
+                        work.append((child, iter(successors[child])))
+                        break
+                    if on_stack[child] and order[child] < lowlink[node]:
+                        lowlink[node] = order[child]
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        if lowlink[node] < lowlink[parent]:
+                            lowlink[parent] = lowlink[node]
+                    if lowlink[node] == order[node]:
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component[member] = node
+                            if member == node: break
+
+        values = list(value_nodes)
+        changes = {}
+        for node, variable in enumerate(variables):
+            nodes = neighbors[node]
+            kept = [value for value in nodes if value == match[node] or reachable[value] or component[value] == component[node]]
+            if len(kept) != len(nodes):
+                changes[variable] = {values[value - count] for value in kept}
+        return changes
+
+# Returns the number of set bits in a bitmask (int.bit_count is only available since python 3.10)
+popcount: Callable[[int], int] = int.bit_count if hasattr(int, "bit_count") else (lambda mask: bin(mask).count("1"))
+
+# Returns the positions of the set bits in a bitmask (from the lowest to the highest)
+def iterate_bits(mask: int) -> Iterator[int]:
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+# This is a dictionary of domains (from the variables to their sets of values) that records every change on a trail,
+# so that the search can modify a single dictionary and undo the changes when it backtracks, instead of copying the dictionary at every node.
+# Setting a domain or deleting a variable (when it is assigned) records the previous domain of the variable (None if it had no domain).
+# Important: The domains (sets) must be replaced and not modified in place (like forward checking does), since only the dictionary is trailed.
+class TrailedDomains(dict):
+    trail: List[Tuple[str, Optional[set]]]  # The (variable, previous domain) of every change.
+
+    def __init__(self, domains: Dict[str, set]) -> None:
+        super().__init__(domains)
+        self.trail = []
+
+    def __setitem__(self, variable: str, domain: set):
+        self.trail.append((variable, self.get(variable)))
+        super().__setitem__(variable, domain)
+
+    def __delitem__(self, variable: str):
+        self.trail.append((variable, self[variable]))
+        super().__delitem__(variable)
+
+    # Undoes the changes on the trail until it has the given length
+    def undo(self, length: int):
+        trail = self.trail
+        while len(trail) > length:
+            variable, domain = trail.pop()
+            if domain is None:
+                dict.pop(self, variable, None)
+            else:
+                dict.__setitem__(self, variable, domain)
+
+# This is an alternative representation for the domains of a problem where each domain is stored as an integer bitmask.
+# Every value that appears in any domain gets a bit position, and the domain of a variable is the mask of its values' bits.
+# It behaves like a read-only dictionary from the variables to their domains (as sets) so that it can replace "problem.domains",
+# but the solver functions (one_consistency, minimum_remaining_values, forward_checking, least_restraining_values and solve)
+# detect it and work on the masks directly: the domain sizes are popcounts, forward checking is an AND with the mask of the
+# values that support the assigned value, and instead of copying the domains, every change is recorded on a trail
+# (a list of the previous masks) so that it can be undone when the search backtracks.
+# Use "Problem.use_bitset_domains" to switch a problem to this representation.
+class BitsetDomains(Mapping):
+    values: List[Any]               # The value of each bit position.
+    bits: Dict[Any, int]            # The bit position of each value.
+    masks: Dict[str, int]           # The domain mask of each variable. Assigned variables are removed (like the domain dictionaries).
+    trail: List[Tuple[str, Optional[int]]]  # The (variable, previous mask) of every change (None if the variable had no domain).
+
+    def __init__(self, domains: Dict[str, set]) -> None:
+        self.values, self.bits = [], {}
+        for domain in domains.values():
+            for value in domain:
+                if value not in self.bits:
+                    self.bits[value] = len(self.values)
+                    self.values.append(value)
+        self.masks = {variable: self.to_mask(domain) for variable, domain in domains.items()}
+        self.trail = []
+        # The initial masks are kept since the supports are computed against them (they contain every later domain of the variables)
+        self._initial_masks = dict(self.masks)
+        # The masks of the values that support each value of a variable in a binary constraint (see "get_support")
+        self._supports: Dict[Tuple[BinaryConstraint, str], Dict[int, int]] = {}
+
+    # Converts a set of values into a bitmask (the values must be in the domains given to the constructor)
+    def to_mask(self, values) -> int:
+        bits = self.bits
+        mask = 0
+        for value in values:
+            mask |= 1 << bits[value]
+        return mask
+
+    # Converts a bitmask into a list of values
+    def to_values(self, mask: int) -> List[Any]:
+        values = self.values
+        return [values[bit] for bit in iterate_bits(mask)]
+
+    def __getitem__(self, variable: str) -> set:
+        return set(self.to_values(self.masks[variable]))
+
+    def __contains__(self, variable: object) -> bool:
+        return variable in self.masks
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.masks)
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    # Changes the domain mask of a variable (or removes it if the mask is None) and records the previous mask on the trail
+    def set_mask(self, variable: str, mask: Optional[int]):
+        self.trail.append((variable, self.masks.get(variable)))
+        if mask is None:
+            del self.masks[variable]
+        else:
+            self.masks[variable] = mask
+
+    # Removes a variable (when it is assigned) and records its mask on the trail
+    def __delitem__(self, variable: str):
+        self.set_mask(variable, None)
+
+    # Narrows the domain of a variable permanently (for preprocessing, like 1-Consistency, before the search starts).
+    # Unlike "set_mask", the change is not recorded on the trail, so it can not be undone.
+    def restrict(self, variable: str, mask: int):
+        self.masks[variable] = mask
+        self._initial_masks[variable] = mask
+
+    # Undoes the changes on the trail until it has the given length
+    def undo(self, length: int):
+        trail, masks = self.trail, self.masks
+        while len(trail) > length:
+            variable, mask = trail.pop()
+            if mask is None:
+                masks.pop(variable, None)
+            else:
+                masks[variable] = mask
+
+    # Returns the mask of the values of "other" that satisfy the binary constraint when "variable" is assigned the value at "bit".
+    # The supports are computed once (against the initial domain of "other", which contains all its later domains) and cached,
+    # so that the constraint condition is not called again for the same pair of values.
+    def get_support(self, constraint: BinaryConstraint, variable: str, bit: int, other: str) -> int:
+        supports = self._supports.get((constraint, variable))
+        if supports is None:
+            supports = self._supports[(constraint, variable)] = {}
+        support = supports.get(bit)
+        if support is None:
+            value, values = self.values[bit], self.values
+            support = 0
+            for other_bit in iterate_bits(self._initial_masks.get(other, 0)):
+                if constraint.is_satisfied_by(variable, value, values[other_bit]):
+                    support |= 1 << other_bit
+            supports[bit] = support
+        return support
+
 # This defines a generic CSP problem
 class Problem:
     variables: List[str]            # A list of the variable names in the problem
@@ -64,6 +330,11 @@ class Problem:
                                     # The domain is a set of values that the variable can take. 
     constraints: List[Constraint]   # A list of constraints in the problem.
 
+    # The binary and all-different constraints of each variable are indexed the first time they are requested, so that the solver does not
+    # scan all the constraints of the problem after every assignment. The index is rebuilt automatically if "constraints" is
+    # replaced by another list or if constraints are added or removed from it (the list and its length are compared).
+    # If a constraint is replaced in place (the length stays the same), call "invalidate_constraint_index".
+
     # Returns True if the assignment is complete (all the variables has an value in the given assignment).
     @track_call_count
     def is_complete(self, assignment: Assignment) -> bool:
@@ -72,3 +343,44 @@ class Problem:
     # Return True if the assignment satisfies all the constraints.
     def satisfies_constraints(self, assignment: Assignment) -> bool:
         return all(constraint.is_satisfied(assignment) for constraint in self.constraints)
+
+    # Returns a list of (constraint, other variable) pairs for every binary constraint that involves the given variable.
+    # The pairs are in the same order as the constraints in the problem.
+    def get_binary_constraints(self, variable: str) -> List[Tuple[BinaryConstraint, str]]:
+        return self._get_constraint_index()[0].get(variable, [])
+
+    # Returns a list of the all-different constraints that involve the given variable (in the same order as in the problem).
+    def get_all_different_constraints(self, variable: str) -> List[AllDifferentConstraint]:
+        return self._get_constraint_index()[1].get(variable, [])
+
+    # Switches the domains of the problem to the bitmask representation (see "BitsetDomains").
+    # It should be called before solving the problem, and it works best if the domains contain a few small values.
+    def use_bitset_domains(self):
+        if not isinstance(self.domains, BitsetDomains):
+            self.domains = BitsetDomains(self.domains)
+
+    # Forces the index of the binary constraints to be rebuilt the next time it is used.
+    def invalidate_constraint_index(self):
+        self.__dict__.pop("_constraint_index", None)
+
+    def _get_constraint_index(self) -> Tuple[Dict[str, List[Tuple[BinaryConstraint, str]]], Dict[str, List[AllDifferentConstraint]]]:
+        constraints = self.constraints
+        index = self.__dict__.get("_constraint_index")
+        if index is None or index[0] is not constraints or index[1] != len(constraints):
+            index = self._constraint_index = (constraints, len(constraints), self._build_constraint_index(constraints))
+        return index[2]
+
+    @staticmethod
+    def _build_constraint_index(constraints: List[Constraint]) -> Tuple[Dict[str, List[Tuple[BinaryConstraint, str]]], Dict[str, List[AllDifferentConstraint]]]:
+        binary_index: Dict[str, List[Tuple[BinaryConstraint, str]]] = {}
+        all_different_index: Dict[str, List[AllDifferentConstraint]] = {}
+        for constraint in constraints:
+            if isinstance(constraint, BinaryConstraint):
+                variable1, variable2 = constraint.variables
+                binary_index.setdefault(variable1, []).append((constraint, variable2))
+                if variable2 != variable1:
+                    binary_index.setdefault(variable2, []).append((constraint, variable1))
+            elif isinstance(constraint, AllDifferentConstraint):
+                for variable in dict.fromkeys(constraint.variables):
+                    all_different_index.setdefault(variable, []).append(constraint)
+        return binary_index, all_different_index
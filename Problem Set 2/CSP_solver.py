@@ -1,11 +1,13 @@
-from typing import Any, Dict, List, Optional
-from CSP import Assignment, BinaryConstraint, Problem, UnaryConstraint
+from typing import Any, Dict, Iterable, List, Optional
+from collections import deque
+from CSP import AllDifferentConstraint, Assignment, BinaryConstraint, BitsetDomains, Problem, TrailedDomains, UnaryConstraint, iterate_bits, popcount
 from helpers.utils import NotImplemented
 
 # This function applies 1-Consistency to the problem.
 # In other words, it modifies the domains to only include values that satisfy their variables' unary constraints.
 # Then all unary constraints are removed from the problem (they are no longer needed).
 # The function returns False if any domain becomes empty. Otherwise, it returns True.
+# If the problem uses bitset domains, the masks are filtered instead (see "BitsetDomains" in CSP.py).
 def one_consistency(problem: Problem) -> bool:
     remaining_constraints = []
     solvable = True
@@ -14,6 +16,16 @@ def one_consistency(problem: Problem) -> bool:
             remaining_constraints.append(constraint)
             continue
         variable = constraint.variable
+        if isinstance(problem.domains, BitsetDomains):
+            domains = problem.domains
+            new_mask = domains.masks[variable]
+            for bit in iterate_bits(new_mask):
+                if not constraint.condition(domains.values[bit]):
+                    new_mask ^= 1 << bit
+            if not new_mask:
+                solvable = False
+            domains.restrict(variable, new_mask)
+            continue
         new_domain = {value for value in problem.domains[variable] if constraint.condition(value)}
         if not new_domain:
             solvable = False
@@ -27,6 +39,10 @@ def one_consistency(problem: Problem) -> bool:
 # NOTE: If multiple variables have the same priority given the MRV heuristic, 
 #       we order them in the same order in which they appear in "problem.variables".
 def minimum_remaining_values(problem: Problem, domains: Dict[str, set]) -> str:
+    if isinstance(domains, BitsetDomains):
+        masks = domains.masks
+        _, _, variable = min((popcount(masks[variable]), index, variable) for index, variable in enumerate(problem.variables) if variable in masks)
+        return variable
     _, _, variable = min((len(domains[variable]), index, variable) for index, variable in enumerate(problem.variables) if variable in domains)
     return variable
 
@@ -44,35 +60,68 @@ def minimum_remaining_values(problem: Problem, domains: Dict[str, set]) -> str:
 def forward_checking(problem: Problem, assigned_variable: str, assigned_value: Any, domains: Dict[str, set]) -> bool:
     #TODO: Write this function
     # NotImplemented()
+
+    # with bitset domains, the domain of the other variable is intersected with the mask of the values that support the assigned value,
+    # and the changes are recorded on the trail of the domains (so the caller can undo them)
+    if isinstance(domains, BitsetDomains):
+        masks = domains.masks
+        bit = domains.bits[assigned_value]
+        for constraint, other_variable in problem.get_binary_constraints(assigned_variable):
+            mask = masks.get(other_variable)
+            if mask is None:
+                continue
+            new_mask = mask & domains.get_support(constraint, assigned_variable, bit, other_variable)
+            if not new_mask:
+                return False
+            if new_mask != mask:
+                domains.set_mask(other_variable, new_mask)
+        value_mask = 1 << bit
+        for constraint in problem.get_all_different_constraints(assigned_variable):
+            for other_variable in constraint.variables:
+                mask = masks.get(other_variable)
+                if mask is None or other_variable == assigned_variable or not mask & value_mask:
+                    continue
+                if mask == value_mask:
+                    return False
+                domains.set_mask(other_variable, mask ^ value_mask)
+        return True
     
-    # loop over binary constraints that contain the assigned_variable 
-    for constraint in problem.constraints:
-        if isinstance(constraint, BinaryConstraint):
-            if assigned_variable in constraint.variables:
+    # loop over binary constraints that contain the assigned_variable (using the constraint index of the problem)
+    for constraint, other_variable in problem.get_binary_constraints(assigned_variable):
 
-                # get the other variable in the constraint
-                other_variable = constraint.get_other(assigned_variable)
+        # if the other variable is not in domains (it's assigned), continue
+        if other_variable not in domains:
+            continue
 
-                # if this other variable is not in domains (it's assigned), continue
-                if other_variable not in domains:
-                    continue
+        # create new domain for values of the other variable 
+        # that satisfy the constraint between the assigned_variable with its assigned_value
+        # and the other variable with its current value
+        # (using "is_satisfied_by" so that no assignment dictionary is created for every check)
+        is_satisfied_by = constraint.is_satisfied_by
+        domain = domains[other_variable]
+        new_domain = {value for value in domain if is_satisfied_by(assigned_variable, assigned_value, value)}
+        
+        # if the created domain is empty, 
+        # which means that there is no value for the other variable satisfy the constraint
+        # return false
+        if not new_domain:
+            return False
+        
+        # if the domain is not empty and some values were removed, update the domain of the other variable
+        if len(new_domain) != len(domain):
+            domains[other_variable] = new_domain
 
-                # create new domain for values of the other variable 
-                # that satisfy the constraint between the assigned_variable with its assigned_value
-                # and the other variable with its current value
-                new_domain = set()
-                for value in domains[other_variable]:
-                    if constraint.is_satisfied({other_variable: value, assigned_variable: assigned_value}):
-                        new_domain.add(value)
-                
-                # if the created domain is empty, 
-                # which means that there is no value for the other variable satisfy the constraint
-                # return false
-                if not new_domain:
+    # for the all-different constraints that contain the assigned_variable,
+    # remove the assigned_value from the domains of the other (unassigned) variables
+    for constraint in problem.get_all_different_constraints(assigned_variable):
+        for other_variable in constraint.variables:
+            if other_variable == assigned_variable or other_variable not in domains:
+                continue
+            domain = domains[other_variable]
+            if assigned_value in domain:
+                if len(domain) == 1:
                     return False
-                
-                # if the domain is not empty, update the domain of the other variable
-                domains[other_variable] = new_domain
+                domains[other_variable] = domain - {assigned_value}
     return True
 
 # This function should return the domain of the given variable order based on the "least restraining value" heuristic.
@@ -92,35 +141,176 @@ def least_restraining_values(problem: Problem, variable_to_assign: str, domains:
     # least_restraining_values means least value not satisfied with others 
     unsatisfied_values = {}
 
+    # with bitset domains, the number of values removed from the other variable's domain is
+    # the popcount of its mask without the values that support the value to assign
+    if isinstance(domains, BitsetDomains):
+        masks = domains.masks
+        neighbors = [
+            (constraint, other_variable, masks[other_variable])
+            for constraint, other_variable in problem.get_binary_constraints(variable_to_assign)
+            if other_variable in masks
+        ]
+        others = [
+            masks[other_variable]
+            for constraint in problem.get_all_different_constraints(variable_to_assign)
+            for other_variable in constraint.variables
+            if other_variable != variable_to_assign and other_variable in masks
+        ]
+        for bit in iterate_bits(masks[variable_to_assign]):
+            unsatisfied_values[domains.values[bit]] = sum(
+                popcount(mask & ~domains.get_support(constraint, variable_to_assign, bit, other_variable))
+                for constraint, other_variable, mask in neighbors
+            ) + sum(mask >> bit & 1 for mask in others)
+        return sorted(unsatisfied_values, key = lambda x: (unsatisfied_values[x], x))
+
     # for each value in the variable_to_assign domain
     for value_to_assign in domains[variable_to_assign]:
 
         # start number of the unsatisfied_values with the current value with 0
         unsatisfied_values[value_to_assign] = 0
 
-        # loop over binary constraints that contain the variable_to_assign
-        for constraint in problem.constraints:
-            if isinstance(constraint, BinaryConstraint):
-                if variable_to_assign in constraint.variables:
+        # loop over binary constraints that contain the variable_to_assign (using the constraint index of the problem)
+        for constraint, other_variable in problem.get_binary_constraints(variable_to_assign):
 
-                    # get the other variable in the constraint
-                    other_variable = constraint.get_other(variable_to_assign)
+            # if this other variable is not in domains (it's assigned), continue
+            if other_variable not in domains:
+                continue
+            
+            # for each value of the other variable 
+            # that doesn't satisfy the constraint between the variable_to_assign with its value_to_assign
+            # and the other variable with its current value (using "is_satisfied_by" like in forward checking)
+            is_satisfied_by = constraint.is_satisfied_by
+            unsatisfied_values[value_to_assign] += sum(not is_satisfied_by(variable_to_assign, value_to_assign, value) for value in domains[other_variable])
 
-                    # if this other variable is not in domains (it's assigned), continue
-                    if other_variable not in domains:
-                        continue
-                    
-                    # for each value of the other variable 
-                    # that doesn't satisfy the constraint between the variable_to_assign with its value_to_assign
-                    # and the other variable with its current value
-                    for value in domains[other_variable]:
-                        if not constraint.is_satisfied({other_variable: value, variable_to_assign: value_to_assign}):
-                            unsatisfied_values[value_to_assign] += 1
+        # for the all-different constraints, the value is removed from every other variable that has it in its domain
+        for constraint in problem.get_all_different_constraints(variable_to_assign):
+            for other_variable in constraint.variables:
+                if other_variable != variable_to_assign and other_variable in domains and value_to_assign in domains[other_variable]:
+                    unsatisfied_values[value_to_assign] += 1
 
     # sort ascendencly based on the number unsatisfied_values
     # if same value, sort based on their key 
     return sorted(unsatisfied_values, key = lambda x: (unsatisfied_values[x], x))
 
+
+# This function applies the all-different filtering (see "AllDifferentConstraint.filter" in CSP.py) until the domains stop changing.
+# It starts from the all-different constraints of the given variables, then every time a domain shrinks,
+# the all-different constraints of its variable are filtered again.
+# The function returns False if any all-different constraint can not be satisfied anymore. Otherwise, it returns True.
+# The domains are modified like in forward checking (the changes to bitset domains are recorded on their trail).
+def all_different_filtering(problem: Problem, variables: Iterable[str], domains: Dict[str, set]) -> bool:
+    bitset = isinstance(domains, BitsetDomains)
+    queue = deque(dict.fromkeys(constraint for variable in variables for constraint in problem.get_all_different_constraints(variable)))
+    queued = set(queue)
+    while queue:
+        constraint = queue.popleft()
+        queued.discard(constraint)
+        changes = constraint.filter({variable: domains[variable] for variable in constraint.variables if variable in domains})
+        if changes is None:
+            return False
+        for variable, new_domain in changes.items():
+            if bitset:
+                domains.set_mask(variable, domains.to_mask(new_domain))
+            else:
+                domains[variable] = new_domain
+            for other in problem.get_all_different_constraints(variable):
+                if other not in queued:
+                    queued.add(other)
+                    queue.append(other)
+    return True
+
+# This function applies arc consistency to the domains of the unassigned variables using AC-3.
+# The queue contains the arcs (constraint, variable, other) of the binary constraints, where revising an arc removes
+# the values of "variable" that have no supporting value in the domain of "other". When the domain of a variable shrinks,
+# the arcs pointing to it (from its unassigned neighbors) are added to the queue again.
+# The all-different constraints are also in the queue, and they are filtered with "AllDifferentConstraint.filter"
+# (which gives generalized arc consistency for each of them).
+# The arcs start from the given variables (all the unassigned variables by default).
+# To avoid searching for a support from scratch every time, the last support found for each (constraint, variable, value)
+# is kept in "residues" and checked first (AC-3 with residual supports, which is simpler than AC-2001 and works as well in practice).
+# A residues dictionary can be passed to keep the supports between calls (they stay valid since they are checked before use).
+# With bitset domains, the cached support masks of the domains are used instead.
+# The function returns False if any domain becomes empty. Otherwise, it returns True.
+# The domains are modified like in forward checking (the changes to bitset domains are recorded on their trail).
+def arc_consistency(problem: Problem, domains: Dict[str, set], variables: Optional[Iterable[str]] = None, residues: Optional[Dict[Any, Any]] = None) -> bool:
+    bitset = isinstance(domains, BitsetDomains)
+    if residues is None:
+        residues = {}
+    queue = deque()
+    queued = set()
+
+    # Add the arcs of the neighbors of a variable (and its all-different constraints) to the queue
+    def enqueue(variable: str):
+        for constraint, other_variable in problem.get_binary_constraints(variable):
+            if other_variable in domains:
+                arc = (constraint, other_variable, variable)
+                if arc not in queued:
+                    queued.add(arc)
+                    queue.append(arc)
+        for constraint in problem.get_all_different_constraints(variable):
+            if constraint not in queued:
+                queued.add(constraint)
+                queue.append(constraint)
+
+    for variable in (domains if variables is None else variables):
+        enqueue(variable)
+
+    while queue:
+        item = queue.popleft()
+        queued.discard(item)
+
+        if isinstance(item, AllDifferentConstraint):
+            changes = item.filter({variable: domains[variable] for variable in item.variables if variable in domains})
+            if changes is None:
+                return False
+            for variable, new_domain in changes.items():
+                if bitset:
+                    domains.set_mask(variable, domains.to_mask(new_domain))
+                else:
+                    domains[variable] = new_domain
+                enqueue(variable)
+            continue
+
+        constraint, variable, other_variable = item
+        if variable not in domains or other_variable not in domains:
+            continue
+
+        if bitset:
+            mask, other_mask = domains.masks[variable], domains.masks[other_variable]
+            new_mask = mask
+            for bit in iterate_bits(mask):
+                if not domains.get_support(constraint, variable, bit, other_variable) & other_mask:
+                    new_mask ^= 1 << bit
+            if new_mask == mask:
+                continue
+            if not new_mask:
+                return False
+            domains.set_mask(variable, new_mask)
+            enqueue(variable)
+            continue
+
+        # the values are checked with "is_satisfied_by" (instead of "is_satisfied") so that no assignment dictionary is created
+        domain, other_domain = domains[variable], domains[other_variable]
+        is_satisfied_by = constraint.is_satisfied_by
+        new_domain = set()
+        for value in domain:
+            key = (constraint, variable, value)
+            residue = residues.get(key, residues)
+            if residue is not residues and residue in other_domain:
+                new_domain.add(value)
+                continue
+            for other_value in other_domain:
+                if is_satisfied_by(variable, value, other_value):
+                    residues[key] = other_value
+                    new_domain.add(value)
+                    break
+        if len(new_domain) == len(domain):
+            continue
+        if not new_domain:
+            return False
+        domains[variable] = new_domain
+        enqueue(variable)
+    return True
                     
 # This function should solve CSP problems using backtracking search with forward checking.
 # The variable ordering should be decided by the MRV heuristic.
@@ -131,21 +321,46 @@ def least_restraining_values(problem: Problem, variable_to_assign: str, domains:
 # IMPORTANT: To get the correct result for the explored nodes, you should check if the assignment is complete only once using "problem.is_complete"
 #            for every assignment including the initial empty assignment, EXCEPT for the assignments pruned by the forward checking.
 #            Also, if 1-Consistency deems the whole problem unsolvable, you shouldn't call "problem.is_complete" at all.
+# The assignment and the domains are not copied at every node. Instead, the search modifies them in place, the changes to the
+# domains are recorded on a trail (see "TrailedDomains" and "BitsetDomains" in CSP.py), and they are undone after trying each value.
+# Only the solution is copied when it is found, and the domains of the problem are restored before returning.
+# The "propagation" argument selects what is done after each assignment:
+#   - "forward_checking" (the default): only forward checking.
+#   - "all_different": forward checking, then the all-different filtering of the variables whose domains changed
+#     (it is also applied once before the search, and it prunes the problem without calling "problem.is_complete" if it fails).
+#   - "mac" (maintaining arc consistency): forward checking, then arc consistency starting from the variables whose domains changed
+#     (it is also applied once before the search like the all-different filtering).
 
-def solve(problem: Problem) -> Optional[Assignment]:
+def solve(problem: Problem, propagation: str = "forward_checking") -> Optional[Assignment]:
     #TODO: Write this function
     # NotImplemented()
+    if propagation not in ("forward_checking", "all_different", "mac"):
+        raise ValueError(f"Unknown propagation: {propagation}")
+    filtering = propagation != "forward_checking"
+    residues = {}
+
+    # apply the selected propagation starting from the given variables
+    def propagate(variables: Iterable[str], domains: Dict[str, set]) -> bool:
+        if propagation == "mac":
+            return arc_consistency(problem, domains, variables, residues)
+        return all_different_filtering(problem, variables, domains)
 
     # check for 1-Consistency, if it returns none, then the whole problem unsolvable
     if not one_consistency(problem):
         return None
         
     
-    def backtrack(assignment: Assignment, domains: Dict[str, set])-> Optional[Assignment]:
+    # the search modifies a single assignment and a single domains dictionary in place:
+    # the changes to the domains are recorded on their trail and undone after trying each value
+    bitset = isinstance(problem.domains, BitsetDomains)
+    domains = problem.domains if bitset else TrailedDomains(problem.domains)
+    assignment: Assignment = {}
     
-        # if the problem is complete, then return the assignment
+    def backtrack() -> bool:
+    
+        # if the problem is complete, then the assignment is a solution
         if problem.is_complete(assignment):
-            return assignment
+            return True
         
         # get a variable to assign based on minimum_remaining_values
         variable = minimum_remaining_values(problem,domains)
@@ -153,22 +368,35 @@ def solve(problem: Problem) -> Optional[Assignment]:
         # for each value of sorted least_restraining_values of this variable
         for value in least_restraining_values(problem, variable, domains):
             
-            # make a new copy of the assignment and add the current variable and value to it
-            new_assignment = assignment.copy()
-            new_assignment[variable] = value
-            
-            # make a new copy of domains and delete from it the assigned variable (domains contain unassigned variables)
-            new_domain = domains.copy()
-            del new_domain[variable]
+            # add the current variable and value to the assignment
+            # and delete the assigned variable from the domains (domains contain unassigned variables)
+            # the trail length is kept to undo the changes to the domains
+            trail_length = len(domains.trail)
+            assignment[variable] = value
+            del domains[variable]
 
             # apply forward checking with the new assignment and new domain
-            if forward_checking(problem, variable, value, new_domain):
-                forward_checking_result  = backtrack(new_assignment, new_domain)
-                
-                # if there is result from forward_checking, then return this result 
-                if forward_checking_result is not None:
-                    return forward_checking_result
+            # (followed by the propagation from the variables whose domains were changed by forward checking)
+            consistent = forward_checking(problem, variable, value, domains)
+            if consistent and filtering:
+                changed = [changed_variable for changed_variable, _ in domains.trail[trail_length + 1:]]
+                consistent = propagate(changed, domains)
+            
+            # if a solution is found, return it without undoing the changes
+            if consistent and backtrack():
+                return True
+
+            domains.undo(trail_length)
+            del assignment[variable]
                 
-        return None
+        return False
+    
+    trail_length = len(domains.trail)
+    if filtering and not propagate(problem.variables, domains):
+        solution = None
+    else:
+        solution = dict(assignment) if backtrack() else None
     
-    return backtrack({} ,problem.domains)
\ No newline at end of file
+    # restore the domains of the problem (bitset domains are modified in place)
+    domains.undo(trail_length)
+    return solution
\ No newline at end of file
@@ -0,0 +1,112 @@
+from typing import Any, Callable, Dict, List, Tuple
+from functools import partial
+from helpers.utils import fetch_tracked_call_count
+import argparse, glob, random, time
+
+# This file contains the benchmarks used to measure the speed of the CSP solver
+# Run "python benchmark.py --help" to list the available benchmarks
+
+# Solve a CSP problem and measure:
+#   the number of explored nodes (the calls to "is_complete", like the autograder),
+#   the time spent building the problem and solving it
+def measure_solve(load_problem: Callable[[], Any], solve_fn: Callable) -> Dict[str, Any]:
+    start = time.perf_counter()
+    problem = load_problem()
+    load_time = time.perf_counter() - start
+    fetch_tracked_call_count(type(problem).is_complete) # Clear the recorded calls
+    start = time.perf_counter()
+    solution = solve_fn(problem)
+    solve_time = time.perf_counter() - start
+    return {
+        "solved": solution is not None,
+        "explored": fetch_tracked_call_count(type(problem).is_complete),
+        "constraints": len(problem.constraints),
+        "load_seconds": load_time,
+        "seconds": solve_time,
+    }
+
+def print_row(name: str, result: Dict[str, Any]):
+    print(f"{name:<36} solved={str(result['solved']):>5} explored={result['explored']:>6} constraints={result['constraints']:>7} "
+          f"load={result['load_seconds']:8.4f}s solve={result['seconds']:8.4f}s")
+
+# Generate a random sudoku puzzle of the given size (which must be a perfect square) as text.
+# A valid solution is built from the base pattern, then its rows, columns, bands, stacks and digits are shuffled,
+# and finally a fraction of the cells ("blanks") is removed. The puzzle is solvable but it may have multiple solutions.
+def generate_sudoku(size: int, blanks: float, rng: random.Random) -> str:
+    cell_dim = int(round(size ** 0.5))
+    assert cell_dim * cell_dim == size, "The sudoku size must be a perfect square"
+    shuffled = lambda values: rng.sample(values, len(values))
+    groups = range(cell_dim)
+    rows = [group * cell_dim + row for group in shuffled(groups) for row in shuffled(groups)]
+    columns = [group * cell_dim + column for group in shuffled(groups) for column in shuffled(groups)]
+    digits = shuffled(list(range(1, size + 1)))
+    pattern = lambda r, c: (cell_dim * (r % cell_dim) + r // cell_dim + c) % size
+    board = [[digits[pattern(r, c)] for c in columns] for r in rows]
+    for cell in rng.sample(range(size * size), int(blanks * size * size)):
+        board[cell // size][cell % size] = '.'
+    return '\n'.join(' '.join(str(value) for value in row) for row in board)
+
+# Load a CSP problem from a text, optionally switching it to the bitset domains
+def load_problem(cls: type, text: str, bitset: bool) -> Callable[[], Any]:
+    def load():
+        problem = cls.from_text(text)
+        if bitset:
+            problem.use_bitset_domains()
+        return problem
+    return load
+
+# Solve the sudoku puzzles in the given files and the generated puzzles with the backtracking solver
+def sudoku_benchmark(files: List[str], sizes: List[int], blanks: float, count: int, seed: int, bitset: bool = False, propagation: str = "forward_checking"):
+    from sudoku import SudokuProblem
+    from CSP_solver import solve
+    rng = random.Random(seed)
+    puzzles: List[Tuple[str, str]] = []
+    for path in files:
+        with open(path, 'r') as f:
+            puzzles.append((path, f.read()))
+    for size in sizes:
+        for index in range(count):
+            puzzles.append((f"generated {size}x{size} #{index + 1}", generate_sudoku(size, blanks, rng)))
+    total = 0.0
+    for name, text in puzzles:
+        result = measure_solve(load_problem(SudokuProblem, text, bitset), partial(solve, propagation=propagation))
+        total += result["seconds"]
+        print_row(name, result)
+    print(f"Total solve time: {total:.4f}s")
+
+# Solve the cryptarithmetic puzzles in the given files with the backtracking solver
+def cryptarithmetic_benchmark(files: List[str], bitset: bool = False, propagation: str = "forward_checking"):
+    from cryptarithmetic import CryptArithmeticProblem
+    from CSP_solver import solve
+    total = 0.0
+    for path in files:
+        with open(path, 'r') as f:
+            text = f.read()
+        result = measure_solve(load_problem(CryptArithmeticProblem, text, bitset), partial(solve, propagation=propagation))
+        total += result["seconds"]
+        print_row(f"{path} ({text.strip()})", result)
+    print(f"Total solve time: {total:.4f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the CSP solver")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    sudoku_parser = subparsers.add_parser("sudoku", help="measure the backtracking solver on the sudoku puzzles and on large generated puzzles")
+    sudoku_parser.add_argument("--files", nargs="*", default=sorted(glob.glob("sudoku/*.txt")), help="the sudoku puzzles to solve")
+    sudoku_parser.add_argument("--sizes", type=int, nargs="*", default=[16, 25], help="the sizes of the generated puzzles (perfect squares)")
+    sudoku_parser.add_argument("--blanks", type=float, default=0.4, help="the fraction of the cells that are empty in the generated puzzles")
+    sudoku_parser.add_argument("--count", type=int, default=3, help="the number of generated puzzles of each size")
+    sudoku_parser.add_argument("--seed", type=int, default=0, help="the random seed used to generate the puzzles")
+    sudoku_parser.add_argument("--bitset", action="store_true", help="use the bitset domains")
+    sudoku_parser.add_argument("--propagation", "-p", default="forward_checking", choices=["forward_checking", "all_different", "mac"], help="the propagation applied after each assignment")
+
+    cryptarithmetic_parser = subparsers.add_parser("cryptarithmetic", help="measure the backtracking solver on the cryptarithmetic puzzles")
+    cryptarithmetic_parser.add_argument("--files", nargs="*", default=sorted(glob.glob("puzzles/*.txt")), help="the cryptarithmetic puzzles to solve")
+    cryptarithmetic_parser.add_argument("--bitset", action="store_true", help="use the bitset domains")
+    cryptarithmetic_parser.add_argument("--propagation", "-p", default="forward_checking", choices=["forward_checking", "all_different", "mac"], help="the propagation applied after each assignment")
+
+    args = parser.parse_args()
+    if args.benchmark == "sudoku":
+        sudoku_benchmark(args.files, args.sizes, args.blanks, args.count, args.seed, args.bitset, args.propagation)
+    elif args.benchmark == "cryptarithmetic":
+        cryptarithmetic_benchmark(args.files, args.bitset, args.propagation)
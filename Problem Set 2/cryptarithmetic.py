@@ -1,6 +1,6 @@
 from typing import Tuple
 import re
-from CSP import Assignment, Problem, UnaryConstraint, BinaryConstraint
+from CSP import AllDifferentConstraint, Assignment, Problem, UnaryConstraint, BinaryConstraint
 
 #TODO (Optional): Import any builtin library or define any helper function you want to use
 
@@ -90,12 +90,8 @@ class CryptArithmeticProblem(Problem):
         
         # constraints 
         
-        # all different constraint
-        for v1 in unique_chars:
-            for v2 in unique_chars:
-                if v1 is not v2:
-                    binary_constraint = BinaryConstraint((v1,v2), lambda value1, value2:  value1 != value2)
-                    problem.constraints.append(binary_constraint)
+        # all different constraint (the letters must have different digits)
+        problem.constraints.append(AllDifferentConstraint(unique_chars))
         
         # reverse the sides 
         # summing from right
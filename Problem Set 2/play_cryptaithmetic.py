@@ -1,5 +1,6 @@
 from cryptarithmetic import CryptArithmeticProblem
 from CSP_solver import solve
+from functools import partial
 import argparse, time
 
 # This function requests a solution from the user
@@ -46,12 +47,14 @@ def main(args: argparse.Namespace):
     start = time.time() # Track run time
 
     problem = CryptArithmeticProblem.from_file(args.puzzle)
+    if args.bitset:
+        problem.use_bitset_domains()
     
     agent_name = args.agent.lower()
     if agent_name == "human":
         solve_fn = solve_via_human
     elif agent_name == "backtrack":
-        solve_fn = solve
+        solve_fn = partial(solve, propagation=args.propagation)
     else:
         print(f"Unknown Agent: {agent_name}. Please select a valid agent.")
         return
@@ -81,6 +84,10 @@ if __name__ == "__main__":
     parser.add_argument("--agent", "-a", default="human",
                         choices=['human', 'backtrack'],
                         help="the agent that will play the game")
+    parser.add_argument("--bitset", action="store_true", default=False,
+                        help="store the domains as bitmasks (the backtracking search undoes its changes instead of copying the domains)")
+    parser.add_argument("--propagation", "-p", default="forward_checking", choices=["forward_checking", "all_different", "mac"],
+                        help="the propagation applied by the backtracking agent after each assignment")
     
     args = parser.parse_args()
     try:
@@ -1,5 +1,5 @@
 from typing import Dict
-from CSP import Assignment, Problem, UnaryConstraint, BinaryConstraint
+from CSP import AllDifferentConstraint, Assignment, Problem, UnaryConstraint
 
 # A class for the sudoku problem which inherits from the generic CSP problem class
 class SudokuProblem(Problem):
@@ -18,9 +18,10 @@ class SudokuProblem(Problem):
         return separator.join('\n'.join(group) for group in group_elements(lines, cell_dim))
 
     # Read a sudoku puzzle from a string
+    # The cells of each row, column and square are constrained by a single all-different constraint
+    # (instead of a binary "!=" constraint for every pair of cells).
     @staticmethod
     def from_text(text: str) -> 'SudokuProblem':
-        not_equal_condition = lambda a, b: a != b
         unary_not_equal_condition = lambda f: (lambda v: v != f)
         
         lines = [line.strip() for line in text.splitlines()]
@@ -67,9 +68,10 @@ class SudokuProblem(Problem):
 
         for pair in var_fixed_pairs:
             for var_list, fixed_list in zip(*pair):
-                for index, variable in enumerate(var_list):
+                for variable in var_list:
                    constraints.extend(UnaryConstraint(variable, unary_not_equal_condition(fixed)) for fixed in fixed_list)
-                   constraints.extend(BinaryConstraint((variable, other), not_equal_condition) for other in var_list[index+1:])
+                if len(var_list) > 1:
+                    constraints.append(AllDifferentConstraint(var_list))
         
         problem = SudokuProblem()
         problem.size = size